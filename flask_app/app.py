@@ -1,12 +1,31 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, g, request, jsonify, send_from_directory, stream_with_context
 from werkzeug.utils import secure_filename
 from flask_cors import CORS
 import os
+import json
+import time
+import uuid
 
 # Import utilities
-from utils.process_new_image import process_new_image
+from utils.process_new_image import blip_batcher, clip_batcher, process_new_image
+from utils.image_io import decode_image
+from utils.model_registry import MODEL_WARMUP, models
 from utils.recommend import find_similar_items
+from utils.catalog_store import DEFAULT_CATALOG_SPACE, catalog_spaces, catalog_store
+from utils.embedding_space import EmbeddingModelMismatch, query_embedding, require_query_encoder
+from utils.filters import FILTER_COLUMNS
+from utils.analysis_cache import analysis_cache
+from utils.prompt_cache import prompt_cache
 from utils.generate_outfits import generate_outfit_suggestions
+from utils.outfit_composer import compose_outfits
+from utils.jobs import ANALYZE_JOBS, TERMINAL_STATES, JobQueue, QueueFull
+from utils.openrouter import pending_calls as pending_llm_calls
+from utils.logs import get_logger, request_id
+from utils.metrics import (
+    METRICS_ENABLED, SERVER_TIMING, begin_request_timings, end_request_timings, metrics, resident_memory_bytes,
+)
+
+log = get_logger(__name__)
 
 from flask import Flask, render_template
 
@@ -23,6 +42,8 @@ def index():
 
 # Configuration
 UPLOAD_FOLDER = "uploads"
+SAVE_UPLOADS = os.getenv("SAVE_UPLOADS", "0") == "1"  # keep a copy of each upload on disk (debugging)
+SSE_HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))  # keeps idle event streams open through proxies
 STATIC_IMAGE_FOLDER = os.path.join("..", "data", "images")  # for /static/catalog_images
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
@@ -31,45 +52,247 @@ app = Flask(__name__)
 app.config["UPLOAD_FOLDER"] = UPLOAD_FOLDER
 CORS(app)
 
+# Load the catalog once at startup; requests reuse it (and pick up changes on disk)
+try:
+    catalog_store.get()
+except Exception as e:
+    log.error(f"❌ Catalog not loaded at startup, will retry on first request: {e}")
+
+# BLIP/CLIP load in the background by default so the worker answers /healthz right away
+# (MODEL_WARMUP=eager loads before serving, e.g. under gunicorn --preload; lazy waits for the first request)
+if MODEL_WARMUP == "eager":
+    models.warm_up(background=False)
+elif MODEL_WARMUP == "background":
+    models.warm_up()
+
+# Background /analyze jobs (see utils/jobs.py for the worker/queue limits); off under several gunicorn workers
+analyze_jobs = JobQueue() if ANALYZE_JOBS else None
+
 # ---------------------------------------------
-# Endpoint: Analyze + Recommend (CLIP only)
+# Request Instrumentation (counts, latency, Server-Timing, request ids in logs)
 # ---------------------------------------------
-@app.route("/analyze", methods=["POST"])
-def analyze_image():
+requests_total = metrics.counter("stylespark_requests_total", "HTTP requests by endpoint, method and status")
+request_seconds = metrics.histogram("stylespark_request_seconds", "HTTP request latency by endpoint")
+
+
+@app.before_request
+def start_request_metrics():
+    g.request_start = time.perf_counter()
+    request_id.set(request.headers.get("X-Request-ID") or uuid.uuid4().hex)
+    begin_request_timings()
+
+
+@app.after_request
+def finish_request_metrics(response):
+    seconds = time.perf_counter() - g.request_start
+    endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+    request_seconds.observe(seconds, endpoint=endpoint, method=request.method)
+    requests_total.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+
+    # Stages timed on this request's thread (decode, blip, palette, clip, llm, search, ...) plus the total
+    timings = end_request_timings()
+    if SERVER_TIMING:
+        response.headers["Server-Timing"] = ", ".join(filter(None, [timings, f"total;dur={seconds * 1000:.1f}"]))
+    response.headers["X-Request-ID"] = request_id.get()
+    return response
+
+# ---------------------------------------------
+# Endpoint: Analyze + Recommend (CLIP + optional filters)
+# ---------------------------------------------
+def read_upload():
+    """
+    The uploaded image, decoded, plus the search options from the multipart form:
+    metadata filters (e.g. season=Summer&gender=Women) and the catalog space
+    (space=<name>, see CATALOG_SPACES). A space no query encoder matches is a 409.
+    Returns: (image, filters, space, None) or (None, None, None, error response)
+    """
     if "image" not in request.files:
-        return jsonify({"error": "No image uploaded"}), 400
+        return None, None, None, (jsonify({"error": "No image uploaded"}), 400)
 
     file = request.files["image"]
     filename = secure_filename(file.filename)
-    image_path = os.path.join(app.config["UPLOAD_FOLDER"], filename)
-    file.save(image_path)
+    image_bytes = file.read()
+    if SAVE_UPLOADS:
+        with open(os.path.join(app.config["UPLOAD_FOLDER"], filename), "wb") as f:
+            f.write(image_bytes)
 
-    print(f"🚀 Received and saved image: {image_path}")
+    log.info(f"🚀 Received image: {filename} ({len(image_bytes)} bytes)", extra={"image": filename, "bytes": len(image_bytes)})
+
+    filters = {key: request.form[key] for key in FILTER_COLUMNS if request.form.get(key)}
+    space = request.form.get("space", DEFAULT_CATALOG_SPACE)
+    if space not in catalog_spaces:
+        error = {"error": f"Unknown catalog space {space!r}", "spaces": sorted(catalog_spaces)}
+        return None, None, None, (jsonify(error), 400)
+    # Refuse a catalog the query cannot be embedded for before paying for the pipeline (or a cache replay)
+    try:
+        require_query_encoder(catalog_spaces[space].get().embedding_spec)
+    except EmbeddingModelMismatch as e:
+        return None, None, None, (jsonify({"error": str(e)}), 409)
+
+    # Decoded once, straight from the request body
+    try:
+        image = decode_image(image_bytes, name=filename)
+    except Exception as e:
+        return None, None, None, (jsonify({"error": f"Could not decode image: {e}"}), 400)
+    return image, filters, space, None
 
-    # Step 1: Process the image
-    result = process_new_image(image_path)
 
-    # Step 2: Recommend similar items using CLIP only (no filters)
-    similar_items = find_similar_items(
-        uploaded_result=result,
-        top_k=12
+def recommend(image, clip_embedding, filters, space):
+    """Similar catalog items; raises EmbeddingModelMismatch if the space needs another encoder."""
+    catalog = catalog_spaces[space].get()
+    # The query must be embedded by the model the catalog was built with
+    embedding = query_embedding(catalog.embedding_spec, image.image, clip_embedding)
+    return find_similar_items(
+        uploaded_result={"clip_embedding": embedding},
+        top_k=12,
+        filter_options=filters,
+        catalog=catalog,
     )
 
+
+def analysis_fields(result):
+    return {
+        "caption": result.get("caption"),
+        "colors": result.get("color_palette"),
+        "season": result.get("season"),
+        "display_name": result.get("productDisplayName"),
+        "aesthetic_category": result.get("aesthetic_category"),
+        "aesthetic_vibe": result.get("aesthetic_vibe")
+    }
+
+
+@app.route("/analyze", methods=["POST"])
+def analyze_image():
+    image, filters, space, error = read_upload()
+    if error:
+        return error
+
+    # Step 1: Process the image
+    result = process_new_image(image)
+
+    # Step 2: Recommend similar items using CLIP, optionally filtered by metadata
+    try:
+        similar_items = recommend(image, result["clip_embedding"], filters, space)
+    except EmbeddingModelMismatch as e:
+        return jsonify({"error": str(e)}), 409
+
     # Step 3: Return clean response
     response = {
-        "analysis": {
-            "caption": result.get("caption"),
-            "colors": result.get("color_palette"),
-            "season": result.get("season"),
-            "display_name": result.get("productDisplayName"),
-            "aesthetic_category": result.get("aesthetic_category"),
-            "aesthetic_vibe": result.get("aesthetic_vibe")
-        },
+        "analysis": analysis_fields(result),
         "recommendations": similar_items
     }
 
     return jsonify(response)
 
+# ---------------------------------------------
+# Endpoint: Analyze as a background job (poll or stream the stages)
+# ---------------------------------------------
+def run_analyze_job(job, image, filters, space):
+    """
+    Same pipeline as /analyze, publishing each stage as it finishes:
+    "recommendations" (right after CLIP), "caption", "colors", then "attributes".
+    Cancellation takes effect at the next stage boundary.
+    """
+    recommendations = []
+
+    def on_stage(stage, value):
+        job.check_cancelled()
+        if stage == "clip_embedding":
+            recommendations.extend(recommend(image, value, filters, space))
+            job.emit("recommendations", recommendations)
+        else:
+            job.emit(stage, value)
+        job.check_cancelled()
+
+    result = process_new_image(image, on_stage=on_stage)
+    return {"analysis": analysis_fields(result), "recommendations": recommendations}
+
+
+def job_urls(job_id):
+    return {"status_url": f"/analyze/jobs/{job_id}", "events_url": f"/analyze/jobs/{job_id}/events"}
+
+
+def jobs_unavailable():
+    error = "The job API needs a single worker process (ANALYZE_JOBS=0 here), use /analyze"
+    return jsonify({"error": error}), 503
+
+
+@app.route("/analyze/jobs", methods=["POST"])
+def submit_analyze_job():
+    if analyze_jobs is None:
+        return jobs_unavailable()
+    image, filters, space, error = read_upload()
+    if error:
+        return error
+    try:
+        job = analyze_jobs.submit(run_analyze_job, image, filters, space)
+    except QueueFull as e:
+        response = jsonify({"error": f"Analysis queue is full ({e}), retry later"})
+        response.headers["Retry-After"] = "5"
+        return response, 429
+    return jsonify({"job_id": job.id, "state": job.state, **job_urls(job.id)}), 202
+
+
+@app.route("/analyze/jobs/<job_id>", methods=["GET"])
+def get_analyze_job(job_id):
+    if analyze_jobs is None:
+        return jobs_unavailable()
+    job = analyze_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown job {job_id!r}"}), 404
+    return jsonify(job.snapshot())
+
+
+@app.route("/analyze/jobs/<job_id>", methods=["DELETE"])
+def cancel_analyze_job(job_id):
+    if analyze_jobs is None:
+        return jobs_unavailable()
+    job = analyze_jobs.cancel(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown job {job_id!r}"}), 404
+    return jsonify(job.snapshot()), 202
+
+
+@app.route("/analyze/jobs/<job_id>/events", methods=["GET"])
+def stream_analyze_job(job_id):
+    if analyze_jobs is None:
+        return jobs_unavailable()
+    job = analyze_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown job {job_id!r}"}), 404
+
+    # Reconnecting EventSource clients resume after the last event they saw (ids we never sent replay everything)
+    try:
+        last_seen = max(0, int(request.headers.get("Last-Event-ID") or 0))
+    except ValueError:
+        last_seen = 0
+
+    def events():
+        seq = last_seen
+        while True:
+            batch = job.events_since(seq, SSE_HEARTBEAT_SECONDS)
+            if not batch:
+                if job.state in TERMINAL_STATES:
+                    return  # resumed after the final event
+                yield ": keep-alive\n\n"
+                continue
+            for seq, stage, data in batch:
+                yield f"id: {seq}\nevent: {stage}\ndata: {json.dumps(data)}\n\n"
+                if stage in TERMINAL_STATES:
+                    return
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return Response(stream_with_context(events()), mimetype="text/event-stream", headers=headers)
+
+# ---------------------------------------------
+# Job Queue Stats
+# ---------------------------------------------
+@app.route("/analyze/jobs/stats", methods=["GET"])
+def analyze_job_stats():
+    if analyze_jobs is None:
+        return jobs_unavailable()
+    return jsonify(analyze_jobs.stats())
+
 # ---------------------------------------------
 # Endpoint: Outfit Generator
 # ---------------------------------------------
@@ -80,9 +303,118 @@ def generate_outfits():
     if not data or "tops" not in data or "bottoms" not in data:
         return jsonify({"error": "Request must include 'tops' and 'bottoms'"}), 400
 
-    outfits = generate_outfit_suggestions(data["tops"], data["bottoms"])
+    # Items may be catalog ids (precomputed colours) or {id, image_path} dicts
+    try:
+        catalog = catalog_store.get()
+    except Exception as e:
+        log.warning(f"❌ Catalog unavailable, decoding every outfit item: {e}")
+        catalog = None
+    try:
+        outfits = generate_outfit_suggestions(data["tops"], data["bottoms"], catalog=catalog)
+    except KeyError as e:
+        return jsonify({"error": str(e.args[0])}), 400
+    except OSError as e:
+        return jsonify({"error": f"Could not read item image: {e}"}), 400
     return jsonify({"outfits": outfits})
 
+# ---------------------------------------------
+# Compose Full Looks (top + bottom + shoes + accessory)
+# ---------------------------------------------
+@app.route("/compose-outfits", methods=["POST"])
+def compose_outfits_route():
+    data = request.get_json(silent=True) or {}
+
+    # Optional: slots [{"name", "filters"}], shared filters, fixed {slot: catalog id},
+    # clip_embedding to steer the looks, top_n, max_item_reuse
+    slots = None
+    if data.get("slots"):
+        slots = [(s["name"], s.get("filters") or {}) for s in data["slots"]]
+    try:
+        outfits, budget_exhausted = compose_outfits(
+            catalog_store.get(),
+            slots=slots,
+            filters=data.get("filters"),
+            fixed=data.get("fixed"),
+            query_embedding=data.get("clip_embedding"),
+            top_n=int(data.get("top_n", 5)),
+            max_item_reuse=int(data.get("max_item_reuse", 1)),
+        )
+    except KeyError as e:
+        return jsonify({"error": str(e.args[0])}), 400
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    # complete is false when the catalog had fewer distinct looks than top_n under the reuse cap
+    return jsonify({"outfits": outfits, "budget_exhausted": budget_exhausted,
+                    "complete": len(outfits) == int(data.get("top_n", 5))})
+
+# ---------------------------------------------
+# Cache Stats (per-image analysis + LLM prompt caches)
+# ---------------------------------------------
+@app.route("/cache/stats", methods=["GET"])
+def cache_stats():
+    return jsonify({
+        "analysis": analysis_cache.stats() if analysis_cache is not None else {"enabled": False},
+        "prompt": prompt_cache.stats() if prompt_cache is not None else {"enabled": False},
+    })
+
+# ---------------------------------------------
+# Prometheus Metrics (per process: scrape each gunicorn worker, or run one worker with threads)
+# ---------------------------------------------
+queue_depth = metrics.gauge("stylespark_queue_depth", "Items waiting in in-process queues")
+llm_pending = metrics.gauge("stylespark_llm_calls_pending", "LLM calls submitted and not finished (queued or running)")
+cache_events = metrics.counter("stylespark_cache_events_total", "Cache lookups and stores by cache and event")
+cache_hit_ratio = metrics.gauge("stylespark_cache_hit_ratio", "Hits / lookups since the process started")
+prompt_cache_saved = metrics.gauge("stylespark_prompt_cache_saved_seconds", "LLM latency avoided by prompt cache hits")
+model_loaded = metrics.gauge("stylespark_model_loaded", "1 once the model is loaded")
+model_load_seconds = metrics.gauge("stylespark_model_load_seconds", "Time the model took to load")
+model_memory = metrics.gauge("stylespark_model_memory_bytes", "Resident memory added while the model loaded")
+process_memory = metrics.gauge("process_resident_memory_bytes", "Resident memory of this process")
+catalog_items = metrics.gauge("stylespark_catalog_items", "Items in each loaded catalog space")
+
+
+@metrics.collector
+def collect_runtime_gauges():
+    for batcher in (blip_batcher, clip_batcher):
+        if batcher is not None:
+            queue_depth.set(batcher.queue_depth(), queue=batcher.name)
+    if analyze_jobs is not None:
+        queue_depth.set(analyze_jobs.depth(), queue="analyze-jobs")
+    llm_pending.set(pending_llm_calls())
+
+    for name, cache in (("analysis", analysis_cache), ("prompt", prompt_cache)):
+        if cache is None:
+            continue
+        stats = cache.stats()
+        for event, count in stats.items():
+            if event == "saved_seconds":
+                prompt_cache_saved.set(count)
+            elif event in cache.counters:
+                cache_events.set(count, cache=name, event=event)
+        cache_hit_ratio.set(stats["hit_ratio"], cache=name)
+
+    for name, status in models.status().items():
+        model_loaded.set(int(status["state"] == "loaded"), model=name)
+        if status["state"] == "loaded":
+            model_load_seconds.set(status["load_seconds"], model=name)
+            if status["rss_delta_bytes"] is not None:
+                model_memory.set(status["rss_delta_bytes"], model=name)
+    rss = resident_memory_bytes()
+    if rss is not None:
+        process_memory.set(rss)
+
+    # current(), not get(): a scrape must never trigger (and wait for) a catalog reload
+    for space, store in catalog_spaces.items():
+        snapshot = store.current()
+        if snapshot is not None:
+            catalog_items.set(len(snapshot), space=space)
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    if not METRICS_ENABLED:
+        return jsonify({"error": "Metrics are disabled (METRICS_ENABLED=0)"}), 404
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
 # ---------------------------------------------
 # Serve Catalog Images (Optional)
 # ---------------------------------------------
@@ -97,6 +429,23 @@ def serve_catalog_image(filename):
 def home():
     return "🧵 StyleSpark Flask API is running!"
 
+# Liveness: the process is up and serving (models may still be loading)
+@app.route("/healthz", methods=["GET"])
+def healthz():
+    return jsonify({"status": "ok"})
+
+# Readiness: models and catalog are loaded, /analyze will not block on a cold start
+@app.route("/readyz", methods=["GET"])
+def readyz():
+    # Extra query encoders for other catalog spaces load on demand and do not gate readiness
+    ready = models.is_ready(["blip", "clip"]) and catalog_store.is_loaded()
+    body = {
+        "ready": ready,
+        "models": models.status(),
+        "catalog": "loaded" if catalog_store.is_loaded() else "not_loaded",
+    }
+    return jsonify(body), (200 if ready else 503)
+
 # ---------------------------------------------
 # Run Server
 # ---------------------------------------------
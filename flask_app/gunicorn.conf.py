@@ -0,0 +1,36 @@
+import gc
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from utils.logs import get_logger
+
+log = get_logger("gunicorn.conf")
+
+# Run from flask_app/:  gunicorn app:app
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5000")
+# The /analyze/jobs API keeps each job in the memory of the worker that accepted it, so a
+# poll, event stream or cancel routed to another worker would 404 (and the queue limit and
+# stats would only cover one worker). With the job API on (ANALYZE_JOBS=1, the default)
+# run one worker and scale with threads; asking for more workers switches the job API off.
+analyze_jobs = os.getenv("ANALYZE_JOBS", "1") == "1"
+workers = int(os.getenv("GUNICORN_WORKERS", "1" if analyze_jobs else "2"))
+if analyze_jobs and workers > 1:
+    log.warning(f"❌ /analyze/jobs needs a single worker, disabling it for GUNICORN_WORKERS={workers}",
+                extra={"workers": workers})
+    os.environ["ANALYZE_JOBS"] = "0"  # read by the app in every worker (and in the master with preload)
+threads = int(os.getenv("GUNICORN_THREADS", "8"))  # concurrent requests in a worker share its micro-batchers
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+
+# GUNICORN_PRELOAD=1: import the app (and load BLIP/CLIP) once in the master, then fork.
+# Workers share the weights copy-on-write instead of each holding a private copy.
+preload_app = os.getenv("GUNICORN_PRELOAD", "0") == "1"
+if preload_app:
+    os.environ.setdefault("MODEL_WARMUP", "eager")
+
+
+def when_ready(server):
+    if preload_app:
+        # Move the preloaded objects out of the GC's reach so collections in the
+        # workers do not touch (and un-share) their pages
+        gc.freeze()
@@ -0,0 +1,220 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+import numpy as np
+from PIL import Image
+
+# ---------------- CONFIG ---------------- #
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+ANALYSIS_CACHE_ENABLED = os.getenv("ANALYSIS_CACHE_ENABLED", "1") == "1"
+ANALYSIS_CACHE_PATH = os.getenv("ANALYSIS_CACHE_PATH", os.path.join(PROJECT_ROOT, "cache", "analysis_cache.sqlite3"))
+ANALYSIS_CACHE_MAX_BYTES = int(os.getenv("ANALYSIS_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+ANALYSIS_CACHE_LLM_TTL = float(os.getenv("ANALYSIS_CACHE_LLM_TTL", str(7 * 24 * 3600)))  # seconds
+# Max Hamming distance between perceptual hashes to count as the same photo (-1 disables pHash lookup)
+ANALYSIS_CACHE_PHASH_DISTANCE = int(os.getenv("ANALYSIS_CACHE_PHASH_DISTANCE", "-1"))
+# pHash candidates must also match in colour: max mean per-channel difference (0-255) of 4x4 RGB thumbnails
+ANALYSIS_CACHE_COLOUR_DISTANCE = float(os.getenv("ANALYSIS_CACHE_COLOUR_DISTANCE", "12"))
+COLOUR_SIGNATURE_SIZE = (4, 4)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS analysis (
+    key TEXT PRIMARY KEY,
+    model_version TEXT NOT NULL,
+    phash INTEGER,
+    caption TEXT,
+    palette TEXT,
+    embedding BLOB,
+    llm TEXT,
+    llm_at REAL,
+    last_access REAL NOT NULL,
+    size INTEGER NOT NULL,
+    colour BLOB
+);
+CREATE INDEX IF NOT EXISTS analysis_phash ON analysis (model_version, phash);
+CREATE INDEX IF NOT EXISTS analysis_lru ON analysis (last_access);
+"""
+
+
+# ---------------- HASHES ---------------- #
+def content_hash(image_bytes):
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+def perceptual_hash(image):
+    """
+    64-bit difference hash: survives resizing and JPEG re-encoding, so the
+    same product photo re-uploaded at another size still maps to one entry.
+    Returned as a signed int so it fits an SQLite INTEGER.
+    """
+    gray = np.asarray(image.convert("L").resize((9, 8), Image.LANCZOS), dtype=np.int16)
+    bits = (gray[:, 1:] > gray[:, :-1]).flatten()
+    value = int("".join("1" if b else "0" for b in bits), 2)
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def colour_signature(image):
+    """
+    4x4 RGB thumbnail (48 bytes). The difference hash is computed on grayscale,
+    so recoloured copies of one garment (and all flat-colour images) share it;
+    a pHash match is only trusted when these thumbnails agree as well.
+    """
+    return np.asarray(image.convert("RGB").resize(COLOUR_SIGNATURE_SIZE, Image.BOX), dtype=np.uint8).tobytes()
+
+
+def colour_distance(a, b):
+    return float(np.abs(np.frombuffer(a, np.uint8).astype(np.int16) - np.frombuffer(b, np.uint8)).mean())
+
+
+def hamming(a, b):
+    return bin((a ^ b) & ((1 << 64) - 1)).count("1")
+
+
+# ---------------- CACHE ---------------- #
+class AnalysisCache:
+    """
+    Content-addressed store of per-image analysis results (caption, palette,
+    LLM attributes, CLIP embedding) in a local SQLite file.
+
+    Keys combine the SHA-256 of the upload with a model version string, so a
+    model swap never serves stale results. Entries are evicted least recently
+    used once the stored payload exceeds `max_bytes`; LLM-derived fields expire
+    after `llm_ttl` seconds while the model outputs are kept.
+    """
+
+    def __init__(self, path=ANALYSIS_CACHE_PATH, max_bytes=ANALYSIS_CACHE_MAX_BYTES,
+                 llm_ttl=ANALYSIS_CACHE_LLM_TTL, phash_distance=ANALYSIS_CACHE_PHASH_DISTANCE,
+                 colour_distance=ANALYSIS_CACHE_COLOUR_DISTANCE):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.llm_ttl = llm_ttl
+        self.phash_distance = phash_distance
+        self.colour_distance = colour_distance
+        self._lock = threading.Lock()
+        self._conn = None  # opened on first use, so importing the app writes nothing
+        self.counters = {"hits": 0, "phash_hits": 0, "misses": 0, "llm_expired": 0, "evictions": 0}
+        if hasattr(os, "register_at_fork"):
+            # SQLite handles must not cross fork() (gunicorn --preload): each worker opens its own
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _connection(self):
+        # caller holds self._lock
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            if "colour" not in {row[1] for row in conn.execute("PRAGMA table_info(analysis)")}:
+                conn.execute("ALTER TABLE analysis ADD COLUMN colour BLOB")  # stores from before the colour check
+            self._conn = conn
+        return self._conn
+
+    def _after_fork(self):
+        self._lock = threading.Lock()
+        self._conn = None
+
+    @staticmethod
+    def make_key(image_bytes, model_version):
+        return hashlib.sha256(f"{content_hash(image_bytes)}|{model_version}".encode()).hexdigest()
+
+    def get(self, key, model_version, phash=None, colour=None):
+        """
+        phash / colour: perceptual_hash() and colour_signature() of the image,
+        used to find a resized or re-encoded copy when the exact key misses.
+
+        Returns: dict with caption, color_palette, clip_embedding and llm (None if
+        the LLM fields expired), or None on a miss.
+        """
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT key, caption, palette, embedding, llm, llm_at FROM analysis WHERE key = ?", (key,)
+            ).fetchone()
+            via_phash = False
+            if row is None and phash is not None and colour is not None and self.phash_distance >= 0:
+                row = self._find_by_phash(conn, model_version, phash, colour)
+                via_phash = row is not None
+            if row is None:
+                self.counters["misses"] += 1
+                return None
+
+            self.counters["phash_hits" if via_phash else "hits"] += 1
+            conn.execute("UPDATE analysis SET last_access = ? WHERE key = ?", (time.time(), row[0]))
+
+            _, caption, palette, embedding, llm, llm_at = row
+            llm_fields = json.loads(llm) if llm else None
+            if llm_fields is not None and time.time() - (llm_at or 0) > self.llm_ttl:
+                self.counters["llm_expired"] += 1
+                llm_fields = None
+        return {
+            "caption": caption,
+            "color_palette": json.loads(palette),
+            "clip_embedding": np.frombuffer(embedding, dtype=np.float32).tolist(),
+            "llm": llm_fields,
+        }
+
+    def _find_by_phash(self, conn, model_version, phash, colour):
+        if self.phash_distance == 0:
+            candidates = conn.execute(
+                "SELECT phash, colour, key FROM analysis WHERE model_version = ? AND phash = ? AND colour IS NOT NULL",
+                (model_version, phash),
+            )
+        else:
+            candidates = conn.execute(
+                "SELECT phash, colour, key FROM analysis "
+                "WHERE model_version = ? AND phash IS NOT NULL AND colour IS NOT NULL",
+                (model_version,),
+            )
+        for candidate_phash, candidate_colour, candidate_key in candidates.fetchall():
+            if (hamming(candidate_phash, phash) <= self.phash_distance
+                    and colour_distance(candidate_colour, colour) <= self.colour_distance):
+                return conn.execute(
+                    "SELECT key, caption, palette, embedding, llm, llm_at FROM analysis WHERE key = ?", (candidate_key,)
+                ).fetchone()
+        return None
+
+    def put(self, key, model_version, phash, caption, color_palette, clip_embedding, llm_fields, colour=None):
+        embedding = np.asarray(clip_embedding, dtype=np.float32).tobytes()
+        palette = json.dumps(color_palette)
+        llm = json.dumps(llm_fields)
+        size = len(embedding) + len(palette) + len(llm) + len(caption or "")
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO analysis (key, model_version, phash, caption, palette, embedding, llm, llm_at, "
+                "last_access, size, colour) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, model_version, phash, caption, palette, embedding, llm, now, now, size, colour),
+            )
+            self._evict(conn)
+
+    def _evict(self, conn):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM analysis").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = 0
+        for key, size in conn.execute("SELECT key, size FROM analysis ORDER BY last_access").fetchall():
+            if total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM analysis WHERE key = ?", (key,))
+            total -= size
+            evicted += 1
+        self.counters["evictions"] += evicted
+
+    def stats(self):
+        with self._lock:
+            conn = self._connection()
+            entries, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM analysis").fetchone()
+            counters = dict(self.counters)
+        lookups = counters["hits"] + counters["phash_hits"] + counters["misses"]
+        return {
+            **counters,
+            "entries": entries,
+            "bytes": total,
+            "hit_ratio": (counters["hits"] + counters["phash_hits"]) / lookups if lookups else 0.0,
+        }
+
+
+analysis_cache = AnalysisCache() if ANALYSIS_CACHE_ENABLED else None
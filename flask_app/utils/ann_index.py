@@ -0,0 +1,342 @@
+import os
+import numpy as np
+
+from utils.topk import select_topk, topk_inner_product, topk_subset
+from utils.quantization import ScalarQuantizer, ProductQuantizer, cluster_sums
+
+# -----------------------------------------------
+# CONFIG
+# -----------------------------------------------
+# Which index backend the catalog store builds:
+# "flat" = exact, "ivf" = approximate, "sq8"/"pq" = compressed codes + exact re-ranking
+CATALOG_INDEX = os.getenv("CATALOG_INDEX", "flat")
+# Number of IVF lists probed per query (higher = better recall, slower)
+IVF_NPROBE = int(os.getenv("CATALOG_INDEX_NPROBE", "8"))
+# Compressed indexes re-score this many candidates per requested result against the float vectors
+QUANTIZED_RERANK = int(os.getenv("CATALOG_INDEX_RERANK", "10"))
+
+
+def _as_queries(queries):
+    queries = np.asarray(queries, dtype=np.float32)
+    if queries.ndim == 1:
+        queries = queries.reshape(1, -1)
+    return queries
+
+
+def _normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+# -----------------------------------------------
+# EXACT (FLAT) INDEX
+# -----------------------------------------------
+class FlatIndex:
+    """
+    Brute-force search over every catalog vector. Exact, and the reference
+    the approximate backends are measured against.
+    """
+
+    kind = "flat"
+
+    def __init__(self, embeddings):
+        self.embeddings = embeddings
+
+    @classmethod
+    def build(cls, embeddings, **params):
+        return cls(embeddings)
+
+    def search(self, queries, k, mask=None, **knobs):
+        """
+        queries: (Q, D) or (D,) array
+        mask: optional (N,) bool array of rows allowed by the metadata filters
+        Returns: (scores, indices), both (Q, k), best first; -1 pads missing hits
+
+        Catalog embeddings are L2-normalized at build time, so cosine
+        similarity is a plain inner product against the normalized queries.
+        """
+        return topk_inner_product(_normalize(_as_queries(queries)), self.embeddings, k, mask=mask)
+
+    def extend(self, embeddings):
+        """Index for `embeddings`, whose first len(self) rows are the ones indexed now."""
+        return FlatIndex(embeddings)
+
+    def compact(self, keep, embeddings):
+        """Index for `embeddings` = the current rows `keep` (sorted), renumbered from 0."""
+        return FlatIndex(embeddings)
+
+    def save(self, path):
+        # Nothing to persist beyond the catalog embeddings themselves
+        with open(path, "wb") as f:
+            np.savez(f, kind=np.array(self.kind))
+
+    @classmethod
+    def load(cls, path, embeddings):
+        return cls(embeddings)
+
+
+# -----------------------------------------------
+# IVF INDEX (k-means coarse quantizer)
+# -----------------------------------------------
+def train_kmeans(vectors, n_clusters, n_iter=20, seed=42, chunk_size=65536):
+    """
+    Spherical k-means in NumPy: assign by maximum inner product, re-normalize
+    the centroids after each update. Empty clusters are re-seeded from random points.
+    """
+    rng = np.random.default_rng(seed)
+    vectors = np.asarray(vectors, dtype=np.float32)
+    centroids = vectors[rng.choice(len(vectors), n_clusters, replace=False)].copy()
+
+    for _ in range(n_iter):
+        assignments = assign_to_centroids(vectors, centroids, chunk_size)
+        sums = cluster_sums(vectors, assignments, n_clusters)
+        counts = np.bincount(assignments, minlength=n_clusters)
+        empty = counts == 0
+        if empty.any():
+            sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()), replace=False)]
+        centroids = _normalize(sums)
+    return centroids
+
+
+def assign_to_centroids(vectors, centroids, chunk_size=65536):
+    assignments = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), chunk_size):
+        block = np.asarray(vectors[start:start + chunk_size], dtype=np.float32)
+        assignments[start:start + chunk_size] = np.argmax(block @ centroids.T, axis=1)
+    return assignments
+
+
+class IVFIndex:
+    """
+    Inverted-file index: catalog vectors are bucketed by their nearest k-means
+    centroid, and a query only scans the `nprobe` closest buckets.
+
+    The lists are stored CSR-style (list_offsets + ids sorted by list), so the
+    index itself holds no copy of the embeddings.
+    """
+
+    kind = "ivf"
+
+    def __init__(self, embeddings, centroids, list_offsets, list_ids, nprobe=IVF_NPROBE):
+        self.embeddings = embeddings
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+        self.list_ids = list_ids
+        self.nprobe = nprobe
+
+    @classmethod
+    def build(cls, embeddings, nlist=None, n_iter=20, max_train_points=None, seed=42, nprobe=IVF_NPROBE):
+        n = len(embeddings)
+        if nlist is None:
+            nlist = max(1, int(4 * np.sqrt(n)))
+        nlist = min(nlist, n)
+        max_train_points = max_train_points or 256 * nlist
+
+        rng = np.random.default_rng(seed)
+        if n > max_train_points:
+            sample = np.asarray(embeddings[np.sort(rng.choice(n, max_train_points, replace=False))])
+        else:
+            sample = np.asarray(embeddings)
+        centroids = train_kmeans(sample, nlist, n_iter=n_iter, seed=seed)
+
+        assignments = assign_to_centroids(embeddings, centroids)
+        return cls.from_assignments(embeddings, centroids, np.arange(n, dtype=np.int64), assignments, nprobe)
+
+    @classmethod
+    def from_assignments(cls, embeddings, centroids, ids, assignments, nprobe=IVF_NPROBE):
+        """CSR lists from (row id, list) pairs; ids given in ascending order stay ascending within a list."""
+        order = np.argsort(assignments, kind="stable")
+        counts = np.bincount(assignments, minlength=len(centroids))
+        list_offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        return cls(embeddings, centroids, list_offsets, ids[order].astype(np.int64), nprobe=nprobe)
+
+    def list_assignments(self):
+        """List number of every entry of list_ids."""
+        return np.repeat(np.arange(len(self.centroids)), np.diff(self.list_offsets))
+
+    def extend(self, embeddings):
+        """
+        Assign the rows of `embeddings` past the indexed ones to their nearest
+        existing centroid. The centroids are not retrained; rebuild the index if
+        the catalog drifts far from the data it was trained on.
+        """
+        n_indexed = len(self.list_ids)
+        new_ids = np.arange(n_indexed, len(embeddings), dtype=np.int64)
+        assignments = np.concatenate([self.list_assignments(), assign_to_centroids(embeddings[n_indexed:], self.centroids)])
+        return IVFIndex.from_assignments(embeddings, self.centroids, np.concatenate([self.list_ids, new_ids]),
+                                         assignments, self.nprobe)
+
+    def compact(self, keep, embeddings):
+        """Drop every row not in `keep` (sorted) and renumber the rest to match `embeddings`."""
+        renumber = np.full(len(self.list_ids), -1, dtype=np.int64)
+        renumber[keep] = np.arange(len(keep))
+        ids = renumber[self.list_ids]
+        alive = ids >= 0
+        return IVFIndex.from_assignments(embeddings, self.centroids, ids[alive], self.list_assignments()[alive],
+                                         self.nprobe)
+
+    def search(self, queries, k, nprobe=None, mask=None):
+        queries = _normalize(_as_queries(queries))
+        nlist = len(self.centroids)
+        nprobe = min(nprobe or self.nprobe, nlist)
+
+        if mask is not None:
+            allowed = np.flatnonzero(mask)
+            # A selective filter leaves fewer rows than the probed lists would hold: scan those exactly
+            if len(allowed) <= nprobe * len(self.list_ids) / nlist:
+                return topk_subset(queries, self.embeddings, allowed, k)
+
+        _, probe_order = select_topk(queries @ self.centroids.T, nlist)
+
+        all_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        all_indices = np.full((len(queries), k), -1, dtype=np.int64)
+        for qi, order in enumerate(probe_order):
+            probe = nprobe
+            while True:
+                candidates = np.concatenate(
+                    [self.list_ids[self.list_offsets[l]:self.list_offsets[l + 1]] for l in order[:probe]]
+                )
+                if mask is not None:
+                    candidates = candidates[mask[candidates]]
+                # With filters, widen the probe until k allowed items are found
+                if mask is None or len(candidates) >= k or probe >= nlist:
+                    break
+                probe = min(probe * 2, nlist)
+            if len(candidates) == 0:
+                continue
+            scores = np.asarray(self.embeddings[candidates], dtype=np.float32) @ queries[qi]
+            top_scores, top = select_topk(scores, k)
+            all_scores[qi, :len(top)] = top_scores
+            all_indices[qi, :len(top)] = candidates[top]
+        return all_scores, all_indices
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            np.savez(
+                f,
+                kind=np.array(self.kind),
+                centroids=self.centroids,
+                list_offsets=self.list_offsets,
+                list_ids=self.list_ids,
+                nprobe=np.array(self.nprobe),
+            )
+
+    @classmethod
+    def load(cls, path, embeddings):
+        with np.load(path, allow_pickle=False) as data:
+            if int(data["list_offsets"][-1]) != len(embeddings):
+                raise ValueError(f"IVF index {path} was built for a different catalog size")
+            return cls(
+                embeddings,
+                data["centroids"],
+                data["list_offsets"],
+                data["list_ids"],
+                nprobe=int(data["nprobe"]),
+            )
+
+
+# -----------------------------------------------
+# COMPRESSED (QUANTIZED) INDEXES
+# -----------------------------------------------
+class QuantizedIndex:
+    """
+    Keeps only compact codes resident and scans them with asymmetric distance
+    computation. The best `rerank * k` candidates are then re-scored exactly
+    against the float embeddings; with a memory-mapped artifact only those
+    rows are paged in, so the full float matrix need not fit in RAM.
+    """
+
+    kind = None
+    quantizer_cls = None
+
+    def __init__(self, embeddings, quantizer, codes, rerank=QUANTIZED_RERANK):
+        self.embeddings = embeddings
+        self.quantizer = quantizer
+        self.codes = codes
+        self.rerank = rerank
+
+    @classmethod
+    def build(cls, embeddings, rerank=QUANTIZED_RERANK, **params):
+        quantizer = cls.quantizer_cls.train(embeddings, **params)
+        return cls(embeddings, quantizer, quantizer.encode(embeddings), rerank=rerank)
+
+    def search(self, queries, k, rerank=None, mask=None):
+        queries = _normalize(_as_queries(queries))
+        rerank = self.rerank if rerank is None else rerank
+        if not rerank:
+            return self.quantizer.search(queries, self.codes, k, mask=mask)
+
+        _, candidates = self.quantizer.search(queries, self.codes, k * rerank, mask=mask)
+        all_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        all_indices = np.full(all_scores.shape, -1, dtype=np.int64)
+        for qi, ids in enumerate(candidates):
+            ids = np.sort(ids[ids >= 0])  # sequential reads from the memory-mapped matrix
+            if len(ids) == 0:
+                continue
+            scores = np.asarray(self.embeddings[ids], dtype=np.float32) @ queries[qi]
+            top_scores, order = select_topk(scores, k)
+            all_scores[qi, :len(order)] = top_scores
+            all_indices[qi, :len(order)] = ids[order]
+        return all_scores, all_indices
+
+    def extend(self, embeddings):
+        """Encode the rows of `embeddings` past the indexed ones with the existing quantizer."""
+        codes = np.concatenate([self.codes, self.quantizer.encode(embeddings[len(self.codes):])])
+        return type(self)(embeddings, self.quantizer, codes, rerank=self.rerank)
+
+    def compact(self, keep, embeddings):
+        return type(self)(embeddings, self.quantizer, self.codes[keep], rerank=self.rerank)
+
+    def code_bytes(self):
+        return self.codes.nbytes
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            np.savez(f, kind=np.array(self.kind), codes=self.codes, rerank=np.array(self.rerank),
+                     **self.quantizer.state())
+
+    @classmethod
+    def load(cls, path, embeddings):
+        with np.load(path, allow_pickle=False) as data:
+            if len(data["codes"]) != len(embeddings):
+                raise ValueError(f"{cls.kind} index {path} was built for a different catalog size")
+            state = {key: data[key] for key in data.files if key not in ("kind", "codes", "rerank")}
+            return cls(embeddings, cls.quantizer_cls(**state), data["codes"], rerank=int(data["rerank"]))
+
+
+class SQ8Index(QuantizedIndex):
+    kind = "sq8"
+    quantizer_cls = ScalarQuantizer
+
+
+class PQIndex(QuantizedIndex):
+    kind = "pq"
+    quantizer_cls = ProductQuantizer
+
+
+# -----------------------------------------------
+# REGISTRY
+# -----------------------------------------------
+INDEX_TYPES = {
+    FlatIndex.kind: FlatIndex,
+    IVFIndex.kind: IVFIndex,
+    SQ8Index.kind: SQ8Index,
+    PQIndex.kind: PQIndex,
+}
+
+
+def build_index(kind, embeddings, **params):
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type '{kind}'. Choose from: {', '.join(INDEX_TYPES)}")
+    return INDEX_TYPES[kind].build(embeddings, **params)
+
+
+def load_index(path, embeddings):
+    with np.load(path, allow_pickle=False) as data:
+        kind = str(data["kind"])
+    return INDEX_TYPES[kind].load(path, embeddings)
+
+
+def index_path(artifact_dir, kind):
+    return os.path.join(artifact_dir, f"index_{kind}.npz")
@@ -0,0 +1,388 @@
+import os
+import json
+import threading
+import time
+from functools import partial
+import pandas as pd
+import numpy as np
+
+from utils.ann_index import CATALOG_INDEX, build_index, load_index, index_path
+from utils.filters import FilterIndex
+from utils.colour_features import ColourFeatures
+from utils.embedding_space import EMBEDDING_MODEL_CHECK, query_encoder_for
+from utils.logs import get_logger
+from utils.metrics import record_stage
+
+log = get_logger(__name__)
+
+# -----------------------------------------------
+# PATHS
+# -----------------------------------------------
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../"))
+
+CATALOG_METADATA_PATH = os.path.join(BASE_DIR, "data", "catalog_metadata.csv")
+CATALOG_EMBEDDINGS_NPY_PATH = os.path.join(BASE_DIR, "data", "catalog_embeddings.npy")  # scripts/compute_embeddings.py
+CATALOG_EMBEDDINGS_PATH = os.path.join(BASE_DIR, "data", "catalog_embeddings.pt")  # legacy torch format
+CATALOG_EMBEDDINGS_SPEC_PATH = os.path.join(BASE_DIR, "data", "catalog_embeddings.json")  # model they were built with
+CATALOG_FILENAMES_PATH = os.path.join(BASE_DIR, "data", "image_filenames.csv")
+CATALOG_COLOURS_PATH = os.path.join(BASE_DIR, "data", "catalog_colours.npz")  # scripts/compute_colour_features.py
+
+# Precompiled artifact written by scripts/build_catalog_artifact.py (preferred when present)
+CATALOG_ARTIFACT_DIR = os.getenv("CATALOG_ARTIFACT_DIR", os.path.join(BASE_DIR, "data", "catalog_artifact"))
+CATALOG_MANIFEST_PATH = os.path.join(CATALOG_ARTIFACT_DIR, "manifest.json")
+CATALOG_ARTIFACT_COLOURS_PATH = os.path.join(CATALOG_ARTIFACT_DIR, "colours.npz")
+# Rows deleted or replaced by `scripts/compute_embeddings.py --incremental`
+CATALOG_TOMBSTONES_PATH = os.path.join(CATALOG_ARTIFACT_DIR, "tombstones.npy")
+
+# How often (seconds) the store re-checks the files on disk for changes
+CATALOG_RELOAD_INTERVAL = float(os.getenv("CATALOG_RELOAD_INTERVAL", "30"))
+
+# Extra catalogs served side by side, each an artifact directory with its own embedding model:
+# "name=dir,name=dir"; requests pick one by name, the catalog above is "default"
+CATALOG_SPACES = os.getenv("CATALOG_SPACES", "")
+DEFAULT_CATALOG_SPACE = "default"
+
+
+# -----------------------------------------------
+# LOAD CATALOG DATA
+# -----------------------------------------------
+def load_embeddings_file(path):
+    """compute_embeddings.py output: a .npy matrix (memory-mapped) or the legacy torch .pt tensor."""
+    if path.endswith(".npy"):
+        return np.load(path, mmap_mode="r")
+    import torch  # only the legacy .pt format needs torch
+    return torch.load(path).numpy()
+
+
+def load_catalog():
+    """
+    Read metadata, embeddings and filenames from disk and align them.
+
+    Returns: (metadata DataFrame, contiguous float32 embedding matrix)
+    """
+    log.info("✅ Loading catalog metadata...")
+    df = pd.read_csv(CATALOG_METADATA_PATH)
+
+    log.info("✅ Loading catalog embeddings...")
+    embeddings_path = CATALOG_EMBEDDINGS_NPY_PATH if os.path.exists(CATALOG_EMBEDDINGS_NPY_PATH) else CATALOG_EMBEDDINGS_PATH
+    embeddings = load_embeddings_file(embeddings_path)
+
+    log.info("✅ Loading embedding filenames...")
+    filenames_df = pd.read_csv(CATALOG_FILENAMES_PATH)  # assumes header is present
+    filenames_df.rename(columns={filenames_df.columns[0]: "path"}, inplace=True)
+
+    # Extract ID from path (e.g., '/kaggle/.../images/31973.jpg' → 31973)
+    filenames_df["id"] = filenames_df["path"].map(lambda p: int(os.path.splitext(os.path.basename(p))[0]))
+    filenames_df["embedding_idx"] = np.arange(len(filenames_df))
+
+    # Merge on 'id' to align metadata with embeddings
+    df = df.merge(filenames_df, on="id")
+
+    # Images compute_embeddings.py could not read have zero rows: leave them out
+    spec_path = embedding_spec_path(embeddings_path)
+    if os.path.exists(spec_path):
+        with open(spec_path) as f:
+            unreadable_rows = json.load(f).get("unreadable_rows") or []
+        df = df[~df["embedding_idx"].isin(unreadable_rows)]
+
+    # Filter embeddings to match aligned metadata
+    aligned_embeddings = embeddings[df["embedding_idx"].values]
+    aligned_embeddings = np.ascontiguousarray(aligned_embeddings, dtype=np.float32)
+
+    log.info(f"✅ Final aligned catalog items: {len(df)}")
+
+    df = df.drop(columns=["embedding_idx"]).reset_index(drop=True)
+    return df, aligned_embeddings
+
+
+def load_catalog_artifact(artifact_dir=CATALOG_ARTIFACT_DIR):
+    """
+    Load the precompiled artifact: metadata columns are already in embedding
+    order and embeddings.npy is memory-mapped read-only, so worker processes
+    share its pages through the OS page cache instead of holding private copies.
+    """
+    with open(os.path.join(artifact_dir, "manifest.json")) as f:
+        manifest = json.load(f)
+
+    log.info(f"✅ Loading catalog artifact from {artifact_dir}...")
+    with np.load(os.path.join(artifact_dir, "metadata.npz"), allow_pickle=False) as columns:
+        df = pd.DataFrame({col: columns[col] for col in manifest["columns"]})
+
+    embeddings = np.load(os.path.join(artifact_dir, "embeddings.npy"), mmap_mode="r")
+    if len(embeddings) > manifest["count"]:
+        # Rows appended by an incremental update whose manifest is not written yet
+        embeddings = embeddings[:manifest["count"]]
+    if embeddings.shape != (manifest["count"], manifest["dim"]) or len(df) != manifest["count"]:
+        raise ValueError(f"Catalog artifact in {artifact_dir} is inconsistent with its manifest")
+    # float16 artifacts stay memory-mapped too; the top-k search upcasts chunk by chunk
+
+    log.info(f"✅ Final aligned catalog items: {len(df)}")
+    return df, embeddings
+
+
+def load_catalog_auto():
+    """Prefer the precompiled artifact; fall back to joining the CSVs and .pt file."""
+    if os.path.exists(CATALOG_MANIFEST_PATH):
+        return load_catalog_artifact()
+    return load_catalog()
+
+
+def load_or_build_index(embeddings, kind=CATALOG_INDEX, artifact_dir=CATALOG_ARTIFACT_DIR):
+    """
+    Use the prebuilt index from the artifact directory when it matches the
+    loaded catalog, otherwise build one in memory.
+    """
+    path = index_path(artifact_dir, kind)
+    if kind != "flat" and os.path.exists(os.path.join(artifact_dir, "manifest.json")) and os.path.exists(path):
+        try:
+            log.info(f"✅ Loading {kind} index from {path}...")
+            return load_index(path, embeddings)
+        except Exception as e:
+            log.warning(f"❌ Could not load {path}, rebuilding: {e}")
+    log.info(f"✅ Building {kind} index over {len(embeddings)} items...")
+    return build_index(kind, embeddings)
+
+
+def load_colour_features(paths=(CATALOG_ARTIFACT_COLOURS_PATH, CATALOG_COLOURS_PATH)):
+    """Precomputed per-item colours (artifact first, then the standalone file), or None."""
+    for path in paths:
+        if os.path.exists(path):
+            try:
+                colours = ColourFeatures.load(path)
+                log.info(f"✅ Loaded colour features for {len(colours)} items from {path}")
+                return colours
+            except Exception as e:
+                log.warning(f"❌ Could not load colour features from {path}: {e}")
+    return None
+
+
+def load_tombstones(count, artifact_dir=CATALOG_ARTIFACT_DIR):
+    """Bool mask of the artifact rows deleted by incremental updates, or None if there are none."""
+    path = os.path.join(artifact_dir, "tombstones.npy")
+    if not (os.path.exists(os.path.join(artifact_dir, "manifest.json")) and os.path.exists(path)):
+        return None
+    deleted = np.load(path, allow_pickle=False)
+    if len(deleted) != count:
+        raise ValueError(f"{path} has {len(deleted)} rows, the catalog {count}")
+    return deleted if deleted.any() else None
+
+
+def embedding_spec_path(embeddings_path):
+    """Where compute_embeddings.py records the model an embedding file was built with."""
+    return os.path.splitext(embeddings_path)[0] + ".json"
+
+
+def load_embedding_spec(artifact_dir=CATALOG_ARTIFACT_DIR, spec_path=CATALOG_EMBEDDINGS_SPEC_PATH):
+    """
+    Embedding model of the catalog (see utils/embedding_space.py): the artifact
+    manifest's "embedding" entry, else the spec next to the raw embedding file.
+    None for catalogs built before specs were recorded.
+    """
+    manifest_path = os.path.join(artifact_dir, "manifest.json")
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            return json.load(f).get("embedding")
+    if spec_path and os.path.exists(spec_path):
+        with open(spec_path) as f:
+            spec = json.load(f)
+        spec.pop("unreadable_rows", None)  # build bookkeeping, not part of the model description
+        return spec
+    return None
+
+
+def catalog_signature(paths):
+    """
+    Cheap change detector for the catalog files: (path, mtime_ns, size) per file.
+    Missing files are reported with None so that their appearance counts as a change.
+    """
+    signature = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            signature.append((path, st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            signature.append((path, None, None))
+    return tuple(signature)
+
+
+# -----------------------------------------------
+# PROCESS-WIDE CATALOG STORE
+# -----------------------------------------------
+class CatalogSnapshot:
+    """
+    Immutable view of one loaded catalog version.
+    Requests keep a reference to the snapshot they started with, so a reload
+    never changes the data underneath an in-flight search.
+    """
+
+    def __init__(self, metadata, embeddings, index, filters, signature, colours=None, deleted=None,
+                 embedding_spec=None):
+        self.metadata = metadata
+        self.embeddings = embeddings
+        self.index = index
+        self.filters = filters
+        self.signature = signature
+        self.colours = colours
+        self.deleted = deleted  # tombstoned rows (bool mask) or None
+        self.embedding_spec = embedding_spec  # model the embeddings come from, or None if unrecorded
+        self.loaded_at = time.time()
+        self._rows_by_id = None
+        self._colour_matrix = None
+
+    def __len__(self):
+        return len(self.metadata)
+
+    def row_for_id(self, item_id):
+        """Metadata row of a live catalog item id (int or str), or None."""
+        if self._rows_by_id is None:
+            ids = self.metadata["id"].astype(str)
+            self._rows_by_id = {
+                item_id: row for row, item_id in enumerate(ids)
+                if self.deleted is None or not self.deleted[row]
+            }
+        return self._rows_by_id.get(str(item_id))
+
+    def colour_matrix(self):
+        """
+        Dominant RGB per metadata row as (N, 3) float32, plus a bool mask of the
+        rows that have precomputed colours (all False without colour features).
+        """
+        if self._colour_matrix is None:
+            rgb = np.zeros((len(self.metadata), 3), dtype=np.float32)
+            present = np.zeros(len(self.metadata), dtype=bool)
+            if self.colours is not None:
+                rows = [self.colours.row(i) for i in self.metadata["id"].astype(str)]
+                present = np.array([r is not None for r in rows], dtype=bool)
+                rgb[present] = self.colours.dominant_rgb[[r for r in rows if r is not None]]
+            self._colour_matrix = (rgb, present)
+        return self._colour_matrix
+
+
+class CatalogStore:
+    """
+    Loads the catalog once per process and hot-reloads it when the files change.
+
+    get() returns the current snapshot. At most every `reload_interval` seconds
+    it stats the source files; if their mtime/size changed, a new snapshot is
+    built off to the side and swapped in with a single reference assignment.
+    """
+
+    def __init__(self, loader=load_catalog_auto, index_factory=load_or_build_index, paths=None,
+                 reload_interval=CATALOG_RELOAD_INTERVAL, colour_loader=load_colour_features,
+                 tombstone_loader=load_tombstones, spec_loader=load_embedding_spec):
+        self._loader = loader
+        self._index_factory = index_factory
+        self._colour_loader = colour_loader
+        self._tombstone_loader = tombstone_loader
+        self._spec_loader = spec_loader
+        self._paths = paths or [
+            CATALOG_MANIFEST_PATH, CATALOG_METADATA_PATH, CATALOG_EMBEDDINGS_NPY_PATH, CATALOG_EMBEDDINGS_PATH,
+            CATALOG_FILENAMES_PATH, CATALOG_EMBEDDINGS_SPEC_PATH,
+            index_path(CATALOG_ARTIFACT_DIR, CATALOG_INDEX), CATALOG_ARTIFACT_COLOURS_PATH, CATALOG_COLOURS_PATH,
+            CATALOG_TOMBSTONES_PATH,
+        ]
+        self._reload_interval = reload_interval
+        self._snapshot = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_artifact(cls, artifact_dir):
+        """Store for another catalog artifact directory (an extra embedding space)."""
+        colours_path = os.path.join(artifact_dir, "colours.npz")
+        return cls(
+            loader=partial(load_catalog_artifact, artifact_dir),
+            index_factory=partial(load_or_build_index, artifact_dir=artifact_dir),
+            paths=[
+                os.path.join(artifact_dir, "manifest.json"), index_path(artifact_dir, CATALOG_INDEX),
+                colours_path, os.path.join(artifact_dir, "tombstones.npy"),
+            ],
+            colour_loader=partial(load_colour_features, (colours_path,)),
+            tombstone_loader=partial(load_tombstones, artifact_dir=artifact_dir),
+            spec_loader=partial(load_embedding_spec, artifact_dir, None),
+        )
+
+    def get(self):
+        snapshot = self._snapshot
+        if snapshot is None:
+            return self._load()
+        if time.monotonic() - self._last_check >= self._reload_interval:
+            # Only one thread reloads; the rest keep serving the current snapshot
+            if self._lock.acquire(blocking=False):
+                try:
+                    self._last_check = time.monotonic()
+                    if catalog_signature(self._paths) != snapshot.signature:
+                        self._load_locked()
+                except Exception as e:
+                    log.error(f"❌ Catalog reload failed, keeping previous version: {e}")
+                finally:
+                    self._lock.release()
+        return self._snapshot
+
+    def is_loaded(self):
+        return self._snapshot is not None
+
+    def current(self):
+        """The loaded snapshot as is (None before the first load): no staleness check, never reloads."""
+        return self._snapshot
+
+    def reload(self):
+        """Force a reload regardless of the file signature."""
+        return self._load(force=True)
+
+    def _load(self, force=False):
+        with self._lock:
+            if self._snapshot is None or force:
+                self._load_locked()
+            return self._snapshot
+
+    def _load_locked(self):
+        # Stat before reading so a write that lands mid-load triggers another reload
+        signature = catalog_signature(self._paths)
+        start = time.perf_counter()
+        metadata, embeddings = self._loader()
+        deleted = self._tombstone_loader(len(metadata)) if self._tombstone_loader is not None else None
+        index = self._index_factory(embeddings)
+        filters = FilterIndex.build(metadata, deleted=deleted)
+        colours = self._colour_loader() if self._colour_loader is not None else None
+        spec = self._spec_loader() if self._spec_loader is not None else None
+        # Pick (and hash) the matching query encoder now rather than on the first request
+        try:
+            if query_encoder_for(spec) is None:
+                log.warning(f"❌ No query encoder matches this catalog's embeddings "
+                            f"(EMBEDDING_MODEL_CHECK={EMBEDDING_MODEL_CHECK})",
+                            extra={"embedding": (spec or {}).get("model_id")})
+        except Exception as e:
+            log.error(f"❌ Could not resolve the catalog's query encoder, will retry on first request: {e}")
+        self._snapshot = CatalogSnapshot(metadata, embeddings, index, filters, signature, colours, deleted, spec)
+        self._last_check = time.monotonic()
+        seconds = time.perf_counter() - start
+        record_stage("catalog_load", seconds)
+        log.info(f"✅ Catalog ready: {len(metadata)} items in {seconds:.2f}s",
+                 extra={"items": len(metadata), "seconds": round(seconds, 3)})
+
+
+catalog_store = CatalogStore()
+
+
+def parse_catalog_spaces(value):
+    """"name=dir,name=dir" -> {name: dir}"""
+    spaces = {}
+    for entry in filter(None, (part.strip() for part in value.split(","))):
+        name, _, artifact_dir = entry.partition("=")
+        if not artifact_dir:
+            raise ValueError(f"CATALOG_SPACES entry {entry!r} must look like name=artifact_dir")
+        spaces[name.strip()] = artifact_dir.strip()
+    return spaces
+
+
+# Every embedding space this process serves, by name
+catalog_spaces = {DEFAULT_CATALOG_SPACE: catalog_store}
+for _name, _artifact_dir in parse_catalog_spaces(CATALOG_SPACES).items():
+    catalog_spaces[_name] = CatalogStore.for_artifact(_artifact_dir)
+
+
+def get_catalog():
+    """Return the current (metadata DataFrame, embedding matrix) for this process."""
+    snapshot = catalog_store.get()
+    return snapshot.metadata, snapshot.embeddings
@@ -0,0 +1,67 @@
+import numpy as np
+from PIL import Image
+
+from utils.palette import extract_palette, rgb_to_lab
+
+# ---------------- CONFIG ---------------- #
+COLOUR_THUMBNAIL_SIZE = (100, 100)   # same thumbnail generate_outfits.extract_dominant_color uses
+DOMINANT_COLOURS = 3                 # dominant colour = heaviest of 3 palette colours (as before)
+PALETTE_SIZE = 5                     # small Lab palette stored per item
+
+
+def compute_colour_features(image):
+    """
+    image: PIL image or path
+    Returns: (dominant RGB uint8 (3,), Lab palette float32 (PALETTE_SIZE, 3), palette weights float32 summing to 1)
+    """
+    if not isinstance(image, Image.Image):
+        image = Image.open(image)
+    pixels = np.asarray(image.convert("RGB").resize(COLOUR_THUMBNAIL_SIZE)).reshape(-1, 3)
+    dominant, _ = extract_palette(pixels, DOMINANT_COLOURS)
+    centres, weights = extract_palette(pixels, PALETTE_SIZE)
+    return (
+        np.clip(np.rint(dominant[0]), 0, 255).astype(np.uint8),
+        rgb_to_lab(centres).astype(np.float32),
+        (weights / weights.sum()).astype(np.float32),
+    )
+
+
+class ColourFeatures:
+    """
+    Precomputed colour features for catalog items, row-aligned arrays looked up
+    by item id. Built offline by scripts/compute_colour_features.py and shipped
+    in the catalog artifact as colours.npz.
+    """
+
+    def __init__(self, ids, dominant_rgb, palette_lab, palette_weights):
+        self.ids = np.asarray(ids).astype(str)
+        self.dominant_rgb = np.asarray(dominant_rgb, dtype=np.uint8)
+        self.palette_lab = np.asarray(palette_lab, dtype=np.float32)
+        self.palette_weights = np.asarray(palette_weights, dtype=np.float32)
+        self._rows = {item_id: row for row, item_id in enumerate(self.ids)}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def row(self, item_id):
+        """Row of `item_id` (int or str), or None if the item has no precomputed features."""
+        return self._rows.get(str(item_id))
+
+    def dominant_color(self, item_id):
+        row = self.row(item_id)
+        return None if row is None else tuple(int(c) for c in self.dominant_rgb[row])
+
+    def subset(self, item_ids):
+        """Features restricted to `item_ids` that are present, in that order."""
+        rows = [r for r in (self.row(i) for i in item_ids) if r is not None]
+        return ColourFeatures(self.ids[rows], self.dominant_rgb[rows], self.palette_lab[rows], self.palette_weights[rows])
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            np.savez(f, ids=self.ids, dominant_rgb=self.dominant_rgb,
+                     palette_lab=self.palette_lab, palette_weights=self.palette_weights)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data["ids"], data["dominant_rgb"], data["palette_lab"], data["palette_weights"])
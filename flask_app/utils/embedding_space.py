@@ -0,0 +1,189 @@
+import os
+import json
+import hashlib
+import threading
+
+from utils.logs import get_logger
+from utils.model_registry import CLIP_MODEL_PATH, models
+
+log = get_logger(__name__)
+
+# ---------------- CONFIG ---------------- #
+# When the catalog was embedded by another model than the query encoder and no matching
+# encoder is available locally: "refuse" (error), "warn" (search anyway, scores are meaningless), "off"
+EMBEDDING_MODEL_CHECK = os.getenv("EMBEDDING_MODEL_CHECK", "refuse")
+
+WEIGHT_FILE_EXTENSIONS = (".safetensors", ".bin")
+
+
+class EmbeddingModelMismatch(ValueError):
+    """The catalog vectors and the query vectors come from different embedding models."""
+
+
+# ---------------- ENCODER DESCRIPTION ---------------- #
+_hash_cache = {}
+_hash_lock = threading.Lock()
+
+
+def resolve_model_dir(model_path):
+    """Local directory of a model path or Hugging Face id (from the local cache only), or None."""
+    if os.path.isdir(model_path):
+        return os.path.abspath(model_path)
+    try:
+        from huggingface_hub import snapshot_download
+        return snapshot_download(model_path, local_files_only=True)
+    except Exception:
+        return None
+
+
+def weights_hash(model_dir):
+    """sha256 over the model's weight files (name + bytes, sorted by name); cached per file stat."""
+    files = sorted(f for f in os.listdir(model_dir) if f.endswith(WEIGHT_FILE_EXTENSIONS))
+    if not files:
+        return None
+    paths = [os.path.join(model_dir, f) for f in files]
+    key = tuple((p, os.stat(p).st_mtime_ns, os.stat(p).st_size) for p in paths)
+    with _hash_lock:
+        if key not in _hash_cache:
+            digest = hashlib.sha256()
+            for path in paths:
+                digest.update(os.path.basename(path).encode())
+                with open(path, "rb") as f:
+                    for block in iter(lambda: f.read(1 << 20), b""):
+                        digest.update(block)
+            _hash_cache[key] = digest.hexdigest()
+        return _hash_cache[key]
+
+
+def describe_encoder(model_path, dtype="float32"):
+    """
+    Provenance of embeddings produced by a CLIP image encoder, as stored in
+    the catalog manifest: model id, weights hash, dim, dtype, normalization.
+    """
+    model_dir = resolve_model_dir(model_path)
+    dim = None
+    if model_dir and os.path.exists(os.path.join(model_dir, "config.json")):
+        with open(os.path.join(model_dir, "config.json")) as f:
+            dim = json.load(f).get("projection_dim")
+    return {
+        "model_id": os.path.basename(os.path.normpath(model_path)),
+        "model_path": model_dir or model_path,
+        "weights_sha256": weights_hash(model_dir) if model_dir else None,
+        "dim": dim,
+        "dtype": dtype,
+        "normalization": "l2",
+    }
+
+
+def mismatch(catalog_spec, query_spec):
+    """Reasons the two embedding spaces differ (empty list = compatible). dtype is storage only."""
+    reasons = []
+    if catalog_spec.get("dim") and query_spec.get("dim") and catalog_spec["dim"] != query_spec["dim"]:
+        reasons.append(f"dim {catalog_spec['dim']} != {query_spec['dim']}")
+    if catalog_spec.get("weights_sha256") and query_spec.get("weights_sha256"):
+        if catalog_spec["weights_sha256"] != query_spec["weights_sha256"]:
+            reasons.append(f"weights {catalog_spec['model_id']} != {query_spec['model_id']}")
+    elif catalog_spec.get("model_id") != query_spec.get("model_id"):
+        reasons.append(f"model {catalog_spec.get('model_id')} != {query_spec.get('model_id')}")
+    if catalog_spec.get("normalization", "l2") != query_spec.get("normalization", "l2"):
+        reasons.append(f"normalization {catalog_spec.get('normalization')} != {query_spec.get('normalization')}")
+    return reasons
+
+
+# ---------------- QUERY ENCODER SELECTION ---------------- #
+_default_spec = None
+_encoder_names = {}  # catalog spec (JSON) -> registry name of its query encoder, or None
+_resolve_lock = threading.Lock()
+_register_lock = threading.Lock()
+_warned = set()
+
+
+def default_encoder_spec():
+    """Spec of the query encoder /analyze uses (CLIP_MODEL_PATH); hashed once per process."""
+    global _default_spec
+    if _default_spec is None:
+        _default_spec = describe_encoder(CLIP_MODEL_PATH)
+    return _default_spec
+
+
+def query_encoder_for(catalog_spec):
+    """
+    Registry name of a CLIP encoder that produces vectors in the catalog's space:
+    "clip" when the default encoder matches, otherwise the catalog's own model if
+    it is available locally (loaded on demand, torch backend). None if there is
+    none, or if the catalog does not record its model.
+
+    Resolved once per catalog spec (hashing weight files is slow); the catalog
+    store calls this when a catalog loads so requests find it cached.
+    """
+    if EMBEDDING_MODEL_CHECK == "off":
+        return "clip"
+    if catalog_spec is None:
+        return None  # built before manifests recorded the model: no way to tell its space
+    key = json.dumps(catalog_spec, sort_keys=True)
+    with _resolve_lock:
+        if key not in _encoder_names:
+            _encoder_names[key] = _resolve_query_encoder(catalog_spec)
+        return _encoder_names[key]
+
+
+def _resolve_query_encoder(catalog_spec):
+    if not mismatch(catalog_spec, default_encoder_spec()):
+        return "clip"
+
+    model_path = catalog_spec.get("model_path")
+    if not model_path or resolve_model_dir(model_path) is None:
+        return None
+    if mismatch(catalog_spec, describe_encoder(model_path)):
+        return None  # the local copy has different weights than the catalog was built with
+    name = f"clip@{catalog_spec['model_id']}"
+    with _register_lock:
+        if not models.is_registered(name):
+            models.register(name, lambda: load_clip_encoder(model_path))
+    return name
+
+
+def load_clip_encoder(model_path):
+    from utils.inference_backends import TorchClipEncoder
+    from utils.model_registry import load_clip_torch
+    return TorchClipEncoder(*load_clip_torch(model_path))
+
+
+def require_query_encoder(catalog_spec):
+    """
+    query_encoder_for(), for checking a request before any work is done on it.
+
+    Raises EmbeddingModelMismatch if no compatible encoder is available (or the
+    catalog does not record its model) and EMBEDDING_MODEL_CHECK is "refuse";
+    under "warn" logs once and returns None (search with the default embedding).
+    """
+    name = query_encoder_for(catalog_spec)
+    if name is not None:
+        return name
+
+    if catalog_spec is None:
+        message = ("Catalog embeddings do not record their model; rebuild them (scripts/compute_embeddings.py, "
+                   "scripts/build_catalog_artifact.py) or set EMBEDDING_MODEL_CHECK=warn to serve them anyway")
+    else:
+        reasons = ", ".join(mismatch(catalog_spec, default_encoder_spec()))
+        message = f"Catalog was embedded with {catalog_spec.get('model_id')} ({reasons}); no matching query encoder"
+    if EMBEDDING_MODEL_CHECK == "refuse":
+        raise EmbeddingModelMismatch(message)
+    if message not in _warned:
+        _warned.add(message)
+        log.warning(f"❌ {message}, searching anyway")
+    return None
+
+
+def query_embedding(catalog_spec, image, default_embedding):
+    """
+    The query vector to search a catalog with: `default_embedding` (from the
+    /analyze pipeline) when the spaces match, else a fresh embedding of
+    `image` by the catalog's encoder.
+
+    Raises EmbeddingModelMismatch as require_query_encoder() does.
+    """
+    name = require_query_encoder(catalog_spec)
+    if name is None or name == "clip":
+        return default_embedding
+    return models.get(name).embed([image])[0]
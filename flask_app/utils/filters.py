@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+
+# Metadata columns the recommender can filter on (ignored if the catalog lacks them)
+FILTER_COLUMNS = ["season", "baseColour", "gender", "masterCategory", "category", "aesthetic_category"]
+
+
+class FilterIndex:
+    """
+    Precomputed posting lists for metadata filters.
+
+    For every filterable column and every (lowercased) value, the sorted row
+    ids of the catalog items with that value. A query's filters are resolved by
+    intersecting the posting lists, smallest first, into a boolean row mask
+    that the top-k search applies directly; the catalog DataFrame and
+    embedding matrix are never sliced.
+
+    Rows tombstoned by an incremental catalog update are left out of every
+    posting list, and an unfiltered query resolves to the live rows.
+    """
+
+    def __init__(self, postings, size, live=None):
+        self.postings = postings  # {column: {value: sorted int32 row ids}}
+        self.size = size
+        self.live = live  # sorted int32 ids of the rows not tombstoned, None if there are no tombstones
+
+    @classmethod
+    def build(cls, metadata, columns=FILTER_COLUMNS, deleted=None):
+        postings = {}
+        for col in columns:
+            if col not in metadata.columns:
+                continue
+            values = metadata[col].fillna("").astype(str).str.strip().str.lower()
+            if deleted is not None:
+                values = values.where(~deleted, "")
+            codes, uniques = pd.factorize(values)
+            order = np.argsort(codes, kind="stable").astype(np.int32)
+            bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+            postings[col] = {
+                value: order[bounds[i]:bounds[i + 1]]
+                for i, value in enumerate(uniques) if value
+            }
+        live = np.flatnonzero(~deleted).astype(np.int32) if deleted is not None else None
+        return cls(postings, len(metadata), live)
+
+    def values(self, column):
+        return sorted(self.postings.get(column, {}))
+
+    def row_ids(self, filters):
+        """
+        filters: {column: value}; empty values and unknown columns are ignored.
+        Returns: sorted int32 row ids matching all filters, or None if nothing
+        was filtered and no row is tombstoned.
+        """
+        lists = []
+        for col, value in (filters or {}).items():
+            if not value or col not in self.postings:
+                continue
+            lists.append(self.postings[col].get(str(value).strip().lower(), np.empty(0, dtype=np.int32)))
+        if not lists:
+            return self.live
+        lists.sort(key=len)
+        ids = lists[0]
+        for other in lists[1:]:
+            if len(ids) == 0:
+                break
+            ids = np.intersect1d(ids, other, assume_unique=True)
+        return ids
+
+    def mask(self, filters):
+        """Boolean row mask for the filters, or None if nothing was filtered."""
+        ids = self.row_ids(filters)
+        if ids is None:
+            return None
+        mask = np.zeros(self.size, dtype=bool)
+        mask[ids] = True
+        return mask
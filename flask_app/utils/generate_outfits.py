@@ -1,17 +1,16 @@
 import numpy as np
 from PIL import Image
-from sklearn.cluster import KMeans
+
+from utils.palette import dominant_rgb
+from utils.outfit_pairing import top_pairs
 
 def extract_dominant_color(image_path, k=3):
     """
-    Extract dominant RGB color from image using KMeans.
+    Extract dominant RGB color from image (most populated of k palette colours).
     """
     image = Image.open(image_path).resize((100, 100)).convert('RGB')
     img_np = np.array(image).reshape(-1, 3)
-    kmeans = KMeans(n_clusters=k, n_init='auto')
-    kmeans.fit(img_np)
-    dominant_color = kmeans.cluster_centers_[np.argmax(np.bincount(kmeans.labels_))]
-    return tuple(map(int, dominant_color))
+    return dominant_rgb(img_np, k)
 
 
 def color_distance(c1, c2):
@@ -35,42 +34,92 @@ def score_pair(color1, color2):
         return 5   # bold contrast
 
 
-def generate_outfit_suggestions(tops, bottoms, top_n=5):
+# Catalog fields returned with items that are looked up by id
+CATALOG_ITEM_FIELDS = ["id", "productDisplayName", "baseColour", "image_path"]
+
+
+def item_features(item, catalog=None):
+    """
+    item: a catalog item id, or a dict with "id" and/or "image_path".
+
+    Live catalog items take their dominant colour from the precomputed colour
+    features (scripts/compute_colour_features.py); items without one (e.g.
+    uploads) are decoded from image_path. Raises KeyError for anything else,
+    including ids deleted from the catalog.
+    """
+    fields = dict(item) if isinstance(item, dict) else {"id": item}
+    item_id = fields.get("id")
+
+    # Only live items: a tombstoned or removed id keeps no precomputed colour
+    row = catalog.row_for_id(item_id) if catalog is not None and item_id is not None else None
+    if row is not None:
+        cols = [c for c in CATALOG_ITEM_FIELDS if c in catalog.metadata.columns]
+        fields = {**catalog.metadata.iloc[[row]][cols].to_dict(orient="records")[0], **fields}
+        color = catalog.colours.dominant_color(item_id) if catalog.colours is not None else None
+        if color is not None:
+            return {**fields, "dominant_color": color}
+
+    if fields.get("image_path"):
+        return {**fields, "dominant_color": extract_dominant_color(fields["image_path"])}
+    raise KeyError(f"Item {item_id!r} has no precomputed colour and no image_path")
+
+
+def item_embedding(fields, catalog=None):
+    """CLIP embedding of an item: its own clip_embedding, else the catalog's row, else None."""
+    if fields.get("clip_embedding") is not None:
+        return np.asarray(fields["clip_embedding"], dtype=np.float32)
+    if catalog is not None and fields.get("id") is not None:
+        row = catalog.row_for_id(fields["id"])
+        if row is not None:
+            return np.asarray(catalog.embeddings[row], dtype=np.float32)
+    return None
+
+
+def embedding_matrix(items, catalog):
+    """(N, D) embeddings with zero rows for items that have none, or None if no item has one."""
+    embeddings = [item_embedding(item, catalog) for item in items]
+    present = [e for e in embeddings if e is not None]
+    if not present:
+        return None
+    zero = np.zeros_like(present[0])
+    return np.stack([zero if e is None else e for e in embeddings])
+
+
+def generate_outfit_suggestions(tops, bottoms, top_n=5, catalog=None, clip_tie_break=True):
     """
     Generate top outfit suggestions from lists of tops and bottoms.
-    Each item must have:
+    Each item is either a catalog id or a dict with:
         - id
-        - image_path
+        - image_path (needed only for items without precomputed colours)
         - baseColour (optional)
+        - clip_embedding (optional, used to break score ties)
 
     Returns list of top N outfit pairs with score.
     """
-    top_features = []
-    for item in tops:
-        color = extract_dominant_color(item['image_path'])
-        top_features.append({
-            **item,
-            "dominant_color": color
-        })
-
-    bottom_features = []
-    for item in bottoms:
-        color = extract_dominant_color(item['image_path'])
-        bottom_features.append({
-            **item,
-            "dominant_color": color
-        })
+    top_features = [item_features(item, catalog) for item in tops]
+    bottom_features = [item_features(item, catalog) for item in bottoms]
+
+    top_embeddings = bottom_embeddings = None
+    if clip_tie_break:
+        top_embeddings = embedding_matrix(top_features, catalog)
+        bottom_embeddings = embedding_matrix(bottom_features, catalog)
+
+    # Vectorized scoring of every pair, only the best top_n become dicts
+    pairs = top_pairs(
+        np.array([t["dominant_color"] for t in top_features], dtype=np.float32).reshape(-1, 3),
+        np.array([b["dominant_color"] for b in bottom_features], dtype=np.float32).reshape(-1, 3),
+        top_n, top_embeddings, bottom_embeddings,
+    )
 
     outfits = []
-    for top in top_features:
-        for bottom in bottom_features:
-            score = score_pair(top["dominant_color"], bottom["dominant_color"])
-            outfits.append({
-                "top": top,
-                "bottom": bottom,
-                "score": score
-            })
-
-    # Sort and return top N
-    outfits_sorted = sorted(outfits, key=lambda x: x["score"], reverse=True)
-    return outfits_sorted[:top_n]
+    for i, j, score, compatibility in pairs:
+        outfit = {"top": public_fields(top_features[i]), "bottom": public_fields(bottom_features[j]), "score": score}
+        if compatibility is not None:
+            outfit["compatibility"] = round(compatibility, 4)
+        outfits.append(outfit)
+    return outfits
+
+
+def public_fields(item):
+    """Item as returned to the client (embeddings are not echoed back)."""
+    return {k: v for k, v in item.items() if k != "clip_embedding"}
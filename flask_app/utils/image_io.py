@@ -0,0 +1,63 @@
+import io
+import os
+from PIL import Image
+
+from utils.metrics import timed
+
+# ---------------- CONFIG ---------------- #
+# Large JPEGs are decoded at a reduced DCT scale whose shorter side stays >= this many pixels.
+# BLIP resizes to 384 and CLIP to 224, so nothing downstream ever sees the extra resolution.
+DECODE_DRAFT_SIZE = int(os.getenv("DECODE_DRAFT_SIZE", "512"))
+COLOR_THUMBNAIL_SIZE = (128, 128)
+
+
+class DecodedImage:
+    """
+    One upload, decoded once. Every pipeline stage (hashing, BLIP, colour
+    palette, CLIP) reads from this object instead of re-opening the file.
+    """
+
+    def __init__(self, data, image, name=None):
+        self.data = data          # original encoded bytes (for content hashing)
+        self.image = image        # RGB PIL image, possibly draft-reduced
+        self.name = name
+        self._thumbnail = None
+
+    def color_thumbnail(self):
+        """The 128x128 image the palette is computed from, built once."""
+        if self._thumbnail is None:
+            self._thumbnail = self.image.resize(COLOR_THUMBNAIL_SIZE)
+        return self._thumbnail
+
+
+def decode_image(source, name=None, draft_size=DECODE_DRAFT_SIZE):
+    """
+    source: encoded image bytes, a path, or a file-like object (e.g. a Flask upload stream)
+    Returns: DecodedImage
+    """
+    if isinstance(source, DecodedImage):
+        return source
+    if isinstance(source, (bytes, bytearray)):
+        data = bytes(source)
+    elif isinstance(source, (str, os.PathLike)):
+        name = name or os.fspath(source)
+        with open(source, "rb") as f:
+            data = f.read()
+    else:
+        data = source.read()
+
+    with timed("decode"):
+        image = Image.open(io.BytesIO(data))
+        if draft_size and image.format == "JPEG":
+            # Let libjpeg decode at 1/2, 1/4 or 1/8 scale instead of full resolution
+            image.draft("RGB", (draft_size, draft_size))
+        return DecodedImage(data, image.convert("RGB"), name=name)
+
+
+def as_rgb_image(source):
+    """Accept a DecodedImage, a PIL image or a path, and return an RGB PIL image."""
+    if isinstance(source, DecodedImage):
+        return source.image
+    if isinstance(source, Image.Image):
+        return source.convert("RGB")
+    return Image.open(source).convert("RGB")
@@ -0,0 +1,146 @@
+import os
+import json
+import numpy as np
+
+from utils.model_registry import (
+    BLIP_MODEL_PATH, CLIP_MODEL_PATH, INFERENCE_THREADS, ONNX_MODEL_DIR,
+    get_device, load_blip_torch, load_clip_torch,
+)
+
+# ---------------- CONFIG ---------------- #
+INFERENCE_BACKENDS = ["torch", "torch-int8-dynamic", "onnxruntime"]
+
+# Files written by scripts/export_models.py into ONNX_MODEL_DIR
+CLIP_IMAGE_ONNX = "clip_image_encoder.onnx"
+BLIP_VISION_ONNX = "blip_vision_encoder.onnx"
+BLIP_DECODER_ONNX = "blip_text_decoder.onnx"
+BLIP_GENERATION_CONFIG = "blip_generation.json"
+
+
+# ---------------- TORCH ---------------- #
+class TorchClipEncoder:
+    def __init__(self, processor, model):
+        self.processor = processor
+        self.model = model
+
+    def embed(self, images):
+        """L2-normalized CLIP image embeddings for a list of RGB PIL images, one forward pass."""
+        import torch
+        inputs = self.processor(images=images, return_tensors="pt").to(get_device())
+        with torch.no_grad():
+            embeddings = self.model.get_image_features(**inputs)
+            embeddings = embeddings / embeddings.norm(dim=-1, keepdim=True)
+        return [row.tolist() for row in embeddings.cpu().numpy()]
+
+
+class TorchBlipCaptioner:
+    def __init__(self, processor, model):
+        self.processor = processor
+        self.model = model
+
+    def caption(self, images):
+        """Caption a list of RGB PIL images with one batched generate() call."""
+        import torch
+        inputs = self.processor(images=images, return_tensors="pt").to(get_device())
+        with torch.no_grad():
+            out = self.model.generate(**inputs)
+        return self.processor.batch_decode(out, skip_special_tokens=True)
+
+
+def quantize_int8_dynamic(model):
+    """int8 weights for every nn.Linear, activations quantized on the fly (CPU only)."""
+    import torch
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+# ---------------- ONNX RUNTIME ---------------- #
+def onnx_session(filename):
+    import onnxruntime as ort
+    path = os.path.join(ONNX_MODEL_DIR, filename)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"{path} not found, run scripts/export_models.py first")
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if INFERENCE_THREADS > 0:
+        options.intra_op_num_threads = INFERENCE_THREADS
+    return ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+
+
+class OnnxClipEncoder:
+    def __init__(self, processor, session):
+        self.processor = processor
+        self.session = session
+
+    def embed(self, images):
+        pixel_values = self.processor(images=images, return_tensors="np")["pixel_values"].astype(np.float32)
+        (embeddings,) = self.session.run(None, {"pixel_values": pixel_values})
+        embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return [row.tolist() for row in embeddings]
+
+
+class OnnxBlipCaptioner:
+    """
+    BLIP split into an exported vision encoder and text decoder. Decoding is
+    greedy, which is what BlipForConditionalGeneration.generate() does with the
+    default generation config; the decoder is re-run on the whole prefix each
+    step (no KV cache), which is cheap at caption lengths.
+    """
+
+    def __init__(self, processor, vision, decoder, generation):
+        self.processor = processor
+        self.vision = vision
+        self.decoder = decoder
+        self.bos_token_id = generation["bos_token_id"]
+        self.sep_token_id = generation["sep_token_id"]
+        self.pad_token_id = generation["pad_token_id"]
+        self.max_length = generation["max_length"]
+
+    def caption(self, images):
+        pixel_values = self.processor(images=images, return_tensors="np")["pixel_values"].astype(np.float32)
+        (image_embeds,) = self.vision.run(None, {"pixel_values": pixel_values})
+
+        input_ids = np.full((len(images), 1), self.bos_token_id, dtype=np.int64)
+        finished = np.zeros(len(images), dtype=bool)
+        while input_ids.shape[1] < self.max_length and not finished.all():
+            (logits,) = self.decoder.run(None, {
+                "input_ids": input_ids,
+                "attention_mask": np.ones_like(input_ids),
+                "encoder_hidden_states": image_embeds,
+            })
+            next_ids = np.where(finished, self.pad_token_id, logits.argmax(axis=-1))
+            input_ids = np.concatenate([input_ids, next_ids[:, None]], axis=1)
+            finished |= next_ids == self.sep_token_id
+        return self.processor.batch_decode(input_ids, skip_special_tokens=True)
+
+
+# ---------------- FACTORIES ---------------- #
+def check_backend(backend):
+    if backend not in INFERENCE_BACKENDS:
+        raise ValueError(f"Unknown INFERENCE_BACKEND {backend!r}, expected one of {INFERENCE_BACKENDS}")
+
+
+def build_clip(backend):
+    check_backend(backend)
+    if backend == "onnxruntime":
+        from transformers import CLIPProcessor
+        return OnnxClipEncoder(CLIPProcessor.from_pretrained(CLIP_MODEL_PATH), onnx_session(CLIP_IMAGE_ONNX))
+    processor, model = load_clip_torch()
+    if backend == "torch-int8-dynamic":
+        model = quantize_int8_dynamic(model)
+    return TorchClipEncoder(processor, model)
+
+
+def build_blip(backend):
+    check_backend(backend)
+    if backend == "onnxruntime":
+        from transformers import BlipProcessor
+        with open(os.path.join(ONNX_MODEL_DIR, BLIP_GENERATION_CONFIG)) as f:
+            generation = json.load(f)
+        return OnnxBlipCaptioner(
+            BlipProcessor.from_pretrained(BLIP_MODEL_PATH),
+            onnx_session(BLIP_VISION_ONNX), onnx_session(BLIP_DECODER_ONNX), generation,
+        )
+    processor, model = load_blip_torch()
+    if backend == "torch-int8-dynamic":
+        model = quantize_int8_dynamic(model)
+    return TorchBlipCaptioner(processor, model)
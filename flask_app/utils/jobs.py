@@ -0,0 +1,188 @@
+import os
+import queue
+import threading
+import time
+import uuid
+
+from utils.logs import get_logger
+
+log = get_logger(__name__)
+
+# ---------------- CONFIG ---------------- #
+# Jobs live in this process's memory: serve the job API from a single worker (see gunicorn.conf.py)
+ANALYZE_JOBS = os.getenv("ANALYZE_JOBS", "1") == "1"
+ANALYZE_JOB_WORKERS = int(os.getenv("ANALYZE_JOB_WORKERS", "4"))      # jobs processed at once per process
+ANALYZE_JOB_QUEUE = int(os.getenv("ANALYZE_JOB_QUEUE", "32"))         # jobs waiting beyond that -> 429
+ANALYZE_JOB_TTL = float(os.getenv("ANALYZE_JOB_TTL", "300"))          # seconds a finished job stays readable
+
+TERMINAL_STATES = ("done", "failed", "cancelled")
+
+
+class QueueFull(Exception):
+    """The job queue is at its limit; the client should retry later."""
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    """
+    One queued pipeline run. Stage results are appended as events
+    (seq, stage, data); pollers read snapshot(), streamers wait in events_since().
+    """
+
+    def __init__(self, fn, args):
+        self.id = uuid.uuid4().hex
+        self.fn = fn
+        self.args = args
+        self.state = "queued"
+        self.stages = {}
+        self.events = []
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self._cancel = threading.Event()
+        self._changed = threading.Condition()
+
+    def emit(self, stage, data):
+        with self._changed:
+            self.stages[stage] = data
+            self.events.append((len(self.events) + 1, stage, data))
+            self._changed.notify_all()
+
+    def check_cancelled(self):
+        """Called between stages; a running job stops at the next stage boundary."""
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    def cancel(self):
+        self._cancel.set()
+        with self._changed:
+            if self.state == "queued":
+                self._finish("cancelled")
+
+    def _finish(self, state, error=None):
+        # caller holds self._changed; the payload (e.g. the decoded upload) is not kept for the TTL
+        self.fn = self.args = None
+        self.state = state
+        self.error = error
+        self.finished_at = time.time()
+        self.events.append((len(self.events) + 1, state, {"error": error} if error else {}))
+        self._changed.notify_all()
+
+    def finish(self, state, error=None):
+        with self._changed:
+            self._finish(state, error)
+
+    def start(self):
+        with self._changed:
+            if self.state != "queued":
+                return False
+            self.state = "running"
+            self.events.append((len(self.events) + 1, "running", {}))
+            self._changed.notify_all()
+            return True
+
+    def events_since(self, seq, timeout):
+        """Events after `seq`, waiting up to `timeout` seconds for one to arrive."""
+        with self._changed:
+            if len(self.events) <= seq and self.state not in TERMINAL_STATES:
+                self._changed.wait(timeout)
+            return self.events[seq:]
+
+    def snapshot(self):
+        with self._changed:
+            return {"job_id": self.id, "state": self.state, "stages": dict(self.stages), "error": self.error}
+
+
+class JobQueue:
+    """
+    Bounded pool for background jobs: `workers` threads take jobs from a queue
+    of at most `max_queued`; submit() raises QueueFull beyond that instead of
+    letting work pile up. Threads start on the first submit (and again in a
+    forked child).
+    """
+
+    def __init__(self, workers=ANALYZE_JOB_WORKERS, max_queued=ANALYZE_JOB_QUEUE, ttl=ANALYZE_JOB_TTL,
+                 name="analyze-job"):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.ttl = ttl
+        self.name = name
+        self._reset()
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._queue = queue.Queue(maxsize=self.max_queued)
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def _ensure_started(self):
+        if not self._threads:
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f"{self.name}-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, fn, *args):
+        """Queue fn(job, *args); its return value becomes the "done" event. Raises QueueFull."""
+        job = Job(fn, args)
+        with self._lock:
+            self._prune()
+            self._ensure_started()
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                raise QueueFull(f"{self._queue.qsize()} jobs already waiting")
+            self._jobs[job.id] = job
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            self._prune()
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job is not None:
+            job.cancel()
+        return job
+
+    def depth(self):
+        return self._queue.qsize()
+
+    def stats(self):
+        with self._lock:
+            self._prune()
+            states = [job.state for job in self._jobs.values()]
+        return {
+            "queued": self.depth(),
+            "running": states.count("running"),
+            "max_queued": self.max_queued,
+            "workers": self.workers,
+        }
+
+    def _prune(self):
+        # caller holds self._lock
+        cutoff = time.time() - self.ttl
+        for job_id, job in list(self._jobs.items()):
+            if job.finished_at is not None and job.finished_at < cutoff:
+                del self._jobs[job_id]
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if not job.start():
+                continue  # cancelled while queued
+            try:
+                result = job.fn(job, *job.args)
+                job.emit("result", result)
+                job.finish("done")
+            except JobCancelled:
+                job.finish("cancelled")
+            except Exception as e:
+                log.error(f"❌ Job {job.id} failed: {e}", extra={"job_id": job.id})
+                job.finish("failed", str(e))
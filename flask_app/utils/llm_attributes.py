@@ -0,0 +1,169 @@
+import os
+import re
+import json
+import time
+
+from utils.logs import get_logger
+from utils.openrouter import call_openrouter_concurrently
+from utils.prompt_cache import make_key, prompt_cache
+
+log = get_logger(__name__)
+
+# ---------------- CONFIG ---------------- #
+# "structured": one JSON prompt for all fields, per-field calls only for fields that fail validation
+# "per-field": the original four independent prompts
+LLM_ATTRIBUTE_MODE = os.getenv("LLM_ATTRIBUTE_MODE", "structured")
+
+SEASONS = ["Spring", "Summer", "Autumn", "Winter"]
+AESTHETIC_CATEGORIES = [
+    "Minimalist", "Boho", "Streetwear", "Casual Basics", "Preppy", "Activewear", "Lingerie/Intimate",
+    "Ethnic/Traditional", "Footwear", "Outerwear", "Accessories", "Formal", "Party", "Vintage",
+]
+ATTRIBUTE_FIELDS = ["season", "display_name", "aesthetic_category", "aesthetic_vibe"]
+
+# JSON keys the structured prompt asks for, mapped to the pipeline's field names
+STRUCTURED_KEYS = {
+    "season": "season",
+    "productDisplayName": "display_name",
+    "aesthetic_category": "aesthetic_category",
+    "aesthetic_vibe": "aesthetic_vibe",
+}
+
+
+# ---------------- PROMPTS ---------------- #
+def build_attribute_prompts(caption, colors):
+    return {
+        "season": f"""Given this description: "{caption}" and these colors: {colors}, predict the fashion season (Spring, Summer, Autumn, Winter). Return only the season word.""",
+        "display_name": f"""Given this description: "{caption}" and these colors: {colors}, suggest a product display name (e.g. "Casual Shirt", "Evening Dress"). Return only the name.""",
+        "aesthetic_category": f"""Given this description: "{caption}" and these colors: {colors}, choose ONE from these categories:
+{", ".join(AESTHETIC_CATEGORIES)}.
+Return only that category.""",
+        "aesthetic_vibe": f"""Given this description: "{caption}" and these colors: {colors}, write ONE short line describing the fashion vibe in 5-6 words, capturing style and mood.""",
+    }
+
+
+def build_structured_prompt(caption, colors):
+    return f"""Given this description: "{caption}" and these colors: {colors}, classify the item.
+Return ONLY a JSON object with exactly these keys:
+"season": one of {", ".join(SEASONS)},
+"productDisplayName": a product display name (e.g. "Casual Shirt", "Evening Dress"),
+"aesthetic_category": ONE of {", ".join(AESTHETIC_CATEGORIES)},
+"aesthetic_vibe": ONE short line describing the fashion vibe in 5-6 words, capturing style and mood."""
+
+
+# ---------------- VALIDATION ---------------- #
+def validate_season(value):
+    value = str(value).strip().strip(".").lower()
+    if value == "fall":
+        value = "autumn"
+    return value if value in [s.lower() for s in SEASONS] else None
+
+
+def validate_display_name(value):
+    value = str(value).strip().strip('"')
+    return value if 0 < len(value) <= 80 else None
+
+
+def validate_aesthetic_category(value):
+    value = str(value).strip().strip(".").lower()
+    for category in AESTHETIC_CATEGORIES:
+        if value == category.lower():
+            return category
+    return None
+
+
+def validate_aesthetic_vibe(value):
+    value = str(value).strip().strip('"')
+    return value if 0 < len(value) <= 120 else None
+
+
+VALIDATORS = {
+    "season": validate_season,
+    "display_name": validate_display_name,
+    "aesthetic_category": validate_aesthetic_category,
+    "aesthetic_vibe": validate_aesthetic_vibe,
+}
+
+
+def parse_structured_response(text):
+    """
+    Pull the JSON object out of an LLM answer (tolerating ```json fences or
+    surrounding prose) and validate each field.
+
+    Returns: dict {field: value} with only the fields that passed validation
+    """
+    match = re.search(r"\{.*\}", text or "", re.DOTALL)
+    if not match:
+        return {}
+    try:
+        payload = json.loads(match.group(0))
+    except json.JSONDecodeError:
+        return {}
+    if not isinstance(payload, dict):
+        return {}
+
+    fields = {}
+    for key, field in STRUCTURED_KEYS.items():
+        if key in payload and isinstance(payload[key], str):
+            value = VALIDATORS[field](payload[key])
+            if value is not None:
+                fields[field] = value
+    return fields
+
+
+def parses_cleanly(name, answer):
+    """True if the answer to prompt `name` passes validation as a whole (only those are cached)."""
+    if name == "structured":
+        return len(parse_structured_response(answer)) == len(ATTRIBUTE_FIELDS)
+    return VALIDATORS[name](answer) is not None
+
+
+# ---------------- ATTRIBUTE STAGE ---------------- #
+def ask_llm(prompts, caption, colors):
+    """
+    call_openrouter_concurrently with the prompt cache in front: prompts whose
+    (name, normalized caption, quantized palette) was answered before are not sent.
+    Answers that fail validation are returned but not cached, so they are asked again.
+    """
+    if prompt_cache is None:
+        return call_openrouter_concurrently(prompts)
+
+    answers, misses = {}, {}
+    for name, prompt in prompts.items():
+        key = make_key(name, caption, colors)
+        cached = prompt_cache.get(key)
+        if cached is not None:
+            answers[name] = cached
+        else:
+            misses[name] = (key, prompt)
+
+    if misses:
+        start = time.monotonic()
+        fresh = call_openrouter_concurrently({name: prompt for name, (_, prompt) in misses.items()})
+        latency = time.monotonic() - start
+        for name, (key, _) in misses.items():
+            answers[name] = fresh[name]
+            if fresh[name] and parses_cleanly(name, fresh[name]):
+                prompt_cache.put(key, fresh[name], latency)
+    return answers
+
+
+def predict_attributes(caption, colors, mode=LLM_ATTRIBUTE_MODE):
+    """
+    Ask the LLM for season, display name, aesthetic category and vibe.
+
+    Returns: dict with the four ATTRIBUTE_FIELDS; a field that could not be
+    obtained is "".
+    """
+    prompts = build_attribute_prompts(caption, colors)
+    if mode == "per-field":
+        return ask_llm(prompts, caption, colors)
+
+    answer = ask_llm({"structured": build_structured_prompt(caption, colors)}, caption, colors)["structured"]
+    fields = parse_structured_response(answer)
+
+    missing = [field for field in ATTRIBUTE_FIELDS if field not in fields]
+    if missing:
+        log.warning(f"❌ Structured LLM answer missing/invalid fields {missing}, falling back to per-field calls")
+        fields.update(ask_llm({field: prompts[field] for field in missing}, caption, colors))
+    return fields
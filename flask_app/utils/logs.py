@@ -0,0 +1,53 @@
+import os
+import sys
+import json
+import logging
+import contextvars
+
+# ---------------- CONFIG ---------------- #
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")  # "text": one readable line per event; "json": one JSON object per line
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+
+# Set per request by app.py so every line logged while serving it can be correlated
+request_id = contextvars.ContextVar("request_id", default=None)
+
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "request_id"}
+
+
+class JsonFormatter(logging.Formatter):
+    """Message plus every field passed with extra={...} and the current request id."""
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if request_id.get() is not None:
+            entry["request_id"] = request_id.get()
+        entry.update({k: v for k, v in vars(record).items() if k not in _RECORD_FIELDS})
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+def configure_logging(fmt=LOG_FORMAT, level=LOG_LEVEL, stream=None):
+    """Route the "stylespark" loggers to `stream` (default: stdout, where the prints used to go)."""
+    logger = logging.getLogger("stylespark")
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    handler = logging.StreamHandler(stream or sys.stdout)
+    handler.setFormatter(JsonFormatter() if fmt == "json" else logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(level.upper())
+    logger.propagate = False
+    return logger
+
+
+def get_logger(name):
+    """Logger for a module, e.g. get_logger(__name__) -> "stylespark.utils.catalog_store"."""
+    return logging.getLogger(f"stylespark.{name}")
+
+
+configure_logging()
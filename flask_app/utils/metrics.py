@@ -0,0 +1,193 @@
+import os
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+
+from utils.logs import get_logger
+
+log = get_logger(__name__)
+
+# ---------------- CONFIG ---------------- #
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"  # serve GET /metrics
+SERVER_TIMING = os.getenv("SERVER_TIMING", "0") == "1"  # add a Server-Timing header with the stages of each request
+
+# Seconds; from sub-millisecond stages (palette, top-k) up to LLM calls near their timeout
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (
+        (k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for k, v in labels
+    )
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+def format_value(value):
+    return repr(float(value)) if value == value else "NaN"
+
+
+# ---------------- METRIC TYPES ---------------- #
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def set(self, value, **labels):
+        # Counters: only for collectors mirroring a count kept elsewhere (e.g. cache stats)
+        with self._lock:
+            self._values[tuple(sorted(labels.items()))] = value
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+
+class Histogram:
+    """Cumulative buckets per label set, as Prometheus expects them."""
+    kind = "histogram"
+
+    def __init__(self, name, help, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self._series = {}  # labels -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def samples(self):
+        with self._lock:
+            series = {key: list(values) for key, values in self._series.items()}
+        samples = []
+        for key, values in series.items():
+            for bound, count in zip(self.buckets, values):
+                samples.append((f"{self.name}_bucket", key + (("le", format_value(bound)),), count))
+            samples.append((f"{self.name}_bucket", key + (("le", "+Inf"),), values[-2]))
+            samples.append((f"{self.name}_sum", key, values[-1]))
+            samples.append((f"{self.name}_count", key, values[-2]))
+        return samples
+
+
+# ---------------- REGISTRY ---------------- #
+class MetricsRegistry:
+    """
+    Process-local metrics in the Prometheus text format. Besides counters,
+    gauges and histograms updated in place, collectors are called at scrape
+    time to report state owned by other modules (queue depths, cache stats).
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, help, **kwargs):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = cls(name, help, **kwargs)
+            return self._metrics[name]
+
+    def counter(self, name, help):
+        return self._get_or_create(Counter, name, help)
+
+    def gauge(self, name, help):
+        return self._get_or_create(Gauge, name, help)
+
+    def histogram(self, name, help, buckets=LATENCY_BUCKETS):
+        return self._get_or_create(Histogram, name, help, buckets=buckets)
+
+    def collector(self, fn):
+        """fn() is called on every scrape, before rendering; it updates gauges/counters."""
+        self._collectors.append(fn)
+        return fn
+
+    def render(self):
+        for fn in self._collectors:
+            try:
+                fn()
+            except Exception as e:
+                log.warning(f"❌ Metrics collector {fn.__name__} failed: {e}")
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{format_labels(labels)} {format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+stage_seconds = metrics.histogram(
+    "stylespark_stage_seconds", "Latency of pipeline stages (decode, blip, palette, clip, llm, search, catalog_load)"
+)
+llm_call_seconds = metrics.histogram("stylespark_llm_call_seconds", "Latency of single LLM calls by prompt name")
+llm_calls = metrics.counter("stylespark_llm_calls_total", "LLM calls by prompt name and outcome (ok, error, timeout)")
+
+
+# ---------------- STAGE TIMING ---------------- #
+# Stages timed on the request's own thread also go into its Server-Timing header
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+
+
+def begin_request_timings():
+    _request_timings.set([])
+
+
+def end_request_timings():
+    """Server-Timing header value for the current request ("" if nothing was timed)."""
+    timings = _request_timings.get()
+    _request_timings.set(None)
+    return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings or [])
+
+
+def record_stage(stage, seconds):
+    stage_seconds.observe(seconds, stage=stage)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((stage, seconds))
+
+
+@contextmanager
+def timed(stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - start)
+
+
+# ---------------- PROCESS ---------------- #
+def resident_memory_bytes():
+    """Current RSS of this process (Linux /proc), or None elsewhere."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
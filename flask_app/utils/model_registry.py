@@ -0,0 +1,176 @@
+import os
+import time
+import threading
+
+from utils.logs import get_logger
+from utils.metrics import resident_memory_bytes
+
+log = get_logger(__name__)
+
+# ---------------- CONFIG ---------------- #
+# "background": start loading in a thread at startup; /healthz answers immediately, /readyz once loaded
+# "eager": load while the app is imported (use with gunicorn --preload so workers share the weights)
+# "lazy": load on the first request that needs the model
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "background")
+# Stream weights into place (and mmap .safetensors) instead of materializing a second copy in RAM
+MODEL_LOW_CPU_MEM = os.getenv("MODEL_LOW_CPU_MEM", "1") == "1"
+# "torch" (fp32), "torch-int8-dynamic" (int8 Linear layers) or "onnxruntime" (needs scripts/export_models.py)
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "torch")
+INFERENCE_THREADS = int(os.getenv("INFERENCE_THREADS", "0"))  # intra-op threads per model, 0 = library default
+
+# ---------------- MODEL PATHS ---------------- #
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+BLIP_MODEL_PATH = os.path.join(PROJECT_ROOT, "models", "blip_model", "blip_model")
+CLIP_MODEL_PATH = os.path.join(PROJECT_ROOT, "models", "clip-vit-base-patch32", "clip-vit-base-patch32")
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", os.path.join(PROJECT_ROOT, "models", "onnx"))
+
+_device = None
+
+
+def get_device():
+    """First torch touch point: picks the device and applies INFERENCE_THREADS."""
+    global _device
+    if _device is None:
+        import torch
+        if INFERENCE_THREADS > 0:
+            torch.set_num_threads(INFERENCE_THREADS)
+        # The int8 and ONNX backends are CPU-only
+        use_cuda = INFERENCE_BACKEND == "torch" and torch.cuda.is_available()
+        _device = "cuda" if use_cuda else "cpu"
+    return _device
+
+
+def pretrained_kwargs(model_path):
+    kwargs = {}
+    if MODEL_LOW_CPU_MEM:
+        kwargs["low_cpu_mem_usage"] = True
+        if os.path.isdir(model_path) and any(f.endswith(".safetensors") for f in os.listdir(model_path)):
+            kwargs["use_safetensors"] = True
+    return kwargs
+
+
+# ---------------- LOADERS ---------------- #
+def load_blip_torch(model_path=BLIP_MODEL_PATH):
+    from transformers import BlipProcessor, BlipForConditionalGeneration
+    processor = BlipProcessor.from_pretrained(model_path)
+    model = BlipForConditionalGeneration.from_pretrained(model_path, **pretrained_kwargs(model_path))
+    return processor, model.to(get_device()).eval()
+
+
+def load_clip_torch(model_path=CLIP_MODEL_PATH):
+    from transformers import CLIPProcessor, CLIPModel
+    processor = CLIPProcessor.from_pretrained(model_path)
+    model = CLIPModel.from_pretrained(model_path, **pretrained_kwargs(model_path))
+    return processor, model.to(get_device()).eval()
+
+
+def load_blip(backend=None):
+    """Returns a captioner with .caption(images) for the configured INFERENCE_BACKEND."""
+    from utils.inference_backends import build_blip
+    return build_blip(backend or INFERENCE_BACKEND)
+
+
+def load_clip(backend=None):
+    """Returns an encoder with .embed(images) for the configured INFERENCE_BACKEND."""
+    from utils.inference_backends import build_clip
+    return build_clip(backend or INFERENCE_BACKEND)
+
+
+# ---------------- REGISTRY ---------------- #
+class ModelRegistry:
+    """
+    Named models loaded on first use (or by warm_up). Each model loads exactly
+    once even when several request threads ask for it at the same time; a
+    failed load is recorded and retried on the next get().
+    """
+
+    def __init__(self):
+        self._loaders = {}
+        self._models = {}
+        self._locks = {}
+        self._loading = set()
+        self._errors = {}
+        self._load_seconds = {}
+        self._load_rss = {}  # resident memory added while loading (approximate if loads overlap)
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def register(self, name, loader):
+        self._loaders[name] = loader
+        self._locks[name] = threading.Lock()
+
+    def is_registered(self, name):
+        return name in self._loaders
+
+    def get(self, name):
+        model = self._models.get(name)
+        if model is not None:
+            return model
+        with self._locks[name]:
+            if name not in self._models:
+                log.info(f"✅ Loading {name.upper()}...")
+                self._loading.add(name)
+                start = time.monotonic()
+                rss_before = resident_memory_bytes()
+                try:
+                    self._models[name] = self._loaders[name]()
+                except Exception as e:
+                    self._errors[name] = str(e)
+                    log.error(f"❌ {name.upper()} failed to load: {e}", extra={"model": name})
+                    raise
+                finally:
+                    self._loading.discard(name)
+                self._errors.pop(name, None)
+                self._load_seconds[name] = round(time.monotonic() - start, 2)
+                rss_after = resident_memory_bytes()
+                if rss_before is not None and rss_after is not None:
+                    self._load_rss[name] = max(0, rss_after - rss_before)
+                log.info(f"✅ {name.upper()} loaded ({INFERENCE_BACKEND}) in {self._load_seconds[name]}s",
+                         extra={"model": name, "backend": INFERENCE_BACKEND, "seconds": self._load_seconds[name],
+                                "rss_delta_bytes": self._load_rss.get(name)})
+            return self._models[name]
+
+    def warm_up(self, names=None, background=True):
+        """Load `names` (default: all registered models), in a daemon thread if `background`."""
+        names = list(names or self._loaders)
+
+        def load_all():
+            for name in names:
+                try:
+                    self.get(name)
+                except Exception:
+                    pass  # recorded in status(); the next request retries
+
+        if not background:
+            load_all()
+            return None
+        thread = threading.Thread(target=load_all, name="model-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def is_ready(self, names=None):
+        return all(name in self._models for name in (names or self._loaders))
+
+    def status(self):
+        status = {}
+        for name in self._loaders:
+            if name in self._models:
+                status[name] = {"state": "loaded", "load_seconds": self._load_seconds[name],
+                                "rss_delta_bytes": self._load_rss.get(name)}
+            elif name in self._loading:
+                status[name] = {"state": "loading"}
+            elif name in self._errors:
+                status[name] = {"state": "failed", "error": self._errors[name]}
+            else:
+                status[name] = {"state": "not_loaded"}
+        return status
+
+    def _after_fork(self):
+        # A warm-up thread does not survive fork(): drop its half-held locks, keep finished models
+        self._locks = {name: threading.Lock() for name in self._loaders}
+        self._loading.clear()
+
+
+models = ModelRegistry()
+models.register("blip", load_blip)
+models.register("clip", load_clip)
@@ -0,0 +1,120 @@
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+
+from utils.logs import get_logger
+from utils.metrics import llm_call_seconds, llm_calls
+
+log = get_logger(__name__)
+
+# ---------------- CONFIG ---------------- #
+load_dotenv()
+OPENROUTER_API_KEY = os.getenv('OPENROUTER_API_KEY') or "YOUR_FALLBACK_KEY"
+OPENROUTER_URL = os.getenv("OPENROUTER_URL", "https://openrouter.ai/api/v1/chat/completions")
+OPENROUTER_MODEL = os.getenv("OPENROUTER_MODEL", "meta-llama/llama-3-8b-instruct")
+
+# LLM_DETERMINISTIC=1 forces temperature 0 so cached answers are the answers the model would give again
+LLM_TEMPERATURE = 0.0 if os.getenv("LLM_DETERMINISTIC") == "1" else float(os.getenv("LLM_TEMPERATURE", "0.7"))
+
+LLM_CALL_TIMEOUT = float(os.getenv("LLM_CALL_TIMEOUT", "30"))     # seconds, per call
+LLM_STAGE_BUDGET = float(os.getenv("LLM_STAGE_BUDGET", "35"))     # seconds, all calls of one image
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))  # in-flight calls per process
+
+# ---------------- SHARED HTTP CLIENT ---------------- #
+# One pooled session per process: calls reuse TCP/TLS connections instead of
+# opening a fresh one per prompt.
+session = requests.Session()
+session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=LLM_MAX_CONCURRENCY))
+session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=LLM_MAX_CONCURRENCY))
+
+executor = ThreadPoolExecutor(max_workers=LLM_MAX_CONCURRENCY, thread_name_prefix="openrouter")
+
+# Calls submitted to the pool and not finished (queued or running), for the metrics endpoint
+_pending = 0
+_pending_lock = threading.Lock()
+
+
+def _call_finished(future):
+    global _pending
+    with _pending_lock:
+        _pending -= 1
+
+
+def submit_call(fn, *args):
+    """executor.submit, counted in pending_calls() until the call finishes or is cancelled."""
+    global _pending
+    with _pending_lock:
+        _pending += 1
+    future = executor.submit(fn, *args)
+    future.add_done_callback(_call_finished)
+    return future
+
+
+def pending_calls():
+    with _pending_lock:
+        return _pending
+
+
+# ---------------- OPENROUTER LLM ---------------- #
+def call_openrouter(prompt, timeout=LLM_CALL_TIMEOUT):
+    headers = {
+        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
+        "Content-Type": "application/json"
+    }
+    data = {
+        "model": OPENROUTER_MODEL,
+        "messages": [
+            {"role": "system", "content": "You are a fashion stylist and classifier."},
+            {"role": "user", "content": prompt}
+        ],
+        "temperature": LLM_TEMPERATURE,
+        "max_tokens": 200
+    }
+    try:
+        response = session.post(OPENROUTER_URL, headers=headers, json=data, timeout=timeout)
+        result = response.json()
+        return result['choices'][0]['message']['content'].strip()
+    except Exception as e:
+        log.error(f"❌ LLM call error: {e}")
+        return ""
+
+
+def call_openrouter_concurrently(prompts, budget=LLM_STAGE_BUDGET, call=call_openrouter):
+    """
+    Run several prompts at once on the shared thread pool.
+
+    prompts: dict {name: prompt}
+    budget: overall deadline in seconds for the whole group; calls still
+        running when it expires are abandoned and come back as ""
+
+    Returns: dict {name: answer}; a failed or late call yields "" so the
+    caller still gets every other field.
+    """
+    def timed_call(name, prompt):
+        # Late calls are still observed when they finish: the histogram shows their real latency
+        call_start = time.perf_counter()
+        answer = call(prompt)
+        llm_call_seconds.observe(time.perf_counter() - call_start, call=name)
+        return answer
+
+    start = time.monotonic()
+    futures = {submit_call(timed_call, name, prompt): name for name, prompt in prompts.items()}
+    done, not_done = wait(futures, timeout=budget)
+
+    results = {}
+    for future, name in futures.items():
+        if future in done:
+            results[name] = future.result()
+            llm_calls.inc(call=name, outcome="ok" if results[name] else "error")
+        else:
+            future.cancel()
+            results[name] = ""
+            llm_calls.inc(call=name, outcome="timeout")
+            log.warning(f"❌ LLM call '{name}' missed the {budget:.0f}s stage budget")
+    log.info(f"✅ {len(prompts)} LLM calls finished in {time.monotonic() - start:.2f}s",
+             extra={"llm_calls": len(prompts), "seconds": round(time.monotonic() - start, 3)})
+    return results
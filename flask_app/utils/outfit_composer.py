@@ -0,0 +1,176 @@
+import os
+import time
+import numpy as np
+
+from utils.outfit_pairing import SCORE_VALUES, colour_scores, normalize_rows, select_top
+
+# ---------------- CONFIG ---------------- #
+OUTFIT_BEAM_WIDTH = int(os.getenv("OUTFIT_BEAM_WIDTH", "32"))
+OUTFIT_CANDIDATES_PER_SLOT = int(os.getenv("OUTFIT_CANDIDATES_PER_SLOT", "300"))
+OUTFIT_BUDGET_MS = float(os.getenv("OUTFIT_BUDGET_MS", "250"))
+OUTFIT_COLOUR_WEIGHT = float(os.getenv("OUTFIT_COLOUR_WEIGHT", "1.0"))
+OUTFIT_CLIP_WEIGHT = float(os.getenv("OUTFIT_CLIP_WEIGHT", "1.0"))
+
+# (slot name, metadata filters) in composition order; values match FilterIndex (case-insensitive)
+DEFAULT_SLOTS = [
+    ("top", {"masterCategory": "Apparel", "category": "Topwear"}),
+    ("bottom", {"masterCategory": "Apparel", "category": "Bottomwear"}),
+    ("shoes", {"masterCategory": "Footwear"}),
+    ("accessory", {"masterCategory": "Accessories"}),
+]
+
+# Catalog fields returned for each item of a look
+ITEM_FIELDS = ["id", "productDisplayName", "baseColour", "masterCategory", "category", "season"]
+
+
+class SlotPool:
+    """Candidate catalog rows for one slot, with the features the scorer needs gathered once."""
+
+    def __init__(self, name, rows, colours, has_colour, embeddings, unary):
+        self.name = name
+        self.rows = rows
+        self.colours = colours
+        self.has_colour = has_colour
+        self.embeddings = embeddings
+        self.unary = unary
+
+
+def build_pools(catalog, slots, filters, fixed, query, candidates_per_slot):
+    rgb, present = catalog.colour_matrix()
+    pools = []
+    for name, slot_filters in slots:
+        if name in fixed:
+            row = catalog.row_for_id(fixed[name])
+            if row is None:
+                raise KeyError(f"Item {fixed[name]!r} for slot {name!r} is not in the catalog")
+            rows = np.array([row])
+        else:
+            rows = catalog.filters.row_ids({**(filters or {}), **slot_filters})
+            rows = np.arange(len(catalog)) if rows is None else rows.astype(np.int64)
+        if len(rows) == 0:
+            raise ValueError(f"No catalog items match slot {name!r}")
+
+        unary = np.zeros(len(rows), dtype=np.float32)
+        if query is not None:
+            unary = normalize_rows(catalog.embeddings[rows]) @ query * OUTFIT_CLIP_WEIGHT
+        if len(rows) > candidates_per_slot:
+            # Keep the items closest to the query; without one, an even spread over the slot
+            if query is not None:
+                keep = np.sort(np.argpartition(-unary, candidates_per_slot - 1)[:candidates_per_slot])
+            else:
+                keep = np.unique(np.linspace(0, len(rows) - 1, candidates_per_slot).astype(np.int64))
+            rows, unary = rows[keep], unary[keep]
+
+        pools.append(SlotPool(name, rows, rgb[rows], present[rows], normalize_rows(catalog.embeddings[rows]), unary))
+    return pools
+
+
+def pair_gain(pool_from, picks, pool_to):
+    """
+    Compatibility of already chosen items (indices `picks` into pool_from, one
+    per beam state) with every candidate of pool_to: (len(picks), len(pool_to)).
+    Colour uses the outfit_pairing heuristic scaled to [0, 1]; items without a
+    precomputed colour contribute 0.
+    """
+    gain = OUTFIT_CLIP_WEIGHT * (pool_from.embeddings[picks] @ pool_to.embeddings.T)
+    colour = colour_scores(pool_from.colours[picks], pool_to.colours) / SCORE_VALUES.max()
+    colour *= pool_from.has_colour[picks][:, None] & pool_to.has_colour[None, :]
+    return gain + OUTFIT_COLOUR_WEIGHT * colour
+
+
+def beam_search(pools, width, banned, deadline, fallback_width):
+    """
+    One beam-search pass. `banned[s]` masks pool items that may not be used.
+    Returns: (beam picks (B, slots) best-first, scores (B,), budget_exhausted)
+    """
+    budget_exhausted = False
+    # beam_picks[b, s]: index into pools[s] chosen by beam state b
+    beam_picks = np.empty((1, 0), dtype=np.int64)
+    beam_scores = np.zeros(1, dtype=np.float32)
+    for s, pool in enumerate(pools):
+        if not budget_exhausted and time.monotonic() > deadline:
+            # Out of time: finish the remaining slots greedily
+            budget_exhausted = True
+            width = fallback_width
+            beam_picks, beam_scores = beam_picks[:width], beam_scores[:width]
+
+        totals = beam_scores[:, None] + pool.unary[None, :]
+        totals[:, banned[s]] = -np.inf
+        for t in range(s):
+            totals = totals + pair_gain(pools[t], beam_picks[:, t], pool)
+            # One catalog item cannot fill two slots of the same look
+            totals[pools[t].rows[beam_picks[:, t]][:, None] == pool.rows[None, :]] = -np.inf
+
+        keys, ids = select_top(totals.ravel(), np.arange(totals.size, dtype=np.int64), width)
+        keep = np.isfinite(keys)
+        states, picks = np.divmod(ids[keep], len(pool.rows))
+        beam_picks = np.hstack([beam_picks[states], picks[:, None]])
+        beam_scores = keys[keep].astype(np.float32)
+    return beam_picks, beam_scores, budget_exhausted
+
+
+def compose_outfits(catalog, slots=None, filters=None, fixed=None, query_embedding=None, top_n=5,
+                    beam_width=OUTFIT_BEAM_WIDTH, candidates_per_slot=OUTFIT_CANDIDATES_PER_SLOT,
+                    max_item_reuse=1, budget_ms=OUTFIT_BUDGET_MS):
+    """
+    Beam search over slots: every partial look is scored by the unary query
+    similarity of its items plus the pairwise colour/CLIP compatibility of all
+    item pairs; after each slot only the best `beam_width` partial looks are
+    extended. Looks are taken best-first while no item exceeds
+    `max_item_reuse`; if the beam runs dry, items at their cap are banned and
+    the search runs again. Once `budget_ms` is spent the beam narrows to one
+    state, so the remaining slots and passes are filled greedily: the budget
+    costs quality, not the number of looks. Fewer than `top_n` looks come back
+    only when the slots run out of items under the reuse cap.
+
+    catalog: CatalogSnapshot
+    slots: [(name, metadata filters)], default DEFAULT_SLOTS
+    filters: metadata filters applied to every slot (e.g. {"gender": "Women"})
+    fixed: {slot name: catalog id} items every look must contain (exempt from the reuse cap)
+    query_embedding: optional CLIP embedding the looks should stay close to
+    max_item_reuse: how many returned looks may share the same item
+
+    Returns: (list of {"items": {slot: item fields}, "score": float}, budget_exhausted)
+    """
+    deadline = time.monotonic() + budget_ms / 1000.0
+    slots = slots or DEFAULT_SLOTS
+    fixed = fixed or {}
+    query = None
+    if query_embedding is not None:
+        query = normalize_rows(np.asarray(query_embedding, dtype=np.float32).reshape(1, -1))[0]
+
+    pools = build_pools(catalog, slots, filters, fixed, query, candidates_per_slot)
+    width = max(beam_width, top_n)
+    banned = [np.zeros(len(pool.rows), dtype=bool) for pool in pools]
+    usage, looks, seen = {}, [], set()
+    budget_exhausted = False
+
+    for _ in range(top_n):
+        beam_picks, beam_scores, exhausted = beam_search(pools, width, banned, deadline, 1)
+        budget_exhausted |= exhausted
+        added = False
+        for picks, score in zip(beam_picks, beam_scores):
+            rows = tuple(int(pools[s].rows[p]) for s, p in enumerate(picks))
+            capped = [r for s, r in enumerate(rows) if pools[s].name not in fixed]
+            if rows in seen or any(usage.get(r, 0) >= max_item_reuse for r in capped):
+                continue
+            seen.add(rows)
+            for r in capped:
+                usage[r] = usage.get(r, 0) + 1
+            looks.append((list(rows), float(score)))
+            added = True
+            if len(looks) == top_n:
+                break
+        if len(looks) == top_n or not added:
+            break
+        # Next pass may not reuse items that reached their cap
+        for s, pool in enumerate(pools):
+            if pool.name not in fixed:
+                banned[s] |= np.array([usage.get(int(r), 0) >= max_item_reuse for r in pool.rows])
+
+    cols = [c for c in ITEM_FIELDS if c in catalog.metadata.columns]
+    outfits = []
+    for rows, score in looks:
+        records = catalog.metadata.iloc[rows][cols].to_dict(orient="records")
+        outfits.append({"items": {pool.name: record for pool, record in zip(pools, records)}, "score": round(score, 4)})
+    return outfits, budget_exhausted
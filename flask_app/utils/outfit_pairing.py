@@ -0,0 +1,103 @@
+import os
+import numpy as np
+
+# ---------------- CONFIG ---------------- #
+# Same heuristic as generate_outfits.score_pair: RGB distance < 40 -> 2 (plain),
+# < 120 -> 9 (complementary), otherwise 5 (bold contrast)
+SCORE_BIN_EDGES = np.array([40.0, 120.0], dtype=np.float32)
+SCORE_VALUES = np.array([2, 9, 5], dtype=np.float32)
+
+# Tops scored per block: peak memory is PAIRING_BLOCK_ROWS x len(bottoms) instead of the full matrix
+PAIRING_BLOCK_ROWS = int(os.getenv("PAIRING_BLOCK_ROWS", "256"))
+
+# CLIP cosine in [-1, 1] is mapped into [0, TIE_BREAK_SCALE) and added to the integer score;
+# it must stay below the smallest gap between score values (3) so it only breaks ties
+TIE_BREAK_SCALE = 0.5
+
+
+def colour_scores(colours_a, colours_b):
+    """
+    (A, 3) x (B, 3) RGB -> (A, B) float32 heuristic scores.
+    Squared distances come from one matmul (|a|^2 + |b|^2 - 2ab; exact in float32 for
+    integer RGB, all terms stay below 2^24) and are binned against the squared edges
+    with a table lookup, so there is no sqrt and no (A, B, 3) temporary.
+    """
+    a = np.asarray(colours_a, dtype=np.float32)
+    b = np.asarray(colours_b, dtype=np.float32)
+    d2 = a @ b.T
+    d2 *= -2
+    d2 += (a * a).sum(axis=1)[:, None]
+    d2 += (b * b).sum(axis=1)[None, :]
+    bins = (d2 >= SCORE_BIN_EDGES[0] ** 2).view(np.int8) + (d2 >= SCORE_BIN_EDGES[1] ** 2).view(np.int8)
+    return SCORE_VALUES[bins]
+
+
+def normalize_rows(embeddings):
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return embeddings / np.where(norms > 0, norms, 1.0)
+
+
+def select_top(keys, ids, n):
+    """
+    Best `n` of (keys, ids) by key descending, ties broken by smaller id,
+    using argpartition so only the selected items are sorted.
+    """
+    if len(keys) > n:
+        kth = keys[np.argpartition(-keys, n - 1)[:n]].min()
+        above = keys > kth
+        tied = np.flatnonzero(keys == kth)
+        need = n - int(above.sum())
+        if len(tied) > need:
+            # Coarse scores tie by the million: partition on id instead of sorting them all
+            tied = tied[np.argpartition(ids[tied], need - 1)[:need]]
+        keep = np.concatenate([np.flatnonzero(above), tied])
+        keys, ids = keys[keep], ids[keep]
+    order = np.lexsort((ids, -keys))
+    return keys[order], ids[order]
+
+
+def top_pairs(top_colours, bottom_colours, top_n=5, top_embeddings=None, bottom_embeddings=None,
+              block_rows=PAIRING_BLOCK_ROWS):
+    """
+    Best top_n (top, bottom) pairs without building every pair.
+
+    Scores a block of tops against all bottoms at a time and keeps a running
+    top_n. Equal scores are ordered by CLIP cosine when both embedding
+    matrices are given (rows of zeros count as neutral), otherwise by
+    (top index, bottom index), the order the original nested loop produced.
+
+    Returns: list of (top index, bottom index, score, compatibility or None)
+    """
+    n_bottoms = len(bottom_colours)
+    if len(top_colours) == 0 or n_bottoms == 0 or top_n <= 0:
+        return []
+    use_clip = top_embeddings is not None and bottom_embeddings is not None
+    if use_clip:
+        top_embeddings = normalize_rows(top_embeddings)
+        bottom_embeddings = normalize_rows(bottom_embeddings)
+
+    best_keys = np.empty(0, dtype=np.float32)
+    best_ids = np.empty(0, dtype=np.int64)
+    for start in range(0, len(top_colours), block_rows):
+        stop = min(start + block_rows, len(top_colours))
+        keys = colour_scores(top_colours[start:stop], bottom_colours)
+        if use_clip:
+            cosine = top_embeddings[start:stop] @ bottom_embeddings.T
+            keys += (np.clip(cosine, -1, 1) + 1) * (TIE_BREAK_SCALE / 2.0001)
+        keys = keys.ravel()
+        if len(best_keys) == top_n:
+            # Pair ids grow block by block, so a tie with the current n-th best never wins
+            candidates = np.flatnonzero(keys > best_keys[-1])
+        else:
+            candidates = np.arange(len(keys))
+        keys, ids = select_top(keys[candidates], start * n_bottoms + candidates.astype(np.int64), top_n)
+        best_keys, best_ids = select_top(np.concatenate([best_keys, keys]), np.concatenate([best_ids, ids]), top_n)
+
+    pairs = []
+    for key, pair_id in zip(best_keys, best_ids):
+        i, j = divmod(int(pair_id), n_bottoms)
+        score = int(np.floor(key))
+        compatibility = float(top_embeddings[i] @ bottom_embeddings[j]) if use_clip else None
+        pairs.append((i, j, score, compatibility))
+    return pairs
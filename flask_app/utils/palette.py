@@ -0,0 +1,157 @@
+import os
+import numpy as np
+
+# ---------------- CONFIG ---------------- #
+# "histogram-kmeans": weighted k-means over a quantized colour histogram (default)
+# "median-cut": recursive weighted median splits of the same histogram
+# "sklearn": the original sklearn KMeans fit on every pixel
+PALETTE_METHOD = os.getenv("PALETTE_METHOD", "histogram-kmeans")
+PALETTE_HIST_BITS = int(os.getenv("PALETTE_HIST_BITS", "5"))   # bits per channel: 5 -> 32^3 bins
+PALETTE_MAX_ITER = int(os.getenv("PALETTE_MAX_ITER", "20"))
+
+
+# ---------------- HISTOGRAM ---------------- #
+def colour_histogram(pixels, bits=PALETTE_HIST_BITS):
+    """
+    Bucket (N, 3) uint8 pixels into a 2^bits per channel colour cube.
+
+    Returns: (colours, weights) for the non-empty bins, where each colour is
+    the exact mean of the pixels in its bin (not the bin centre).
+    """
+    pixels = np.asarray(pixels, dtype=np.uint8).reshape(-1, 3)
+    shift = 8 - bits
+    q = (pixels >> shift).astype(np.int64)
+    bins = (q[:, 0] << (2 * bits)) | (q[:, 1] << bits) | q[:, 2]
+    n_bins = 1 << (3 * bits)
+    counts = np.bincount(bins, minlength=n_bins)
+    occupied = np.flatnonzero(counts)
+    sums = np.stack([np.bincount(bins, weights=pixels[:, c], minlength=n_bins)[occupied] for c in range(3)], axis=1)
+    counts = counts[occupied].astype(np.float64)
+    return sums / counts[:, None], counts
+
+
+def _weighted_means(points, weights, labels, k):
+    totals = np.bincount(labels, weights=weights, minlength=k)
+    sums = np.stack([np.bincount(labels, weights=weights * points[:, c], minlength=k) for c in range(3)], axis=1)
+    return sums, totals
+
+
+def _squared_distances(points, centres):
+    return ((points[:, None, :] - centres[None, :, :]) ** 2).sum(axis=2)
+
+
+# ---------------- ENGINES ---------------- #
+def histogram_kmeans(colours, weights, k, max_iter=PALETTE_MAX_ITER):
+    """
+    Weighted Lloyd iterations on histogram bins. Seeding is deterministic: the
+    heaviest bin first, then repeatedly the bin maximizing weight * distance^2
+    to the chosen centres (a greedy, RNG-free k-means++).
+    """
+    centres = [colours[np.argmax(weights)]]
+    d2 = _squared_distances(colours, np.array(centres))[:, 0]
+    for _ in range(1, k):
+        centres.append(colours[np.argmax(weights * d2)])
+        d2 = np.minimum(d2, ((colours - centres[-1]) ** 2).sum(axis=1))
+    centres = np.array(centres)
+
+    for _ in range(max_iter):
+        labels = _squared_distances(colours, centres).argmin(axis=1)
+        sums, totals = _weighted_means(colours, weights, labels, k)
+        updated = np.where(totals[:, None] > 0, sums / np.maximum(totals, 1e-12)[:, None], centres)
+        if np.allclose(updated, centres, atol=0.5):
+            centres = updated
+            break
+        centres = updated
+
+    labels = _squared_distances(colours, centres).argmin(axis=1)
+    totals = np.bincount(labels, weights=weights, minlength=k)
+    return centres, totals
+
+
+def median_cut(colours, weights, k):
+    """Split the box with the widest channel range at its weighted median until there are k boxes."""
+    boxes = [np.arange(len(colours))]
+    while len(boxes) < k:
+        spans = [np.ptp(colours[b], axis=0) if len(b) > 1 else np.zeros(3) for b in boxes]
+        widest = int(np.argmax([s.max() for s in spans]))
+        if spans[widest].max() == 0:
+            break
+        box, channel = boxes.pop(widest), int(np.argmax(spans[widest]))
+        order = box[np.argsort(colours[box, channel], kind="stable")]
+        cumulative = np.cumsum(weights[order])
+        cut = int(np.clip(np.searchsorted(cumulative, cumulative[-1] / 2, side="right"), 1, len(order) - 1))
+        boxes += [order[:cut], order[cut:]]
+
+    centres = np.array([np.average(colours[b], axis=0, weights=weights[b]) for b in boxes])
+    totals = np.array([weights[b].sum() for b in boxes])
+    return centres, totals
+
+
+def sklearn_kmeans(pixels, k):
+    from sklearn.cluster import KMeans
+    kmeans = KMeans(n_clusters=k, random_state=42)
+    kmeans.fit(pixels)
+    return kmeans.cluster_centers_, np.bincount(kmeans.labels_, minlength=k).astype(np.float64)
+
+
+# ---------------- PUBLIC API ---------------- #
+def extract_palette(pixels, n_colors=5, method=PALETTE_METHOD):
+    """
+    pixels: (N, 3) uint8 RGB
+    Returns: (centres, weights) with exactly n_colors rows, heaviest colour first
+    """
+    pixels = np.asarray(pixels, dtype=np.uint8).reshape(-1, 3)
+    if method == "sklearn":
+        centres, totals = sklearn_kmeans(pixels, n_colors)
+    else:
+        colours, weights = colour_histogram(pixels)
+        if len(colours) <= n_colors:
+            centres, totals = colours, weights
+        elif method == "median-cut":
+            centres, totals = median_cut(colours, weights, n_colors)
+        elif method == "histogram-kmeans":
+            centres, totals = histogram_kmeans(colours, weights, n_colors)
+        else:
+            raise ValueError(f"Unknown PALETTE_METHOD {method!r}")
+
+    order = np.argsort(-totals, kind="stable")
+    centres, totals = centres[order], totals[order]
+    if len(centres) < n_colors:
+        # Flat images: repeat the dominant colour so callers always get n_colors entries
+        pad = n_colors - len(centres)
+        centres = np.vstack([centres, np.repeat(centres[:1], pad, axis=0)])
+        totals = np.concatenate([totals, np.zeros(pad)])
+    return centres, totals
+
+
+def to_hex(centres):
+    return ['#%02x%02x%02x' % tuple(c) for c in np.clip(centres, 0, 255).astype(int)]
+
+
+def palette_hex(pixels, n_colors=5, method=PALETTE_METHOD):
+    """The `color_palette` format used by the pipeline: a list of '#rrggbb'."""
+    return to_hex(extract_palette(pixels, n_colors, method)[0])
+
+
+def dominant_rgb(pixels, n_colors=3, method=PALETTE_METHOD):
+    """RGB tuple of the most populated palette colour."""
+    centres, _ = extract_palette(pixels, n_colors, method)
+    return tuple(map(int, centres[0]))
+
+
+# ---------------- LAB ---------------- #
+def rgb_to_lab(rgb):
+    """sRGB (..., 3) in 0-255 to CIE L*a*b* (D65)."""
+    c = np.asarray(rgb, dtype=np.float64) / 255.0
+    c = np.where(c > 0.04045, ((c + 0.055) / 1.055) ** 2.4, c / 12.92)
+    m = np.array([[0.4124564, 0.3575761, 0.1804375],
+                  [0.2126729, 0.7151522, 0.0721750],
+                  [0.0193339, 0.1191920, 0.9503041]])
+    xyz = c @ m.T / np.array([0.95047, 1.0, 1.08883])
+    f = np.where(xyz > (6 / 29) ** 3, np.cbrt(xyz), xyz / (3 * (6 / 29) ** 2) + 4 / 29)
+    return np.stack([116 * f[..., 1] - 16, 500 * (f[..., 0] - f[..., 1]), 200 * (f[..., 1] - f[..., 2])], axis=-1)
+
+
+def delta_e(lab1, lab2):
+    """CIE76 colour difference."""
+    return np.linalg.norm(np.asarray(lab1) - np.asarray(lab2), axis=-1)
@@ -1,32 +1,32 @@
 import os
-import torch
-from transformers import BlipProcessor, BlipForConditionalGeneration, CLIPProcessor, CLIPModel
-from PIL import Image
 import numpy as np
-from sklearn.cluster import KMeans
-import requests
-from dotenv import load_dotenv
-
-# ---------------- CONFIG ---------------- #
-load_dotenv()
-OPENROUTER_API_KEY = os.getenv('OPENROUTER_API_KEY') or "YOUR_FALLBACK_KEY"
-DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
-
-# ---------------- MODEL PATHS ---------------- #
-PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
-blip_model_path = os.path.join(PROJECT_ROOT, "models", "blip_model", "blip_model")
-clip_model_path = os.path.join(PROJECT_ROOT, "models", "clip-vit-base-patch32", "clip-vit-base-patch32")
-
-# ---------------- LOAD MODELS ---------------- #
-print("✅ Loading BLIP...")
-blip_processor = BlipProcessor.from_pretrained(blip_model_path)
-blip_model = BlipForConditionalGeneration.from_pretrained(blip_model_path).to(DEVICE)
-print("✅ BLIP model loaded!")
-
-print("✅ Loading CLIP...")
-clip_model = CLIPModel.from_pretrained(clip_model_path).to(DEVICE)
-clip_processor = CLIPProcessor.from_pretrained(clip_model_path)
-print("✅ CLIP model loaded on", DEVICE)
+
+from utils.openrouter import OPENROUTER_MODEL, LLM_TEMPERATURE, call_openrouter  # noqa: F401 (re-exported)
+from utils.llm_attributes import LLM_ATTRIBUTE_MODE, predict_attributes
+from utils.analysis_cache import analysis_cache, colour_signature, perceptual_hash
+from utils.batching import INFERENCE_BATCHING, MicroBatcher
+from utils.image_io import COLOR_THUMBNAIL_SIZE, DecodedImage, as_rgb_image, decode_image
+from utils.palette import PALETTE_METHOD, palette_hex
+from utils.model_registry import BLIP_MODEL_PATH, CLIP_MODEL_PATH, INFERENCE_BACKEND, models
+from utils.logs import get_logger
+from utils.metrics import timed
+
+log = get_logger(__name__)
+
+# torch and transformers are imported on first use: importing this module
+# (and therefore the app) stays cheap; the weights are loaded by utils/model_registry.py
+
+# Part of every analysis cache key: changing any model (or bumping ANALYSIS_CACHE_VERSION) invalidates old entries
+ANALYSIS_MODEL_VERSION = "|".join([
+    os.path.basename(BLIP_MODEL_PATH),
+    os.path.basename(CLIP_MODEL_PATH),
+    INFERENCE_BACKEND,
+    PALETTE_METHOD,
+    OPENROUTER_MODEL,
+    f"t={LLM_TEMPERATURE}",
+    LLM_ATTRIBUTE_MODE,
+    os.getenv("ANALYSIS_CACHE_VERSION", "1"),
+])
 
 # ---------------- COLOR NORMALIZER ---------------- #
 def normalize_color(text):
@@ -50,96 +50,142 @@ def normalize_color(text):
     return ""
 
 # ---------------- BLIP CAPTION ---------------- #
-def generate_blip_caption(image_path):
+def generate_blip_captions(images):
+    """Caption a list of RGB PIL images with one batched call (backend: INFERENCE_BACKEND)."""
+    return models.get("blip").caption(images)
+
+
+def generate_blip_caption(image):
+    """image: a DecodedImage, PIL image or path."""
     try:
-        image = Image.open(image_path).convert('RGB')
-        inputs = blip_processor(image, return_tensors="pt").to(DEVICE)
-        with torch.no_grad():
-            out = blip_model.generate(**inputs)
-        caption = blip_processor.decode(out[0], skip_special_tokens=True)
-        return caption
+        image = as_rgb_image(image)
+        with timed("blip"):
+            if blip_batcher is not None:
+                return blip_batcher(image)
+            return generate_blip_captions([image])[0]
     except Exception as e:
-        print(f"❌ BLIP error for {image_path}: {e}")
+        log.error(f"❌ BLIP error: {e}", extra={"stage": "blip"})
         return ""
 
 # ---------------- COLOR PALETTE ---------------- #
-def extract_colors(image_path, n_colors=5):
+def extract_colors(image, n_colors=5):
+    """image: a DecodedImage (its cached thumbnail is reused), PIL image or path."""
     try:
-        img = Image.open(image_path).convert('RGB')
-        img = img.resize((128, 128))
+        if isinstance(image, DecodedImage):
+            img = image.color_thumbnail()
+        else:
+            img = as_rgb_image(image).resize(COLOR_THUMBNAIL_SIZE)
         img_np = np.array(img).reshape(-1, 3)
-        kmeans = KMeans(n_clusters=n_colors, random_state=42)
-        kmeans.fit(img_np)
-        colors = kmeans.cluster_centers_.astype(int)
-        hex_colors = ['#%02x%02x%02x' % tuple(c) for c in colors]
-        return hex_colors
+        with timed("palette"):
+            return palette_hex(img_np, n_colors)  # see PALETTE_METHOD in utils/palette.py
     except Exception as e:
-        print(f"❌ Color extraction error for {image_path}: {e}")
+        log.error(f"❌ Color extraction error: {e}", extra={"stage": "palette"})
         return []
 
 # ---------------- CLIP EMBEDDING ---------------- #
-def compute_clip_embedding(image_path):
+def compute_clip_embeddings(images):
+    """L2-normalized CLIP image embeddings for a list of RGB PIL images, one forward pass."""
+    return models.get("clip").embed(images)
+
+
+def compute_clip_embedding(image):
+    """image: a DecodedImage, PIL image or path."""
     try:
-        image = Image.open(image_path).convert('RGB')
-        inputs = clip_processor(images=image, return_tensors="pt").to(DEVICE)
-        with torch.no_grad():
-            embedding = clip_model.get_image_features(**inputs)
-            embedding = embedding / embedding.norm(dim=-1, keepdim=True)
-        return embedding.cpu().numpy().flatten().tolist()
+        image = as_rgb_image(image)
+        with timed("clip"):
+            if clip_batcher is not None:
+                return clip_batcher(image)
+            return compute_clip_embeddings([image])[0]
     except Exception as e:
-        print(f"❌ CLIP embedding error for {image_path}: {e}")
+        log.error(f"❌ CLIP embedding error: {e}", extra={"stage": "clip"})
         return []
 
-# ---------------- OPENROUTER LLM ---------------- #
-def call_openrouter(prompt):
-    headers = {
-        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-        "Content-Type": "application/json"
-    }
-    data = {
-        "model": "meta-llama/llama-3-8b-instruct",
-        "messages": [
-            {"role": "system", "content": "You are a fashion stylist and classifier."},
-            {"role": "user", "content": prompt}
-        ],
-        "temperature": 0.7,
-        "max_tokens": 200
-    }
-    try:
-        response = requests.post("https://openrouter.ai/api/v1/chat/completions", headers=headers, json=data, timeout=30)
-        result = response.json()
-        return result['choices'][0]['message']['content'].strip()
-    except Exception as e:
-        print(f"❌ LLM call error: {e}")
-        return ""
+# ---------------- MICRO-BATCHING ---------------- #
+# Concurrent requests share one forward pass (see utils/batching.py for the size/latency knobs)
+blip_batcher = MicroBatcher(generate_blip_captions, name="blip-batcher") if INFERENCE_BATCHING else None
+clip_batcher = MicroBatcher(compute_clip_embeddings, name="clip-batcher") if INFERENCE_BATCHING else None
 
 # ---------------- MAIN PIPELINE ---------------- #
-def process_new_image(image_path):
-    print(f"🚀 Processing {image_path}")
-
-    caption = generate_blip_caption(image_path)
-    print(f"✅ Caption: {caption}")
-
-    colors = extract_colors(image_path)
-    print(f"✅ Colors: {colors}")
-
-    season_raw = call_openrouter(f"""Given this description: "{caption}" and these colors: {colors}, predict the fashion season (Spring, Summer, Autumn, Winter). Return only the season word.""")
-    season = season_raw.strip().lower()
-    print(f"✅ Season: {season}")
-
-    display_name = call_openrouter(f"""Given this description: "{caption}" and these colors: {colors}, suggest a product display name (e.g. "Casual Shirt", "Evening Dress"). Return only the name.""")
-    print(f"✅ Display Name: {display_name}")
-
-    aesthetic_category = call_openrouter(f"""Given this description: "{caption}" and these colors: {colors}, choose ONE from these categories:
-Minimalist, Boho, Streetwear, Casual Basics, Preppy, Activewear, Lingerie/Intimate, Ethnic/Traditional, Footwear, Outerwear, Accessories, Formal, Party, Vintage.
-Return only that category.""").strip()
-    print(f"✅ Aesthetic Category: {aesthetic_category}")
-
-    aesthetic_vibe = call_openrouter(f"""Given this description: "{caption}" and these colors: {colors}, write ONE short line describing the fashion vibe in 5-6 words, capturing style and mood.""").strip()
-    print(f"✅ Aesthetic Vibe: {aesthetic_vibe}")
-
-    clip_embedding = compute_clip_embedding(image_path)
-    print(f"✅ CLIP embedding generated.")
+def process_new_image(image_source, image_name=None, on_stage=None):
+    """
+    image_source: a path, the uploaded bytes, or a file-like stream.
+    The image is decoded once and every stage below works from that decode.
+
+    on_stage: optional callback(stage, value), called as "clip_embedding",
+    "caption", "colors" and "attributes" finish (in that order; CLIP comes
+    first because recommendations need nothing else). An exception raised by
+    the callback aborts the pipeline.
+    """
+    notify = on_stage or (lambda stage, value: None)
+    image = decode_image(image_source, name=image_name)
+    image_path = image.name
+    log.info(f"🚀 Processing {image_path or 'upload'}", extra={"image": image_path})
+
+    # Re-uploads of the same photo are served from the analysis cache
+    cache_key, phash, colour, cached = None, None, None, None
+    if analysis_cache is not None:
+        try:
+            cache_key = analysis_cache.make_key(image.data, ANALYSIS_MODEL_VERSION)
+            phash, colour = perceptual_hash(image.image), colour_signature(image.image)
+            cached = analysis_cache.get(cache_key, ANALYSIS_MODEL_VERSION, phash, colour)
+        except Exception as e:
+            log.warning(f"❌ Analysis cache lookup failed for {image_path}: {e}")
+
+    if cached is not None:
+        log.info("✅ Analysis cache hit", extra={"image": image_path})
+        clip_embedding = cached["clip_embedding"]
+    else:
+        clip_embedding = compute_clip_embedding(image)
+        log.info("✅ CLIP embedding generated.")
+    notify("clip_embedding", clip_embedding)
+
+    if cached is not None:
+        caption, colors = cached["caption"], cached["color_palette"]
+    else:
+        caption = generate_blip_caption(image)
+        log.info(f"✅ Caption: {caption}", extra={"caption": caption})
+
+        colors = extract_colors(image)
+        log.info(f"✅ Colors: {colors}", extra={"colors": colors})
+    notify("caption", caption)
+    notify("colors", colors)
+
+    if cached is not None and cached["llm"] is not None:
+        answers = cached["llm"]
+    else:
+        # One structured LLM call (or four concurrent ones, see LLM_ATTRIBUTE_MODE)
+        with timed("llm"):
+            answers = predict_attributes(caption, colors)
+
+    season = answers["season"].strip().lower()
+    log.info(f"✅ Season: {season}", extra={"season": season})
+
+    display_name = answers["display_name"]
+    log.info(f"✅ Display Name: {display_name}", extra={"display_name": display_name})
+
+    aesthetic_category = answers["aesthetic_category"].strip()
+    log.info(f"✅ Aesthetic Category: {aesthetic_category}", extra={"aesthetic_category": aesthetic_category})
+
+    aesthetic_vibe = answers["aesthetic_vibe"].strip()
+    log.info(f"✅ Aesthetic Vibe: {aesthetic_vibe}", extra={"aesthetic_vibe": aesthetic_vibe})
+
+    notify("attributes", {
+        "season": season,
+        "display_name": display_name.strip(),
+        "aesthetic_category": aesthetic_category.lower(),
+        "aesthetic_vibe": aesthetic_vibe,
+    })
+
+    # Store fresh results; skip failed stages (empty outputs) so they are retried next time
+    refreshed = cached is None or cached["llm"] is None
+    if cache_key is not None and refreshed and caption and colors and clip_embedding:
+        llm_fields = answers if all(answers.get(f) for f in answers) else None
+        try:
+            analysis_cache.put(
+                cache_key, ANALYSIS_MODEL_VERSION, phash, caption, colors, clip_embedding, llm_fields, colour
+            )
+        except Exception as e:
+            log.warning(f"❌ Analysis cache store failed for {image_path}: {e}")
 
     result = {
         "image_path": image_path,
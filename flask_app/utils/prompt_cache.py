@@ -0,0 +1,145 @@
+import os
+import re
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from utils.openrouter import LLM_TEMPERATURE
+
+# ---------------- CONFIG ---------------- #
+# On by default only with deterministic sampling (LLM_DETERMINISTIC=1 / LLM_TEMPERATURE=0): at a higher
+# temperature a cached answer would pin one random sample for every later image with the same key
+PROMPT_CACHE_ENABLED = os.getenv("PROMPT_CACHE_ENABLED", "1" if LLM_TEMPERATURE == 0 else "0") == "1"
+PROMPT_CACHE_SIZE = int(os.getenv("PROMPT_CACHE_SIZE", "10000"))     # in-memory entries
+PROMPT_CACHE_PATH = os.getenv("PROMPT_CACHE_PATH", "")                # optional SQLite disk tier
+PROMPT_CACHE_TTL = float(os.getenv("PROMPT_CACHE_TTL", str(7 * 24 * 3600)))  # seconds
+# Bump when prompt templates (or what gets cached) change so old answers are not reused
+PROMPT_CACHE_VERSION = "2"
+
+# Reference colours the palette is snapped to before keying
+BASE_COLORS = {
+    "black": (0, 0, 0), "white": (255, 255, 255), "gray": (128, 128, 128), "silver": (192, 192, 192),
+    "red": (220, 20, 60), "maroon": (128, 0, 0), "pink": (255, 182, 193), "orange": (255, 140, 0),
+    "yellow": (255, 215, 0), "beige": (222, 200, 160), "brown": (139, 69, 19), "olive": (128, 128, 0),
+    "green": (34, 139, 34), "teal": (0, 128, 128), "blue": (30, 80, 200), "navy": (0, 0, 128),
+    "purple": (128, 0, 128), "lavender": (200, 170, 230),
+}
+
+FILLER_WORDS = {"a", "an", "the", "there", "is", "are", "of", "with", "arafed", "araffe"}
+
+
+# ---------------- KEY NORMALIZATION ---------------- #
+def normalize_caption(caption):
+    """'A woman wearing a black dress.' and 'a woman  wearing the black dress' give the same key."""
+    words = re.findall(r"[a-z0-9]+", (caption or "").lower())
+    return " ".join(w for w in words if w not in FILLER_WORDS)
+
+
+def quantize_color(hex_code):
+    """Snap a hex colour to the nearest named base colour."""
+    hex_code = hex_code.strip().lstrip("#")
+    try:
+        rgb = tuple(int(hex_code[i:i + 2], 16) for i in (0, 2, 4))
+    except ValueError:
+        return hex_code.lower()
+    return min(BASE_COLORS, key=lambda name: sum((a - b) ** 2 for a, b in zip(rgb, BASE_COLORS[name])))
+
+
+def quantize_palette(colors):
+    """Order-insensitive set of base colour names."""
+    return sorted({quantize_color(c) for c in colors or []})
+
+
+def make_key(name, caption, colors):
+    raw = json.dumps([PROMPT_CACHE_VERSION, name, normalize_caption(caption), quantize_palette(colors)])
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+# ---------------- CACHE ---------------- #
+class PromptCache:
+    """
+    Memoizes LLM answers for semantically equal prompts.
+
+    Tier 1 is a bounded in-memory LRU; tier 2 (if `path` is set) is an SQLite
+    file shared across restarts and workers. Each entry remembers how long the
+    original call took, so hits can report the latency they saved.
+    """
+
+    def __init__(self, max_entries=PROMPT_CACHE_SIZE, path=PROMPT_CACHE_PATH, ttl=PROMPT_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._memory = OrderedDict()  # key -> (answer, latency, stored_at)
+        self._lock = threading.Lock()
+        self.path = path
+        self._conn = None
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._conn = self._connect()
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "saved_seconds": 0.0}
+        if hasattr(os, "register_at_fork"):
+            # SQLite handles must not cross fork() (gunicorn --preload): each worker opens its own
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS prompt_cache "
+            "(key TEXT PRIMARY KEY, answer TEXT, latency REAL, stored_at REAL)"
+        )
+        return conn
+
+    def _after_fork(self):
+        self._lock = threading.Lock()
+        if self.path:
+            self._conn = self._connect()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            tier = "memory_hits"
+            if entry is None and self._conn is not None:
+                entry = self._conn.execute(
+                    "SELECT answer, latency, stored_at FROM prompt_cache WHERE key = ?", (key,)
+                ).fetchone()
+                tier = "disk_hits"
+            if entry is None or now - entry[2] > self.ttl:
+                self._memory.pop(key, None)
+                self.counters["misses"] += 1
+                return None
+            self._remember(key, entry)
+            self.counters[tier] += 1
+            self.counters["saved_seconds"] += entry[1]
+            return entry[0]
+
+    def put(self, key, answer, latency):
+        entry = (answer, latency, time.time())
+        with self._lock:
+            self._remember(key, entry)
+            if self._conn is not None:
+                self._conn.execute("INSERT OR REPLACE INTO prompt_cache VALUES (?, ?, ?, ?)", (key, *entry))
+
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self.counters)
+            entries = len(self._memory)
+        hits = counters["memory_hits"] + counters["disk_hits"]
+        lookups = hits + counters["misses"]
+        return {
+            **counters,
+            "memory_entries": entries,
+            "hit_ratio": hits / lookups if lookups else 0.0,
+        }
+
+
+prompt_cache = PromptCache() if PROMPT_CACHE_ENABLED else None
@@ -0,0 +1,173 @@
+import numpy as np
+
+from utils.topk import TOPK_CHUNK_SIZE, pad_topk, select_topk
+
+
+# -----------------------------------------------
+# INT8 SCALAR QUANTIZATION
+# -----------------------------------------------
+class ScalarQuantizer:
+    """
+    Per-dimension 8-bit quantization: x ≈ codes * scale + offset.
+    4x smaller than float32. Inner products are computed directly on the codes
+    (asymmetric: the query stays float32).
+    """
+
+    def __init__(self, scale, offset):
+        self.scale = scale
+        self.offset = offset
+
+    @classmethod
+    def train(cls, vectors, chunk_size=TOPK_CHUNK_SIZE):
+        lo = np.full(vectors.shape[1], np.inf, dtype=np.float32)
+        hi = np.full(vectors.shape[1], -np.inf, dtype=np.float32)
+        for start in range(0, len(vectors), chunk_size):
+            block = np.asarray(vectors[start:start + chunk_size], dtype=np.float32)
+            lo = np.minimum(lo, block.min(axis=0))
+            hi = np.maximum(hi, block.max(axis=0))
+        scale = np.maximum(hi - lo, 1e-12) / 255.0
+        return cls(scale.astype(np.float32), lo.astype(np.float32))
+
+    def encode(self, vectors, chunk_size=TOPK_CHUNK_SIZE):
+        codes = np.empty(vectors.shape, dtype=np.uint8)
+        for start in range(0, len(vectors), chunk_size):
+            block = np.asarray(vectors[start:start + chunk_size], dtype=np.float32)
+            codes[start:start + chunk_size] = np.clip(np.rint((block - self.offset) / self.scale), 0, 255)
+        return codes
+
+    def decode(self, codes):
+        return codes.astype(np.float32) * self.scale + self.offset
+
+    def search(self, queries, codes, k, chunk_size=TOPK_CHUNK_SIZE, mask=None):
+        """
+        Approximate top-k inner product against the codes.
+        q·x ≈ (q * scale)·codes + q·offset, so each chunk is one matmul on the raw codes.
+        """
+        scaled = queries * self.scale
+        bias = queries @ self.offset
+        return _chunked_topk(
+            lambda block: block.astype(np.float32) @ scaled.T + bias, codes, len(queries), k, chunk_size, mask
+        )
+
+    def state(self):
+        return {"scale": self.scale, "offset": self.offset}
+
+
+# -----------------------------------------------
+# PRODUCT QUANTIZATION
+# -----------------------------------------------
+def cluster_sums(vectors, assignments, n_clusters):
+    """Per-cluster sum of vectors; one bincount per dimension is much faster than np.add.at."""
+    return np.stack(
+        [np.bincount(assignments, weights=vectors[:, d], minlength=n_clusters) for d in range(vectors.shape[1])],
+        axis=1,
+    ).astype(np.float32)
+
+
+def kmeans_l2(vectors, n_clusters, n_iter=15, seed=42):
+    """Plain Euclidean k-means (Lloyd) for the PQ sub-codebooks."""
+    rng = np.random.default_rng(seed)
+    vectors = np.asarray(vectors, dtype=np.float32)
+    n_clusters = min(n_clusters, len(vectors))
+    centroids = vectors[rng.choice(len(vectors), n_clusters, replace=False)].copy()
+    for _ in range(n_iter):
+        assignments = nearest_l2(vectors, centroids)
+        sums = cluster_sums(vectors, assignments, n_clusters)
+        counts = np.bincount(assignments, minlength=n_clusters)
+        empty = counts == 0
+        counts[empty] = 1
+        centroids = sums / counts[:, None]
+        if empty.any():
+            centroids[empty] = vectors[rng.choice(len(vectors), int(empty.sum()), replace=False)]
+    return centroids
+
+
+def nearest_l2(vectors, centroids):
+    # ||x - c||² = ||x||² - 2 x·c + ||c||²; ||x||² is constant per row so it drops out of the argmin
+    return np.argmin((centroids ** 2).sum(axis=1) - 2 * vectors @ centroids.T, axis=1)
+
+
+class ProductQuantizer:
+    """
+    Splits each D-dim vector into m sub-vectors and replaces each by the id of
+    its nearest of 256 sub-centroids: m bytes per vector (e.g. 64 bytes for
+    512-d float32 at m=64, a 32x reduction).
+
+    Search uses asymmetric distance computation: per query, a (m, 256) table
+    of sub-inner-products, summed over each item's codes.
+    """
+
+    def __init__(self, codebooks):
+        self.codebooks = codebooks  # (m, ksub, dsub)
+
+    @property
+    def m(self):
+        return self.codebooks.shape[0]
+
+    @classmethod
+    def train(cls, vectors, m=64, ksub=256, n_iter=15, max_train_points=65536, seed=42):
+        n, dim = vectors.shape
+        if dim % m:
+            raise ValueError(f"Embedding dim {dim} is not divisible by m={m}")
+        rng = np.random.default_rng(seed)
+        if n > max_train_points:
+            sample = np.asarray(vectors[np.sort(rng.choice(n, max_train_points, replace=False))], dtype=np.float32)
+        else:
+            sample = np.asarray(vectors, dtype=np.float32)
+        dsub = dim // m
+        codebooks = np.stack([
+            kmeans_l2(sample[:, j * dsub:(j + 1) * dsub], ksub, n_iter=n_iter, seed=seed + j)
+            for j in range(m)
+        ])
+        return cls(codebooks.astype(np.float32))
+
+    def encode(self, vectors, chunk_size=TOPK_CHUNK_SIZE):
+        m, _, dsub = self.codebooks.shape
+        codes = np.empty((len(vectors), m), dtype=np.uint8)
+        for start in range(0, len(vectors), chunk_size):
+            block = np.asarray(vectors[start:start + chunk_size], dtype=np.float32)
+            for j in range(m):
+                codes[start:start + len(block), j] = nearest_l2(block[:, j * dsub:(j + 1) * dsub], self.codebooks[j])
+        return codes
+
+    def decode(self, codes):
+        return np.concatenate([self.codebooks[j][codes[:, j]] for j in range(self.m)], axis=1)
+
+    def lookup_tables(self, queries):
+        m, _, dsub = self.codebooks.shape
+        sub_queries = queries.reshape(len(queries), m, dsub)
+        # (Q, m, ksub): inner product of each query sub-vector with every sub-centroid
+        return np.einsum("qmd,mkd->qmk", sub_queries, self.codebooks)
+
+    def search(self, queries, codes, k, chunk_size=TOPK_CHUNK_SIZE, mask=None):
+        tables = self.lookup_tables(queries)
+        sub_index = np.arange(self.m)
+
+        def score(block):
+            return np.stack([table[sub_index, block].sum(axis=1) for table in tables], axis=1)
+
+        return _chunked_topk(score, codes, len(queries), k, chunk_size, mask)
+
+    def state(self):
+        return {"codebooks": self.codebooks}
+
+
+def _chunked_topk(score_fn, codes, n_queries, k, chunk_size, mask=None):
+    """Shared chunk/merge loop: score_fn maps a block of codes to (rows, Q) scores."""
+    requested, k = k, min(k, len(codes))
+    best_scores = np.empty((n_queries, 0), dtype=np.float32)
+    best_indices = np.empty((n_queries, 0), dtype=np.int64)
+    for start in range(0, len(codes), chunk_size):
+        chunk_mask = None if mask is None else mask[start:start + chunk_size]
+        if chunk_mask is not None and not chunk_mask.any():
+            continue
+        scores = score_fn(codes[start:start + chunk_size]).T
+        if chunk_mask is not None:
+            scores[:, ~chunk_mask] = -np.inf
+        chunk_scores, chunk_indices = select_topk(scores, k)
+        merged_scores = np.concatenate([best_scores, chunk_scores], axis=1)
+        merged_indices = np.concatenate([best_indices, chunk_indices + start], axis=1)
+        best_scores, pos = select_topk(merged_scores, k)
+        best_indices = np.take_along_axis(merged_indices, pos, axis=1)
+    return pad_topk(best_scores, best_indices, requested)
+
@@ -1,8 +1,11 @@
-import os
-import torch
-import pandas as pd
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
+
+from utils.catalog_store import catalog_store, get_catalog, load_catalog  # noqa: F401 (re-exported)
+from utils.embedding_space import EmbeddingModelMismatch
+from utils.logs import get_logger
+from utils.metrics import timed
+
+log = get_logger(__name__)
 
 def normalize_color(hex_code):
     """
@@ -27,74 +30,47 @@ def normalize_color(hex_code):
     return base_colors.get(hex_code, hex_code)
 
 
-# -----------------------------------------------
-# PATHS
-# -----------------------------------------------
-BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../"))
-
-CATALOG_METADATA_PATH = os.path.join(BASE_DIR, "data", "catalog_metadata.csv")
-CATALOG_EMBEDDINGS_PATH = os.path.join(BASE_DIR, "data", "catalog_embeddings.pt")
-
-# -----------------------------------------------
-# LOAD CATALOG DATA
-# -----------------------------------------------
-
-CATALOG_FILENAMES_PATH = os.path.join(BASE_DIR, "data", "image_filenames.csv")  # updated path
-
-def load_catalog():
-    print("✅ Loading catalog metadata...")
-    df = pd.read_csv(CATALOG_METADATA_PATH)
-
-    print("✅ Loading catalog embeddings...")
-    embeddings = torch.load(CATALOG_EMBEDDINGS_PATH)
-
-    print("✅ Loading embedding filenames...")
-    filenames_df = pd.read_csv(CATALOG_FILENAMES_PATH)  # assumes header is present
-    filenames_df.rename(columns={filenames_df.columns[0]: "path"}, inplace=True)
-
-    # Extract ID from path (e.g., '/kaggle/.../images/31973.jpg' → 31973)
-    filenames_df["id"] = filenames_df["path"].apply(
-        lambda x: int(os.path.splitext(os.path.basename(x))[0])
-    )
-    filenames_df["embedding_idx"] = filenames_df.index
-
-    # Merge on 'id' to align metadata with embeddings
-    df = df.merge(filenames_df, on="id")
-
-    # Filter embeddings to match aligned metadata
-    aligned_embeddings = embeddings[df["embedding_idx"].values]
-
-    print(f"✅ Final aligned catalog items: {len(df)}")
-
-    return df.drop(columns=["embedding_idx"]), aligned_embeddings.numpy()
-
-
 # -----------------------------------------------
 # FIND SIMILAR ITEMS USING CLIP ONLY
 # -----------------------------------------------
-def find_similar_items(uploaded_result, top_k=10):
+def find_similar_items(uploaded_result, top_k=10, filter_options=None, catalog=None, **search_knobs):
     """
     uploaded_result: dict with 'clip_embedding' key (list or np.array)
     top_k: number of results to return
+    filter_options: optional dict like {"season": "Summer", "gender": "Women"};
+        only items matching all given values are returned
+    catalog: CatalogSnapshot to search (default: the main catalog); the query
+        embedding must come from the same model (see utils/embedding_space.py)
+    search_knobs: passed to the index backend (e.g. nprobe for "ivf")
 
     Returns: list of dicts with similar items
     """
 
-    # Load data
-    df_catalog, catalog_embeddings = load_catalog()
+    # Catalog and its search index are loaded once per process and shared across requests
+    catalog = catalog or catalog_store.get()
 
-    # Convert query embedding
-    query_embedding = np.array(uploaded_result["clip_embedding"]).reshape(1, -1)
+    # Resolve filters to a row mask from the precomputed posting lists
+    mask = catalog.filters.mask(filter_options)
+    if mask is not None and not mask.any():
+        log.info(f"❌ No matching items in catalog for filters: {filter_options}")
+        return []
 
-    # Compute cosine similarity
-    similarities = cosine_similarity(query_embedding, catalog_embeddings)[0]
-
-    # Get top_k indices
-    top_indices = np.argsort(-similarities)[:top_k]
+    # Convert query embedding
+    query_embedding = np.array(uploaded_result["clip_embedding"], dtype=np.float32).reshape(1, -1)
+    if query_embedding.shape[1] != catalog.embeddings.shape[1]:
+        raise EmbeddingModelMismatch(
+            f"Query embedding has {query_embedding.shape[1]} dims, the catalog {catalog.embeddings.shape[1]}"
+        )
+
+    # Search the index (exact or approximate, depending on CATALOG_INDEX)
+    with timed("search"):
+        scores, indices = catalog.index.search(query_embedding, top_k, mask=mask, **search_knobs)
+    found = indices[0] >= 0
+    top_indices, top_scores = indices[0][found], scores[0][found]
 
     # Slice and annotate
-    results_df = df_catalog.iloc[top_indices].copy()
-    results_df["similarity"] = similarities[top_indices]
+    results_df = catalog.metadata.iloc[top_indices].copy()
+    results_df["similarity"] = top_scores
 
     # Return selected fields only
     wanted_cols = ["id", "productDisplayName", "baseColour", "season", "similarity"]
@@ -0,0 +1,88 @@
+import os
+import numpy as np
+
+# Rows of the catalog scored per matmul; bounds peak memory at Q x TOPK_CHUNK_SIZE floats
+TOPK_CHUNK_SIZE = int(os.getenv("TOPK_CHUNK_SIZE", "65536"))
+
+
+def select_topk(scores, k):
+    """
+    Top-k along the last axis of a (Q, N) score matrix without sorting all N:
+    argpartition to find the k best, then sort only those k.
+
+    Returns: (scores, indices), both (Q, k), best first
+    """
+    n = scores.shape[-1]
+    k = min(k, n)
+    if k == 0:
+        empty = np.empty(scores.shape[:-1] + (0,))
+        return empty.astype(scores.dtype), empty.astype(np.int64)
+    if k < n:
+        part = np.argpartition(-scores, k - 1, axis=-1)[..., :k]
+    else:
+        part = np.broadcast_to(np.arange(n), scores.shape).copy()
+    part_scores = np.take_along_axis(scores, part, axis=-1)
+    order = np.argsort(-part_scores, axis=-1, kind="stable")
+    return np.take_along_axis(part_scores, order, axis=-1), np.take_along_axis(part, order, axis=-1)
+
+
+def topk_inner_product(queries, matrix, k, chunk_size=TOPK_CHUNK_SIZE, mask=None):
+    """
+    Exact top-k by inner product for pre-normalized vectors (= cosine similarity).
+
+    queries: (Q, D) or (D,) float array, already L2-normalized
+    matrix:  (N, D) catalog matrix, already L2-normalized; may be a float16 or
+             memory-mapped array, each chunk is upcast to float32 on the fly
+    k:       results per query
+    mask:    optional (N,) bool array; rows that are False are never returned
+
+    The catalog is scanned in chunks of `chunk_size` rows: one float32 matmul
+    per chunk, a per-chunk argpartition, and a merge with the running best k.
+
+    Returns: (scores, indices), both (Q, k), best first; if fewer than k rows
+    pass the mask, the tail is padded with score -inf and index -1
+    """
+    queries = np.asarray(queries, dtype=np.float32)
+    if queries.ndim == 1:
+        queries = queries.reshape(1, -1)
+    n = matrix.shape[0]
+    requested, k = k, min(k, n)
+
+    best_scores = np.empty((len(queries), 0), dtype=np.float32)
+    best_indices = np.empty((len(queries), 0), dtype=np.int64)
+    for start in range(0, n, chunk_size):
+        chunk_mask = None if mask is None else mask[start:start + chunk_size]
+        if chunk_mask is not None and not chunk_mask.any():
+            continue
+        chunk = np.asarray(matrix[start:start + chunk_size], dtype=np.float32)
+        scores = queries @ chunk.T
+        if chunk_mask is not None:
+            scores[:, ~chunk_mask] = -np.inf
+        chunk_scores, chunk_indices = select_topk(scores, k)
+        merged_scores = np.concatenate([best_scores, chunk_scores], axis=1)
+        merged_indices = np.concatenate([best_indices, chunk_indices + start], axis=1)
+        best_scores, pos = select_topk(merged_scores, k)
+        best_indices = np.take_along_axis(merged_indices, pos, axis=1)
+    return pad_topk(best_scores, best_indices, requested)
+
+
+def pad_topk(scores, indices, k):
+    """Mark masked-out hits (-inf) with index -1 and pad to exactly k columns."""
+    indices = np.where(np.isneginf(scores), -1, indices)
+    missing = k - scores.shape[1]
+    if missing > 0:
+        scores = np.pad(scores, ((0, 0), (0, missing)), constant_values=-np.inf)
+        indices = np.pad(indices, ((0, 0), (0, missing)), constant_values=-1)
+    return scores, indices
+
+
+def topk_subset(queries, matrix, row_ids, k):
+    """
+    Exact top-k restricted to `row_ids` (e.g. a selective filter): gathers only
+    those rows instead of scanning the whole matrix. Returned indices are global.
+    """
+    row_ids = np.sort(row_ids)  # sorted gathers read the (memory-mapped) matrix sequentially
+    scores, local = topk_inner_product(queries, matrix[row_ids], k)
+    if len(row_ids) == 0:
+        return scores, local
+    return scores, np.where(local < 0, -1, row_ids[np.maximum(local, 0)])
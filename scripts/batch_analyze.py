@@ -0,0 +1,159 @@
+import os
+import sys
+import json
+import time
+import argparse
+from multiprocessing import Pool
+from tqdm import tqdm
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "flask_app"))
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".bmp")
+# Empty outputs mark a failed stage; LLM fields come back "" when OpenRouter is down or times out
+REQUIRED_FIELDS = (
+    "caption", "color_palette", "clip_embedding",
+    "season", "productDisplayName", "aesthetic_category", "aesthetic_vibe",
+)
+
+# -----------------------------------------------
+# Inputs
+# -----------------------------------------------
+def list_images(source):
+    """A directory (walked recursively), a CSV with an image_path column, or a text file of paths."""
+    if os.path.isdir(source):
+        paths = []
+        for root, _, files in os.walk(source):
+            paths.extend(os.path.join(root, f) for f in files if f.lower().endswith(IMAGE_EXTENSIONS))
+        return sorted(paths)
+    if source.endswith(".csv"):
+        import pandas as pd
+        return pd.read_csv(source)["image_path"].astype(str).tolist()
+    with open(source) as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def load_checkpoint(out_path):
+    """
+    {source: error of its latest record (None = success)} from `out_path`. A
+    line cut short by a crash is dropped (the file is truncated after the last
+    complete record).
+    """
+    latest = {}
+    if not os.path.exists(out_path):
+        return latest
+    valid_bytes = 0
+    with open(out_path, "rb") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            valid_bytes += len(line)
+            latest[record["source"]] = record.get("error")
+    if valid_bytes < os.path.getsize(out_path):
+        print(f"❌ Dropping a partial record at the end of {out_path}")
+        with open(out_path, "r+b") as f:
+            f.truncate(valid_bytes)
+    return latest
+
+# -----------------------------------------------
+# Worker process: one copy of the models, several images in flight
+# -----------------------------------------------
+_executor = None
+
+
+def init_worker(image_threads, inference_threads, llm_concurrency, verbose):
+    # Read by utils/* at import time, so set before the first import in this process
+    if inference_threads:
+        os.environ["INFERENCE_THREADS"] = str(inference_threads)
+    os.environ["LLM_MAX_CONCURRENCY"] = str(llm_concurrency)
+    os.environ.setdefault("INFERENCE_MAX_BATCH", str(image_threads))
+    if not verbose:
+        sys.stdout = open(os.devnull, "w")
+
+    global _executor
+    from concurrent.futures import ThreadPoolExecutor
+    from utils.model_registry import models
+    import utils.process_new_image  # noqa: F401 (starts the micro-batchers)
+
+    models.warm_up(background=False)
+    # Concurrent images share BLIP/CLIP forward passes through the MicroBatchers
+    _executor = ThreadPoolExecutor(max_workers=image_threads, thread_name_prefix="batch-analyze")
+
+
+def analyze_one(path):
+    from utils.process_new_image import process_new_image
+    try:
+        result = process_new_image(path)
+    except Exception as e:
+        return {"source": path, "error": f"{type(e).__name__}: {e}"}
+    missing = [k for k in REQUIRED_FIELDS if not result[k]]
+    error = f"incomplete analysis: {', '.join(missing)}" if missing else None
+    return {"source": path, "error": error, **result}
+
+
+def analyze_chunk(paths):
+    return list(_executor.map(analyze_one, paths))
+
+# -----------------------------------------------
+# Main
+# -----------------------------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Analyse many images offline (caption, palette, LLM attributes, CLIP) with resumable JSONL output."
+    )
+    parser.add_argument("source", help="image directory, CSV with an image_path column, or text file of paths")
+    parser.add_argument("--out", default="data/batch_analysis.jsonl", help="JSONL results, appended and resumed")
+    parser.add_argument("--parquet", help="also write the successful records to this Parquet file at the end")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 4),
+                        help="processes, each loading its own BLIP/CLIP")
+    parser.add_argument("--images-per-worker", type=int, default=8,
+                        help="images in flight per process; their model calls are batched together")
+    parser.add_argument("--llm-concurrency", type=int, default=16, help="in-flight LLM calls across all workers")
+    parser.add_argument("--chunk-size", type=int, default=32, help="images handed to a worker at a time")
+    parser.add_argument("--retry-failed", action="store_true", help="re-run sources whose last record has an error")
+    parser.add_argument("--verbose", action="store_true", help="keep the per-image pipeline output")
+    args = parser.parse_args()
+    if args.parquet:
+        try:
+            import pyarrow  # noqa: F401 (pandas' Parquet engine)
+        except ImportError:
+            parser.error("--parquet needs pyarrow (pip install pyarrow)")
+
+    paths = list_images(args.source)
+    checkpoint = load_checkpoint(args.out)
+    skip = {s for s, error in checkpoint.items() if not error or not args.retry_failed}
+    todo = [p for p in paths if p not in skip]
+    print(f"✅ Found {len(paths)} images, {len(paths) - len(todo)} already in {args.out}, {len(todo)} to process")
+
+    inference_threads = max(1, (os.cpu_count() or 1) // args.workers)
+    llm_per_worker = max(1, args.llm_concurrency // args.workers)
+    chunks = [todo[i:i + args.chunk_size] for i in range(0, len(todo), args.chunk_size)]
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    start, processed, errors = time.monotonic(), 0, 0
+    with open(args.out, "a") as out, Pool(
+        args.workers, initializer=init_worker,
+        initargs=(args.images_per_worker, inference_threads, llm_per_worker, args.verbose),
+    ) as pool, tqdm(total=len(todo), desc="Analysing", unit="img") as progress:
+        for records in pool.imap_unordered(analyze_chunk, chunks):
+            for record in records:
+                out.write(json.dumps(record) + "\n")
+                errors += bool(record["error"])
+            # Each finished chunk is durable before it counts as done
+            out.flush()
+            os.fsync(out.fileno())
+            processed += len(records)
+            progress.update(len(records))
+            progress.set_postfix(errors=errors, img_s=f"{processed / (time.monotonic() - start):.2f}")
+
+    elapsed = time.monotonic() - start
+    print(f"✅ Analysed {processed} images in {elapsed:.1f}s ({processed / max(elapsed, 1e-9):.2f} img/s), {errors} failed")
+
+    if args.parquet:
+        import pandas as pd
+        with open(args.out) as f:
+            latest = {r["source"]: r for r in map(json.loads, f)}
+        records = [r for r in latest.values() if not r["error"]]
+        pd.DataFrame(records).drop(columns=["error"]).to_parquet(args.parquet, index=False)
+        print(f"✅ Wrote {len(records)} records to {args.parquet}")
@@ -0,0 +1,108 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "flask_app"))
+from utils.ann_index import build_index
+
+ARTIFACT_EMBEDDINGS = "data/catalog_artifact/embeddings.npy"
+
+
+# -----------------------------------------------
+# DATA
+# -----------------------------------------------
+def synthetic_catalog(n, dim, n_clusters=200, seed=0):
+    """Clustered unit vectors, closer to real CLIP embeddings than uniform noise."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((n_clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, n_clusters, n)] + 0.6 * rng.standard_normal((n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def make_queries(embeddings, n_queries, noise=0.3, seed=1):
+    """Perturbed catalog items, like a user photo of a product that is in the catalog."""
+    rng = np.random.default_rng(seed)
+    picks = np.asarray(embeddings[rng.choice(len(embeddings), n_queries, replace=False)], dtype=np.float32)
+    queries = picks + noise * rng.standard_normal(picks.shape).astype(np.float32) / np.sqrt(picks.shape[1])
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+# -----------------------------------------------
+# MEASURE
+# -----------------------------------------------
+def timed_search(index, queries, k, **knobs):
+    """Search one query at a time (like /analyze) and return results + per-query latency in ms."""
+    indices, latencies = [], []
+    for q in queries:
+        start = time.perf_counter()
+        _, idx = index.search(q, k, **knobs)
+        latencies.append((time.perf_counter() - start) * 1000)
+        indices.append(idx[0])
+    return np.array(indices), np.array(latencies)
+
+
+def recall_at_k(found, truth):
+    hits = [len(np.intersect1d(f[f >= 0], t)) for f, t in zip(found, truth)]
+    return float(np.sum(hits)) / truth.size
+
+
+def resident_mb(index):
+    """RAM the index needs resident; compressed indexes only page in re-ranked rows."""
+    if hasattr(index, "code_bytes"):
+        return index.code_bytes() / 1e6
+    extra = index.list_ids.nbytes + index.centroids.nbytes if hasattr(index, "list_ids") else 0
+    return (np.asarray(index.embeddings[:1]).nbytes * len(index.embeddings) + extra) / 1e6
+
+
+def report(embeddings, n_queries, k, nlist, nprobes, pq_m, reranks):
+    queries = make_queries(embeddings, n_queries)
+
+    flat = build_index("flat", embeddings)
+    truth, flat_lat = timed_search(flat, queries, k)
+
+    runs = []
+    for kind, params in (("ivf", {"nlist": nlist}), ("sq8", {}), ("pq", {"m": pq_m})):
+        start = time.perf_counter()
+        index = build_index(kind, embeddings, **params)
+        print(f"✅ Built {kind} in {time.perf_counter() - start:.2f}s")
+        if kind == "ivf":
+            runs += [(f"ivf nprobe={p}", index, {"nprobe": p}) for p in nprobes]
+        else:
+            runs += [(f"{kind} rerank={r}", index, {"rerank": r}) for r in reranks]
+
+    print(f"\n📊 Catalog: {embeddings.shape[0]} x {embeddings.shape[1]}, queries: {n_queries}, k={k}\n")
+    print(f"{'backend':<18}{'recall@k':>10}{'p50 ms':>10}{'p99 ms':>10}{'speedup':>10}{'RAM MB':>10}")
+    print(f"{'flat (exact)':<18}{1.0:>10.3f}{np.percentile(flat_lat, 50):>10.2f}"
+          f"{np.percentile(flat_lat, 99):>10.2f}{1.0:>10.1f}{resident_mb(flat):>10.1f}")
+    for label, index, knobs in runs:
+        found, lat = timed_search(index, queries, k, **knobs)
+        print(f"{label:<18}{recall_at_k(found, truth):>10.3f}"
+              f"{np.percentile(lat, 50):>10.2f}{np.percentile(lat, 99):>10.2f}"
+              f"{np.median(flat_lat) / np.median(lat):>10.1f}{resident_mb(index):>10.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recall@k, latency and RAM of the ANN/compressed backends against exact search.")
+    parser.add_argument("--synthetic", type=int, default=None,
+                        help="use N synthetic vectors instead of data/catalog_artifact/embeddings.npy")
+    parser.add_argument("--dim", type=int, default=512)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=12)
+    parser.add_argument("--nlist", type=int, default=None)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    parser.add_argument("--pq-m", type=int, default=64, help="PQ sub-vectors (bytes per item)")
+    parser.add_argument("--rerank", type=int, nargs="+", default=[0, 4, 10],
+                        help="candidates re-scored exactly per result for sq8/pq (0 = codes only)")
+    args = parser.parse_args()
+
+    if args.synthetic or not os.path.exists(ARTIFACT_EMBEDDINGS):
+        n = args.synthetic or 50000
+        print(f"✅ Generating synthetic catalog of {n} vectors...")
+        embeddings = synthetic_catalog(n, args.dim)
+    else:
+        print(f"✅ Loading {ARTIFACT_EMBEDDINGS}...")
+        embeddings = np.load(ARTIFACT_EMBEDDINGS, mmap_mode="r").astype(np.float32)
+
+    report(embeddings, args.queries, args.k, args.nlist, args.nprobe, args.pq_m, args.rerank)
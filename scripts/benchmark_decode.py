@@ -0,0 +1,119 @@
+import io
+import os
+import sys
+import time
+import argparse
+import resource
+import tempfile
+import multiprocessing as mp
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "flask_app"))
+from utils.image_io import COLOR_THUMBNAIL_SIZE, decode_image
+
+# Input sizes the BLIP / CLIP processors resize to; emulated here so the benchmark needs no model weights
+MODEL_SIZES = {"blip": (384, 384), "clip": (224, 224)}
+
+
+# -----------------------------------------------
+# The two preprocessing strategies
+# -----------------------------------------------
+def preprocess_per_stage(path):
+    """Original pipeline: save the upload, then every stage re-opens and fully decodes it."""
+    with open(path, "rb") as f:
+        data = f.read()                                        # analysis cache hash
+    Image.open(path).convert("RGB").resize(MODEL_SIZES["blip"], Image.BICUBIC)
+    Image.open(path).convert("RGB").resize(COLOR_THUMBNAIL_SIZE)
+    Image.open(path).convert("RGB").resize(MODEL_SIZES["clip"], Image.BICUBIC)
+    return data
+
+
+def preprocess_shared(path):
+    """Shared pass: bytes from the request, one (draft) decode, every stage derives from it."""
+    with open(path, "rb") as f:
+        image = decode_image(f.read())
+    image.image.resize(MODEL_SIZES["blip"], Image.BICUBIC)
+    image.color_thumbnail()
+    image.image.resize(MODEL_SIZES["clip"], Image.BICUBIC)
+    return image.data
+
+
+STRATEGIES = {"per-stage": preprocess_per_stage, "shared": preprocess_shared}
+
+
+def peak_rss_mb():
+    """
+    High-water RSS of this process. VmHWM is per address space; ru_maxrss survives
+    exec() and would report the parent's peak (e.g. from building the test JPEG).
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+
+
+def run_strategy(name, path, repeats, out):
+    """Runs in a fresh process so each strategy gets its own peak-RSS high-water mark."""
+    fn = STRATEGIES[name]
+    baseline = peak_rss_mb()  # interpreter + imports, before any image is touched
+    fn(path)  # warm-up
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(path)
+        times.append((time.perf_counter() - start) * 1000)
+    out.put((name, np.median(times), np.percentile(times, 99), peak_rss_mb() - baseline))
+
+
+def make_test_jpeg(width, height):
+    """Noisy gradient photo-sized JPEG, written to a temp file."""
+    rng = np.random.default_rng(0)
+    x = np.linspace(0, 255, width, dtype=np.float32)[None, :, None]
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None, None]
+    pixels = (x * [1.0, 0.5, 0.2] + y * [0.1, 0.4, 0.8]) / 1.2 + rng.normal(0, 12, (height, width, 3))
+    buf = io.BytesIO()
+    Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)).save(buf, "JPEG", quality=90)
+    fd, path = tempfile.mkstemp(suffix=".jpg")
+    with os.fdopen(fd, "wb") as f:
+        f.write(buf.getvalue())
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Decode time and peak RSS: per-stage decoding vs one shared pass.")
+    parser.add_argument("--image", help="image to benchmark (default: synthetic phone-camera JPEGs)")
+    parser.add_argument("--sizes", nargs="+", default=["1024x768", "4032x3024"],
+                        help="synthetic JPEG sizes when --image is not given")
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.image:
+        cases = [(args.image, os.path.basename(args.image), False)]
+    else:
+        cases = []
+        for size in args.sizes:
+            w, h = (int(v) for v in size.split("x"))
+            cases.append((make_test_jpeg(w, h), f"synthetic {size}", True))
+
+    ctx = mp.get_context("spawn")
+    print(f"\n📊 Preprocessing for hash + BLIP + palette + CLIP, {args.repeats} repeats\n")
+    print(f"{'image':<24}{'strategy':<12}{'p50 ms':>10}{'p99 ms':>10}{'peak RSS +MB':>14}")
+    for path, label, temporary in cases:
+        results = {}
+        for name in STRATEGIES:
+            out = ctx.Queue()
+            proc = ctx.Process(target=run_strategy, args=(name, path, args.repeats, out))
+            proc.start()
+            results[name] = out.get()
+            proc.join()
+        for name, p50, p99, rss in results.values():
+            print(f"{label:<24}{name:<12}{p50:>10.1f}{p99:>10.1f}{rss:>14.1f}")
+        speedup = results["per-stage"][1] / max(results["shared"][1], 1e-9)
+        print(f"{'':<24}{'speedup':<12}{speedup:>9.1f}x")
+        if temporary:
+            os.remove(path)
@@ -0,0 +1,282 @@
+"""
+End-to-end latency of the Flask endpoints on synthetic inputs, reproducible across commits.
+
+Builds a synthetic catalog and tiny random BLIP/CLIP (scripts/make_benchmark_fixtures.py),
+answers LLM calls from the local OpenRouter stub with a fixed latency, then drives
+/analyze, /generate-outfits and /compose-outfits through Flask's test client at several
+concurrency levels. Per-stage times come from each response's Server-Timing header.
+
+    python scripts/benchmark_end_to_end.py --items 20000 --concurrency 1 4 8
+    python scripts/benchmark_end_to_end.py --compare data/benchmarks/end_to_end_<old commit>.json
+
+Writes one JSON document (config, commit, per-scenario latency percentiles,
+throughput, per-stage times, load times, peak RSS).
+"""
+import os
+import sys
+import json
+import time
+import random
+import platform
+import argparse
+import tempfile
+import threading
+import subprocess
+import numpy as np
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.abspath(os.path.join(SCRIPTS_DIR, ".."))
+sys.path.insert(0, os.path.join(REPO_ROOT, "flask_app"))
+sys.path.insert(0, SCRIPTS_DIR)
+from openrouter_stub import start_stub_server
+from make_benchmark_fixtures import build_fixtures, synthetic_jpegs
+
+SCENARIOS = ["analyze", "generate_outfits", "compose_outfits"]
+
+
+# -----------------------------------------------
+# Measurement helpers
+# -----------------------------------------------
+def peak_rss_bytes():
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # Linux reports KiB
+
+
+def git_commit():
+    try:
+        commit = subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, text=True).strip()
+        dirty = bool(subprocess.check_output(["git", "status", "--porcelain", "--untracked-files=no"],
+                                             cwd=REPO_ROOT, text=True).strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def parse_server_timing(header):
+    """"decode;dur=1.2, clip;dur=30.5" -> {"decode": 1.2, "clip": 30.5} (ms; repeated stages are summed)"""
+    stages = {}
+    for entry in filter(None, (part.strip() for part in (header or "").split(","))):
+        name, _, params = entry.partition(";")
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "dur":
+                stages[name] = stages.get(name, 0.0) + float(value)
+    return stages
+
+
+def summarize(values):
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) == 0:
+        return None
+    return {
+        "mean": round(float(values.mean()), 3),
+        "p50": round(float(np.percentile(values, 50)), 3),
+        "p95": round(float(np.percentile(values, 95)), 3),
+        "p99": round(float(np.percentile(values, 99)), 3),
+        "max": round(float(values.max()), 3),
+    }
+
+
+def run_scenario(app, send, total_requests, concurrency):
+    """
+    `concurrency` threads, each with its own test client, issue `total_requests`
+    in all, back to back. send(client, i) makes request i and returns the response.
+    """
+    records = []
+    lock = threading.Lock()
+    counter = iter(range(total_requests))
+
+    def worker():
+        client = app.test_client()
+        local = []
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                break
+            start = time.perf_counter()
+            response = send(client, i)
+            latency_ms = (time.perf_counter() - start) * 1000
+            local.append((latency_ms, response.status_code, parse_server_timing(response.headers.get("Server-Timing"))))
+        with lock:
+            records.extend(local)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    stage_names = sorted({name for _, _, stages in records for name in stages})
+    return {
+        "requests": len(records),
+        "concurrency": concurrency,
+        "errors": sum(status != 200 for _, status, _ in records),
+        "throughput_rps": round(len(records) / elapsed, 3),
+        "latency_ms": summarize([latency for latency, _, _ in records]),
+        "stages_ms": {name: summarize([s[name] for _, _, s in records if name in s]) for name in stage_names},
+    }
+
+
+# -----------------------------------------------
+# Requests
+# -----------------------------------------------
+def make_senders(images, metadata, dim, seed):
+    """One request builder per scenario; request i always carries the same payload."""
+    import io
+
+    rng = random.Random(seed)
+    tops = [int(i) for i in metadata.loc[metadata["category"] == "Topwear", "id"]]
+    bottoms = [int(i) for i in metadata.loc[metadata["category"] == "Bottomwear", "id"]]
+    outfit_payloads = [{"tops": rng.sample(tops, 10), "bottoms": rng.sample(bottoms, 10)} for _ in range(16)]
+    queries = np.random.default_rng(seed).standard_normal((16, dim)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    def analyze(client, i):
+        upload = (io.BytesIO(images[i % len(images)]), f"query_{i % len(images)}.jpg")
+        return client.post("/analyze", data={"image": upload}, content_type="multipart/form-data")
+
+    def generate_outfits(client, i):
+        return client.post("/generate-outfits", json=outfit_payloads[i % len(outfit_payloads)])
+
+    def compose_outfits(client, i):
+        return client.post("/compose-outfits", json={"clip_embedding": queries[i % len(queries)].tolist(), "top_n": 5})
+
+    return {"analyze": analyze, "generate_outfits": generate_outfits, "compose_outfits": compose_outfits}
+
+
+def register_tiny_models(blip_dir, clip_dir):
+    """Serve the tiny models under the registry names the pipeline uses ("blip", "clip")."""
+    from utils.inference_backends import TorchBlipCaptioner, TorchClipEncoder
+    from utils.model_registry import load_blip_torch, load_clip_torch, models
+
+    models.register("blip", lambda: TorchBlipCaptioner(*load_blip_torch(blip_dir)))
+    models.register("clip", lambda: TorchClipEncoder(*load_clip_torch(clip_dir)))
+    return models
+
+# -----------------------------------------------
+# Comparison
+# -----------------------------------------------
+def compare(previous, current):
+    print(f"\n📊 Against {(previous.get('commit') or 'unknown')[:10]} (latency: lower is better, req/s: higher is better)\n")
+    print(f"{'scenario':<18}{'conc':>5}   {'p50 ms':<24}{'p99 ms':<24}{'req/s':<24}")
+
+    def cell(old, new):
+        change = (new - old) / old * 100 if old else 0.0
+        return f"{old:.1f}→{new:.1f} ({change:+.0f}%)"
+
+    for name, runs in current["scenarios"].items():
+        for concurrency, run in runs.items():
+            old = previous.get("scenarios", {}).get(name, {}).get(concurrency)
+            if old is None or run["latency_ms"] is None or old["latency_ms"] is None:
+                continue
+            print(f"{name:<18}{concurrency:>5}   {cell(old['latency_ms']['p50'], run['latency_ms']['p50']):<24}"
+                  f"{cell(old['latency_ms']['p99'], run['latency_ms']['p99']):<24}"
+                  f"{cell(old['throughput_rps'], run['throughput_rps']):<24}")
+
+# -----------------------------------------------
+# Main
+# -----------------------------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reproducible end-to-end benchmark of the Flask endpoints.")
+    parser.add_argument("--items", type=int, default=20000, help="synthetic catalog size")
+    parser.add_argument("--dim", type=int, default=512, help="embedding size")
+    parser.add_argument("--index", default=None, help="catalog ANN index (default: flat)")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--requests", type=int, default=32, help="measured requests per scenario and concurrency")
+    parser.add_argument("--warmup", type=int, default=4, help="unmeasured requests per scenario first")
+    parser.add_argument("--images", type=int, default=8, help="distinct synthetic query images")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="stub seconds per LLM call")
+    parser.add_argument("--llm-jitter", type=float, default=0.0, help="stub ± uniform jitter in seconds")
+    parser.add_argument("--caches", action="store_true",
+                        help="keep the analysis/prompt caches on (default off, so every request runs every stage)")
+    parser.add_argument("--workdir", help="where fixtures are written (default: a fresh temp directory)")
+    parser.add_argument("--out", help="results JSON (default: data/benchmarks/end_to_end_<commit>.json)")
+    parser.add_argument("--compare", help="earlier results JSON to print the differences against")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    commit, dirty = git_commit()
+    out = os.path.abspath(args.out or os.path.join(
+        REPO_ROOT, "data", "benchmarks", f"end_to_end_{(commit or 'unknown')[:10]}.json"
+    ))
+    previous_path = os.path.abspath(args.compare) if args.compare else None
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix="stylespark-bench-"))
+    os.makedirs(workdir, exist_ok=True)
+
+    start = time.perf_counter()
+    paths = build_fixtures(workdir, args.items, args.dim, args.seed, args.index)
+    print(f"✅ Fixtures in {workdir} ({time.perf_counter() - start:.1f}s)")
+
+    server, stub = start_stub_server(latency=args.llm_latency, jitter=args.llm_jitter)
+    # Read by utils/* at import time, so set before the first import below
+    os.environ.update({
+        "CATALOG_ARTIFACT_DIR": paths["artifact_dir"],
+        "CATALOG_RELOAD_INTERVAL": "3600",
+        "OPENROUTER_URL": f"http://127.0.0.1:{server.server_address[1]}/api/v1/chat/completions",
+        "SERVER_TIMING": "1",
+        "MODEL_WARMUP": "lazy",
+        "EMBEDDING_MODEL_CHECK": "off",
+    })
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ.setdefault("ANALYSIS_CACHE_PATH", os.path.join(workdir, "analysis_cache.sqlite3"))
+    if not args.caches:
+        os.environ["ANALYSIS_CACHE_ENABLED"] = "0"
+        os.environ["PROMPT_CACHE_ENABLED"] = "0"
+    os.chdir(workdir)  # app.py creates its uploads/ folder in the cwd
+
+    memory = {"baseline": peak_rss_bytes()}
+    from utils.catalog_store import catalog_store
+    start = time.perf_counter()
+    catalog = catalog_store.get()
+    catalog_seconds = time.perf_counter() - start
+    memory["after_catalog"] = peak_rss_bytes()
+
+    models = register_tiny_models(paths["blip_dir"], paths["clip_dir"])
+    models.warm_up(background=False)
+    if not models.is_ready(["blip", "clip"]):
+        sys.exit(f"❌ Tiny models failed to load: {models.status()}")
+    memory["after_models"] = peak_rss_bytes()
+
+    import app as flask_app
+    senders = make_senders(synthetic_jpegs(args.images, seed=args.seed), catalog.metadata, args.dim, args.seed)
+
+    results = {}
+    for name in args.scenarios:
+        run_scenario(flask_app.app, senders[name], args.warmup, 1)
+        results[name] = {}
+        for concurrency in args.concurrency:
+            run = run_scenario(flask_app.app, senders[name], args.requests, concurrency)
+            results[name][str(concurrency)] = run
+            latency = run["latency_ms"]
+            print(f"📊 {name:<18} conc {concurrency:>3}: {run['throughput_rps']:7.2f} req/s, "
+                  f"p50 {latency['p50']:8.1f} ms, p99 {latency['p99']:8.1f} ms, {run['errors']} errors")
+    memory["peak"] = peak_rss_bytes()
+
+    report = {
+        "benchmark": "end_to_end",
+        "commit": commit,
+        "dirty": dirty,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "host": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "config": {k: v for k, v in vars(args).items() if k not in ("out", "compare", "workdir")},
+        "catalog": {"items": len(catalog), "dim": int(catalog.embeddings.shape[1]),
+                    "load_seconds": round(catalog_seconds, 3)},
+        "models": models.status(),
+        "llm_stub": stub.stats(),
+        "scenarios": results,
+        "peak_rss_bytes": memory,
+    }
+
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Results written to {out} (peak RSS {memory['peak'] / 2**20:.0f} MiB)")
+
+    if previous_path:
+        with open(previous_path) as f:
+            compare(json.load(f), report)
@@ -0,0 +1,83 @@
+import os
+import sys
+import time
+import json
+import argparse
+import urllib.request
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(SCRIPTS_DIR, "..", "flask_app"))
+sys.path.insert(0, SCRIPTS_DIR)
+from openrouter_stub import start_stub_server
+
+SAMPLE_CAPTIONS = [
+    "a woman wearing a black dress",
+    "a man in a blue denim jacket",
+    "a pair of white sneakers",
+    "a red floral summer skirt",
+]
+SAMPLE_COLORS = [["#1a1a1a", "#f2f2f2", "#7f7f7f"], ["#2b4c7e", "#dcdcdc"], ["#ffffff", "#c0c0c0"], ["#b22222", "#ffe4e1"]]
+
+# Near-duplicates of the samples above: same meaning, different surface form / slightly different palette
+VARIANT_CAPTIONS = [
+    "A woman wearing the black dress.",
+    "a man in a blue denim  jacket",
+    "a pair of white sneakers",
+    "a red floral summer skirt.",
+]
+VARIANT_COLORS = [["#141414", "#f5f5f5", "#808080"], ["#2a4b80", "#dddddd"], ["#fefefe", "#c2c2c2"], ["#b32020", "#ffe5e0"]]
+
+
+def stub_stats(base_url):
+    with urllib.request.urlopen(f"{base_url}/stats") as response:
+        return json.load(response)
+
+
+def reset_stats(base_url):
+    urllib.request.urlopen(urllib.request.Request(f"{base_url}/stats/reset", data=b"{}", method="POST")).read()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="LLM round trips, prompt tokens and latency per image for each attribute mode.")
+    parser.add_argument("--images", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.2, help="stub latency per call (seconds)")
+    parser.add_argument("--invalid-rate", type=float, default=0.0, help="stub: fraction of invalid structured answers")
+    args = parser.parse_args()
+
+    server, _ = start_stub_server(latency=args.latency, invalid_rate=args.invalid_rate)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    os.environ["OPENROUTER_URL"] = f"{base_url}/api/v1/chat/completions"
+
+    import utils.llm_attributes as llm_attributes
+    from utils.llm_attributes import predict_attributes
+    from utils.prompt_cache import PromptCache
+
+    # Mode comparison runs uncached so every image pays its real round trips
+    llm_attributes.prompt_cache = None
+
+    print(f"{'mode':<12}{'requests/img':>14}{'tokens/img':>12}{'ms/img':>10}{'complete':>10}")
+    for mode in ("per-field", "structured"):
+        reset_stats(base_url)
+        complete = 0
+        start = time.perf_counter()
+        for i in range(args.images):
+            fields = predict_attributes(SAMPLE_CAPTIONS[i % 4], SAMPLE_COLORS[i % 4], mode=mode)
+            complete += all(fields.values())
+        elapsed_ms = (time.perf_counter() - start) * 1000 / args.images
+        stats = stub_stats(base_url)
+        print(f"{mode:<12}{stats['requests'] / args.images:>14.2f}{stats['prompt_tokens'] / args.images:>12.1f}"
+              f"{elapsed_ms:>10.1f}{complete:>9}/{args.images}")
+
+    # Prompt cache: originals then near-duplicate captions/palettes
+    llm_attributes.prompt_cache = cache = PromptCache(path="")
+    reset_stats(base_url)
+    start = time.perf_counter()
+    for i in range(args.images):
+        captions, colors = (SAMPLE_CAPTIONS, SAMPLE_COLORS) if i % 2 == 0 else (VARIANT_CAPTIONS, VARIANT_COLORS)
+        predict_attributes(captions[i % 4], colors[i % 4])
+    elapsed_ms = (time.perf_counter() - start) * 1000 / args.images
+    stats, cache_stats = stub_stats(base_url), cache.stats()
+    print(f"\n📊 Prompt cache over {args.images} images (structured mode):")
+    print(f"   requests/img: {stats['requests'] / args.images:.2f}, ms/img: {elapsed_ms:.1f}")
+    print(f"   hit ratio: {cache_stats['hit_ratio']:.2f}, saved LLM latency: {cache_stats['saved_seconds']:.2f}s")
+    server.shutdown()
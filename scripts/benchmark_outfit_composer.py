@@ -0,0 +1,83 @@
+import os
+import sys
+import time
+import argparse
+import itertools
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "flask_app"))
+from utils.catalog_store import CatalogSnapshot
+from utils.colour_features import ColourFeatures
+from utils.filters import FilterIndex
+from utils.outfit_composer import DEFAULT_SLOTS, build_pools, compose_outfits, pair_gain
+
+SLOT_CATEGORIES = [("Apparel", "Topwear"), ("Apparel", "Bottomwear"), ("Footwear", "Shoes"), ("Accessories", "Bags")]
+
+
+def synthetic_catalog(per_slot, dim=512, seed=0):
+    """CatalogSnapshot with `per_slot` items in each DEFAULT_SLOTS category, random colours and embeddings."""
+    rng = np.random.default_rng(seed)
+    n = per_slot * len(SLOT_CATEGORIES)
+    master, category = zip(*[c for c in SLOT_CATEGORIES for _ in range(per_slot)])
+    metadata = pd.DataFrame({
+        "id": np.arange(10000, 10000 + n),
+        "productDisplayName": [f"item {i}" for i in range(n)],
+        "masterCategory": master,
+        "category": category,
+        "gender": rng.choice(["Men", "Women"], n),
+    })
+    embeddings = rng.normal(size=(n, dim)).astype(np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    colours = ColourFeatures(metadata["id"], rng.integers(0, 256, (n, 3)),
+                             np.zeros((n, 5, 3)), np.full((n, 5), 0.2))
+    return CatalogSnapshot(metadata, embeddings, None, FilterIndex.build(metadata), None, colours)
+
+
+def exhaustive_best(catalog, candidates_per_slot, query=None):
+    """Best score over every combination of the same candidate pools the beam search sees."""
+    pools = build_pools(catalog, DEFAULT_SLOTS, None, {}, query, candidates_per_slot)
+    best = -np.inf
+    for combo in itertools.product(*[range(len(p.rows)) for p in pools]):
+        score = sum(p.unary[i] for p, i in zip(pools, combo))
+        for t, s in itertools.combinations(range(len(pools)), 2):
+            score += pair_gain(pools[t], np.array([combo[t]]), pools[s])[0, combo[s]]
+        best = max(best, score)
+    return best
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Beam-search outfit composition: latency and quality vs exhaustive.")
+    parser.add_argument("--per-slot", type=int, nargs="+", default=[1000, 10000], help="catalog items per slot")
+    parser.add_argument("--candidates", type=int, nargs="+", default=[100, 300])
+    parser.add_argument("--beam", type=int, nargs="+", default=[8, 32, 128])
+    parser.add_argument("--exhaustive-candidates", type=int, default=12,
+                        help="pool size per slot for the exhaustive quality check (slots^pool combinations)")
+    parser.add_argument("--top-n", type=int, default=5)
+    args = parser.parse_args()
+
+    # Quality: beam search vs brute force on pools small enough to enumerate
+    catalog = synthetic_catalog(1000)
+    k = args.exhaustive_candidates
+    best = exhaustive_best(catalog, k)
+    print(f"\n📊 Quality vs exhaustive search ({k}^{len(DEFAULT_SLOTS)} = {k ** len(DEFAULT_SLOTS)} looks)\n")
+    print(f"{'beam':>6}{'best score':>12}{'exhaustive':>12}{'ratio':>8}")
+    for beam in args.beam:
+        looks, _ = compose_outfits(catalog, top_n=1, beam_width=beam, candidates_per_slot=k, budget_ms=1e9)
+        print(f"{beam:>6}{looks[0]['score']:>12.3f}{best:>12.3f}{looks[0]['score'] / best:>8.3f}")
+
+    print(f"\n📊 Latency, top-{args.top_n} looks, {len(DEFAULT_SLOTS)} slots\n")
+    print(f"{'items/slot':>11}{'candidates':>12}{'beam':>6}{'p50 ms':>9}{'looks':>7}{'distinct items':>16}")
+    for per_slot in args.per_slot:
+        catalog = synthetic_catalog(per_slot)
+        query = catalog.embeddings[0]
+        for candidates in args.candidates:
+            for beam in args.beam:
+                times = []
+                for _ in range(5):
+                    start = time.perf_counter()
+                    looks, _ = compose_outfits(catalog, query_embedding=query, top_n=args.top_n, beam_width=beam,
+                                               candidates_per_slot=candidates, budget_ms=1e9)
+                    times.append((time.perf_counter() - start) * 1000)
+                distinct = len({item["id"] for look in looks for item in look["items"].values()})
+                print(f"{per_slot:>11}{candidates:>12}{beam:>6}{np.median(times):>9.1f}{len(looks):>7}{distinct:>16}")
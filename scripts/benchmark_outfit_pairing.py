@@ -0,0 +1,63 @@
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "flask_app"))
+from utils.generate_outfits import score_pair
+from utils.outfit_pairing import top_pairs
+
+
+def legacy_top_pairs(top_colours, bottom_colours, top_n):
+    """The original nested loop: one dict and one score_pair call per pair, full sort."""
+    outfits = []
+    for i, top in enumerate(top_colours):
+        for j, bottom in enumerate(bottom_colours):
+            outfits.append({"top": i, "bottom": j, "score": score_pair(top, bottom)})
+    outfits_sorted = sorted(outfits, key=lambda x: x["score"], reverse=True)
+    return [(o["top"], o["bottom"], o["score"]) for o in outfits_sorted[:top_n]]
+
+
+def measure(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak / 2**20
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Outfit pairing: Python nested loop vs vectorized block top-n.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000], help="tops = bottoms = size")
+    parser.add_argument("--legacy-max", type=int, default=1000, help="skip the nested loop above this size")
+    parser.add_argument("--top-n", type=int, default=5)
+    parser.add_argument("--dim", type=int, default=512, help="embedding dim for the CLIP tie-break run")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"\n📊 top-{args.top_n} outfit pairs\n")
+    print(f"{'tops x bottoms':>16}{'method':>14}{'seconds':>10}{'peak MB':>10}{'same top-n':>12}")
+    for size in args.sizes:
+        tops = rng.integers(0, 256, (size, 3)).astype(np.float32)
+        bottoms = rng.integers(0, 256, (size, 3)).astype(np.float32)
+        label = f"{size}x{size}"
+
+        fast, fast_s, fast_mb = measure(lambda: top_pairs(tops, bottoms, args.top_n))
+        fast = [(i, j, s) for i, j, s, _ in fast]
+        legacy_s = None
+        if size <= args.legacy_max:
+            legacy, legacy_s, legacy_mb = measure(lambda: legacy_top_pairs(tops.tolist(), bottoms.tolist(), args.top_n))
+            print(f"{label:>16}{'loop':>14}{legacy_s:>10.3f}{legacy_mb:>10.1f}{'':>12}")
+        same = "" if legacy_s is None else str(fast == legacy)
+        print(f"{label:>16}{'vectorized':>14}{fast_s:>10.3f}{fast_mb:>10.1f}{same:>12}")
+
+        top_emb = rng.normal(size=(size, args.dim)).astype(np.float32)
+        bottom_emb = rng.normal(size=(size, args.dim)).astype(np.float32)
+        _, clip_s, clip_mb = measure(lambda: top_pairs(tops, bottoms, args.top_n, top_emb, bottom_emb))
+        print(f"{label:>16}{'+ CLIP ties':>14}{clip_s:>10.3f}{clip_mb:>10.1f}{'':>12}")
+        if legacy_s is not None:
+            print(f"{'':>16}{'speedup':>14}{legacy_s / fast_s:>9.0f}x")
@@ -0,0 +1,74 @@
+import os
+import sys
+import glob
+import time
+import argparse
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "flask_app"))
+from utils.palette import delta_e, extract_palette, rgb_to_lab
+
+METHODS = ["sklearn", "histogram-kmeans", "median-cut"]
+DEFAULT_IMAGES = ["assets/*.png", "assets/*.jpg", "data/images/*.jpg"]
+
+
+def synthetic_images(n, size=128, seed=0):
+    """Product-shot-like images: flat background plus a few soft-edged coloured garments."""
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:size, 0:size]
+    images = []
+    for _ in range(n):
+        img = np.full((size, size, 3), rng.integers(200, 256, 3), dtype=np.float64)
+        for _ in range(rng.integers(1, 4)):
+            cx, cy, r = rng.integers(20, size - 20, 2).tolist() + [rng.integers(15, 45)]
+            blob = np.clip(1.2 - np.hypot(xx - cx, yy - cy) / r, 0, 1)[..., None]
+            img = img * (1 - blob) + rng.integers(0, 256, 3) * blob
+        img += rng.normal(0, 6, img.shape)
+        images.append(Image.fromarray(np.clip(img, 0, 255).astype(np.uint8)))
+    return images
+
+
+def pixel_delta_e(pixels_lab, palette):
+    """Mean ΔE from each pixel to its nearest palette colour (how well the palette summarizes the image)."""
+    palette_lab = rgb_to_lab(palette)
+    return delta_e(pixels_lab[:, None, :], palette_lab[None, :, :]).min(axis=1).mean()
+
+
+def palette_delta_e(palette, reference):
+    """Mean ΔE from each reference (sklearn) colour to the nearest colour of `palette`."""
+    return delta_e(rgb_to_lab(reference)[:, None, :], rgb_to_lab(palette)[None, :, :]).min(axis=1).mean()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Palette engines vs sklearn KMeans: time and ΔE (CIE76, Lab).")
+    parser.add_argument("--images", nargs="+", default=DEFAULT_IMAGES, help="image paths or globs")
+    parser.add_argument("--limit", type=int, default=200)
+    parser.add_argument("--synthetic", type=int, default=50, help="synthetic images added to the set")
+    parser.add_argument("--colors", type=int, default=5)
+    args = parser.parse_args()
+
+    paths = sorted({p for pattern in args.images for p in glob.glob(pattern)})[:args.limit]
+    images = [Image.open(p).convert("RGB") for p in paths] + synthetic_images(args.synthetic)
+    pixel_sets = [np.asarray(img.resize((128, 128))).reshape(-1, 3) for img in images]
+    pixel_labs = [rgb_to_lab(p) for p in pixel_sets]
+    print(f"\n📊 {len(paths)} files + {args.synthetic} synthetic images, {args.colors} colours, 128x128\n")
+
+    palettes, timings = {}, {}
+    for method in METHODS:
+        palettes[method], timings[method] = [], []
+        for pixels in pixel_sets:
+            start = time.perf_counter()
+            centres, _ = extract_palette(pixels, args.colors, method)
+            timings[method].append((time.perf_counter() - start) * 1000)
+            palettes[method].append(centres)
+
+    print(f"{'method':<18}{'p50 ms':>9}{'p99 ms':>9}{'speedup':>9}{'pixel ΔE':>10}{'ΔE vs KMeans':>14}{'deterministic':>15}")
+    base_ms = np.median(timings["sklearn"])
+    for method in METHODS:
+        pix = np.mean([pixel_delta_e(l, p) for l, p in zip(pixel_labs, palettes[method])])
+        vs = np.mean([palette_delta_e(p, r) for p, r in zip(palettes[method], palettes["sklearn"])])
+        repeat = extract_palette(pixel_sets[0], args.colors, method)[0]
+        deterministic = np.array_equal(repeat, palettes[method][0])
+        print(f"{method:<18}{np.median(timings[method]):>9.2f}{np.percentile(timings[method], 99):>9.2f}"
+              f"{base_ms / np.median(timings[method]):>8.1f}x{pix:>10.2f}{vs:>14.2f}{str(deterministic):>15}")
@@ -0,0 +1,71 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+from sklearn.metrics.pairwise import cosine_similarity
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "flask_app"))
+from utils.topk import topk_inner_product
+
+
+# -----------------------------------------------
+# DATA
+# -----------------------------------------------
+def random_unit_matrix(n, dim, seed=0, chunk_size=262144):
+    """Random L2-normalized float32 rows, generated in chunks so 5M x 512 never needs a float64 copy."""
+    rng = np.random.default_rng(seed)
+    matrix = np.empty((n, dim), dtype=np.float32)
+    for start in range(0, n, chunk_size):
+        block = rng.standard_normal((min(chunk_size, n - start), dim), dtype=np.float32)
+        block /= np.linalg.norm(block, axis=1, keepdims=True)
+        matrix[start:start + len(block)] = block
+    return matrix
+
+
+# -----------------------------------------------
+# CANDIDATES
+# -----------------------------------------------
+def baseline_search(queries, matrix, k):
+    """What recommend.py used to do: cosine_similarity + full argsort."""
+    similarities = cosine_similarity(queries, matrix)
+    return np.argsort(-similarities, axis=1)[:, :k]
+
+
+def fused_search(queries, matrix, k):
+    return topk_inner_product(queries, matrix, k)[1]
+
+
+def best_time(fn, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000, result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Old (cosine_similarity + argsort) vs fused matmul + argpartition top-k.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50000, 500000, 5000000])
+    parser.add_argument("--dim", type=int, default=512)
+    parser.add_argument("--k", type=int, default=12)
+    parser.add_argument("--batch", type=int, default=1, help="queries per search call")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--skip-baseline-above", type=int, default=1000000,
+                        help="the baseline materializes float64 copies; skip it for larger catalogs")
+    args = parser.parse_args()
+
+    print(f"{'rows':>10}{'baseline ms':>14}{'fused ms':>12}{'speedup':>10}{'same top-k':>12}")
+    for n in args.sizes:
+        matrix = random_unit_matrix(n, args.dim)
+        queries = random_unit_matrix(args.batch, args.dim, seed=1)
+
+        fused_ms, fused_idx = best_time(lambda: fused_search(queries, matrix, args.k), args.repeats)
+        if n <= args.skip_baseline_above:
+            base_ms, base_idx = best_time(lambda: baseline_search(queries, matrix, args.k), args.repeats)
+            same = bool(np.array_equal(np.sort(base_idx, axis=1), np.sort(fused_idx, axis=1)))
+            print(f"{n:>10}{base_ms:>14.1f}{fused_ms:>12.1f}{base_ms / fused_ms:>10.1f}{str(same):>12}")
+        else:
+            print(f"{n:>10}{'skipped':>14}{fused_ms:>12.1f}{'-':>10}{'-':>12}")
+        del matrix
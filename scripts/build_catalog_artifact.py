@@ -0,0 +1,185 @@
+import os
+import sys
+import json
+import time
+import argparse
+import pandas as pd
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "flask_app"))
+from utils.ann_index import INDEX_TYPES, build_index, index_path
+from utils.catalog_store import embedding_spec_path, load_embeddings_file
+from utils.colour_features import ColourFeatures
+
+# Paths
+METADATA_CSV = "data/catalog_metadata.csv"
+EMBEDDINGS_PATH = "data/catalog_embeddings.npy"
+LEGACY_EMBEDDINGS_PATH = "data/catalog_embeddings.pt"
+FILENAMES_CSV = "data/image_filenames.csv"
+COLOURS_PATH = "data/catalog_colours.npz"  # from scripts/compute_colour_features.py
+ARTIFACT_DIR = "data/catalog_artifact"
+
+ARTIFACT_FORMAT_VERSION = 1
+
+
+# -----------------------------------------------
+# ALIGN METADATA WITH EMBEDDINGS
+# -----------------------------------------------
+def resolve_embeddings_path(embeddings_path):
+    if not os.path.exists(embeddings_path) and os.path.exists(LEGACY_EMBEDDINGS_PATH):
+        return LEGACY_EMBEDDINGS_PATH
+    return embeddings_path
+
+
+def align_catalog(metadata_csv, embeddings_path, filenames_csv):
+    """
+    Same join as the serving-side load_catalog(), done once at build time.
+    Returns metadata sorted in embedding order, the matching embedding rows and
+    the row each came from in the embedding file.
+    """
+    df = pd.read_csv(metadata_csv)
+    embeddings = load_embeddings_file(resolve_embeddings_path(embeddings_path))
+
+    filenames_df = pd.read_csv(filenames_csv)
+    filenames_df.rename(columns={filenames_df.columns[0]: "path"}, inplace=True)
+    filenames_df["id"] = filenames_df["path"].apply(
+        lambda x: int(os.path.splitext(os.path.basename(x))[0])
+    )
+    filenames_df["embedding_idx"] = np.arange(len(filenames_df))
+
+    df = df.merge(filenames_df, on="id")
+    source_rows = df["embedding_idx"].to_numpy()
+    aligned = embeddings[source_rows]
+    df = df.drop(columns=["embedding_idx"]).reset_index(drop=True)
+    return df, aligned, source_rows
+
+
+def to_columns(df):
+    """
+    Turn a DataFrame into plain numpy columns that np.load can read without pickle:
+    numeric columns keep their dtype, everything else becomes fixed-width unicode.
+    """
+    columns = {}
+    for col in df.columns:
+        series = df[col]
+        if pd.api.types.is_numeric_dtype(series) and not series.isna().any():
+            columns[col] = series.to_numpy()
+        else:
+            columns[col] = series.fillna("").astype(str).to_numpy(dtype=str)
+    return columns
+
+
+def write_atomic(path, write_fn):
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    write_fn(tmp_path)
+    os.replace(tmp_path, path)
+
+
+# -----------------------------------------------
+# BUILD
+# -----------------------------------------------
+def build_artifact(out_dir, dtype="float32", index_kind=None, index_params=None, colours_path=COLOURS_PATH):
+    print("✅ Aligning metadata with embeddings...")
+    df, embeddings, source_rows = align_catalog(METADATA_CSV, EMBEDDINGS_PATH, FILENAMES_CSV)
+    embeddings = np.ascontiguousarray(embeddings, dtype=dtype)
+    print(f"✅ Aligned catalog items: {len(df)}, embedding shape: {embeddings.shape}")
+
+    os.makedirs(out_dir, exist_ok=True)
+    embeddings_file = os.path.join(out_dir, "embeddings.npy")
+    metadata_file = os.path.join(out_dir, "metadata.npz")
+    manifest_file = os.path.join(out_dir, "manifest.json")
+
+    # np.save/np.savez append an extension to names that lack one, so write via file handles
+    def save_embeddings(path):
+        with open(path, "wb") as f:
+            np.save(f, embeddings)
+
+    def save_metadata(path):
+        with open(path, "wb") as f:
+            np.savez(f, **to_columns(df))
+
+    write_atomic(embeddings_file, save_embeddings)
+    write_atomic(metadata_file, save_metadata)
+
+    if index_kind and index_kind != "flat":
+        print(f"✅ Building {index_kind} index...")
+        index = build_index(index_kind, embeddings.astype(np.float32, copy=False), **(index_params or {}))
+        write_atomic(index_path(out_dir, index_kind), index.save)
+
+    colour_count = 0
+    if colours_path and os.path.exists(colours_path):
+        colours = ColourFeatures.load(colours_path).subset(df["id"].astype(str))
+        colour_count = len(colours)
+        print(f"✅ Colour features for {colour_count} of {len(df)} items")
+        write_atomic(os.path.join(out_dir, "colours.npz"), colours.save)
+    else:
+        print(f"❌ {colours_path} not found, artifact has no colour features (run scripts/compute_colour_features.py)")
+
+    # Which model the vectors come from; serving checks the query encoder against it
+    spec_path = embedding_spec_path(resolve_embeddings_path(EMBEDDINGS_PATH))
+    embedding, unreadable_rows = None, []
+    if os.path.exists(spec_path):
+        with open(spec_path) as f:
+            embedding = {**json.load(f), "dtype": str(embeddings.dtype)}
+        embedding.pop("count", None)
+        unreadable_rows = embedding.pop("unreadable_rows", [])
+        print(f"✅ Embedding model: {embedding['model_id']}")
+    else:
+        print(f"❌ {spec_path} not found, the artifact cannot be checked against the query encoder "
+              "(re-run scripts/compute_embeddings.py)")
+
+    # A full build starts clean: drop the bookkeeping of earlier incremental updates, but
+    # tombstone the zero rows of images compute_embeddings.py could not read
+    for stale in ("tombstones.npy", "fingerprints.npz"):
+        if os.path.exists(os.path.join(out_dir, stale)):
+            os.remove(os.path.join(out_dir, stale))
+    deleted = np.isin(source_rows, unreadable_rows)
+    if deleted.any():
+        def save_tombstones(path):
+            with open(path, "wb") as f:
+                np.save(f, deleted)
+
+        write_atomic(os.path.join(out_dir, "tombstones.npy"), save_tombstones)
+        print(f"❌ Tombstoned {int(deleted.sum())} items whose images could not be embedded")
+
+    manifest = {
+        "format_version": ARTIFACT_FORMAT_VERSION,
+        "count": int(embeddings.shape[0]),
+        "dim": int(embeddings.shape[1]),
+        "dtype": str(embeddings.dtype),
+        "columns": list(df.columns),
+        "colour_features": colour_count,
+        "embedding": embedding,
+        "tombstones": int(deleted.sum()),
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+
+    # Manifest goes last: the server watches it to know a complete artifact is in place
+    def save_manifest(path):
+        with open(path, "w") as f:
+            json.dump(manifest, f, indent=2)
+
+    write_atomic(manifest_file, save_manifest)
+    print(f"✅ Saved catalog artifact to {out_dir}")
+    return manifest
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the memory-mappable catalog artifact used by the Flask app.")
+    parser.add_argument("--out", default=ARTIFACT_DIR, help="output directory")
+    parser.add_argument("--dtype", default="float32", choices=["float32", "float16"],
+                        help="on-disk embedding dtype (float16 halves the file and page-cache footprint)")
+    parser.add_argument("--index", choices=sorted(INDEX_TYPES), default=None,
+                        help="also prebuild this ANN index next to the embeddings")
+    parser.add_argument("--nlist", type=int, default=None, help="number of IVF lists (default: 4*sqrt(N))")
+    parser.add_argument("--pq-m", type=int, default=None, help="PQ sub-vectors per item (default: 64)")
+    parser.add_argument("--colours", default=COLOURS_PATH, help="precomputed colour features to include")
+    args = parser.parse_args()
+
+    index_params = {}
+    if args.index == "ivf" and args.nlist:
+        index_params["nlist"] = args.nlist
+    if args.index == "pq" and args.pq_m:
+        index_params["m"] = args.pq_m
+    build_artifact(args.out, dtype=args.dtype, index_kind=args.index, index_params=index_params,
+                   colours_path=args.colours)
@@ -0,0 +1,58 @@
+import os
+import sys
+import argparse
+import numpy as np
+import pandas as pd
+from multiprocessing import Pool
+from tqdm import tqdm
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "flask_app"))
+from utils.colour_features import PALETTE_SIZE, ColourFeatures, compute_colour_features
+
+# Paths
+METADATA_CSV = "data/catalog_metadata.csv"
+COLOURS_PATH = "data/catalog_colours.npz"
+
+
+def features_for(row):
+    item_id, image_path = row
+    try:
+        return item_id, compute_colour_features(image_path)
+    except Exception as e:
+        return item_id, e
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Precompute dominant colour + Lab palette for every catalog item (used by /generate-outfits)."
+    )
+    parser.add_argument("--metadata", default=METADATA_CSV)
+    parser.add_argument("--out", default=COLOURS_PATH)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.metadata)
+    rows = list(zip(df["id"].astype(str), df["image_path"]))
+    print(f"✅ Found {len(rows)} images to process")
+
+    ids, dominant, palettes, weights, failed = [], [], [], [], 0
+    with Pool(args.workers) as pool:
+        for item_id, result in tqdm(pool.imap(features_for, rows, chunksize=64), total=len(rows), desc="Colour features"):
+            if isinstance(result, Exception):
+                failed += 1
+                continue
+            ids.append(item_id)
+            dominant.append(result[0])
+            palettes.append(result[1])
+            weights.append(result[2])
+    if failed:
+        print(f"❌ Skipped {failed} unreadable images")
+
+    features = ColourFeatures(
+        ids,
+        np.array(dominant, dtype=np.uint8).reshape(-1, 3),
+        np.array(palettes, dtype=np.float32).reshape(-1, PALETTE_SIZE, 3),
+        np.array(weights, dtype=np.float32).reshape(-1, PALETTE_SIZE),
+    )
+    features.save(args.out)
+    print(f"✅ Saved colour features for {len(features)} items to {args.out}")
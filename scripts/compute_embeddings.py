@@ -1,51 +1,475 @@
+import io
 import os
+import sys
+import json
+import time
+import hashlib
+import argparse
 import torch
+import numpy as np
 import pandas as pd
-from PIL import Image
+from torch.utils.data import DataLoader, Dataset
 from tqdm import tqdm
 from transformers import CLIPProcessor, CLIPModel
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "flask_app"))
+from utils.ann_index import INDEX_TYPES, build_index, index_path, load_index
+from utils.image_io import decode_image
+from utils.model_registry import CLIP_MODEL_PATH
+from utils.catalog_store import embedding_spec_path
+from utils.embedding_space import describe_encoder, mismatch
+from build_catalog_artifact import ARTIFACT_DIR, EMBEDDINGS_PATH, to_columns, write_atomic
+
 # Paths
 METADATA_CSV = "data/catalog_metadata.csv"
-EMBEDDINGS_PATH = "data/catalog_embeddings.pt"
 
 # Batch size for processing
 BATCH_SIZE = 32
 
+# Decode/preprocess worker processes and how many batches each keeps ready ahead of the model
+DECODE_WORKERS = max(1, min(8, (os.cpu_count() or 2) - 1))
+PREFETCH_BATCHES = 4
+
+# Incremental mode compacts the artifact once this share of its rows is tombstoned
+COMPACT_THRESHOLD = 0.2
+
+# Embed the catalog with the same CLIP the API embeds queries with: vectors from
+# different models live in different spaces and cannot be compared
+CLIP_MODEL = CLIP_MODEL_PATH
+
 # Device
 device = "cuda" if torch.cuda.is_available() else "cpu"
-print(f"✅ Using device: {device}")
-
-# Load catalog metadata
-df = pd.read_csv(METADATA_CSV)
-image_paths = df['image_path'].tolist()
-print(f"✅ Found {len(image_paths)} images to process")
-
-# Load CLIP
-print("✅ Loading CLIP model...")
-model = CLIPModel.from_pretrained("openai/clip-vit-base-patch16").to(device)
-processor = CLIPProcessor.from_pretrained("openai/clip-vit-base-patch16")
-
-# Embedding function
-def embed_batch(batch_paths):
-    images = [Image.open(p).convert("RGB") for p in batch_paths]
-    inputs = processor(images=images, return_tensors="pt", padding=True).to(device)
-    with torch.no_grad():
-        features = model.get_image_features(**inputs)
-        features = features / features.norm(dim=-1, keepdim=True)
-    return features.cpu()
-
-# Process in batches
-all_embeddings = []
-for i in tqdm(range(0, len(image_paths), BATCH_SIZE), desc="Embedding batches"):
-    batch_paths = image_paths[i:i+BATCH_SIZE]
-    batch_embeddings = embed_batch(batch_paths)
-    all_embeddings.append(batch_embeddings)
-
-# Concatenate
-catalog_embeddings = torch.cat(all_embeddings)
-print(f"✅ Embedding shape: {catalog_embeddings.shape}")
-
-# Save
-torch.save(catalog_embeddings, EMBEDDINGS_PATH)
-print(f"✅ Saved embeddings to {EMBEDDINGS_PATH}")
+
+model, processor = None, None
+
+
+def load_clip():
+    global model, processor
+    if model is None:
+        print(f"✅ Using device: {device}, {torch.get_num_threads()} intra-op threads")
+        print(f"✅ Loading CLIP model {CLIP_MODEL}...")
+        model = CLIPModel.from_pretrained(CLIP_MODEL).to(device).eval()
+        processor = CLIPProcessor.from_pretrained(CLIP_MODEL)
+
+
+class CatalogImages(Dataset):
+    """Decode + CLIP preprocessing of one image; runs in the DataLoader worker processes."""
+
+    def __init__(self, image_paths, processor):
+        self.image_paths = image_paths
+        self.processor = processor
+        crop = processor.image_processor.crop_size
+        self.blank = torch.zeros(3, crop["height"], crop["width"])
+
+    def __len__(self):
+        return len(self.image_paths)
+
+    def __getitem__(self, i):
+        try:
+            # JPEGs are decoded at a reduced DCT scale (utils/image_io.py), CLIP only needs 224px
+            image = decode_image(self.image_paths[i]).image
+            return self.processor(images=image, return_tensors="pt")["pixel_values"][0], True
+        except Exception as e:
+            print(f"❌ Could not read {self.image_paths[i]}: {e}")
+            return self.blank, False
+
+
+def embed_paths(image_paths, out=None, workers=DECODE_WORKERS, batch_size=BATCH_SIZE, prefetch=PREFETCH_BATCHES):
+    """
+    CLIP embeddings for `image_paths`, in order.
+
+    Worker processes decode and preprocess while the model runs; at most
+    workers * prefetch batches wait in between, so memory stays bounded.
+    Each batch is written straight into `out` (e.g. a memory-mapped array)
+    as it comes off the model; unreadable images get a zero row.
+
+    Returns: (`out` (a new float32 array if None), bool array marking the unreadable images)
+    """
+    load_clip()
+    if out is None:
+        out = np.zeros((len(image_paths), model.config.projection_dim), dtype=np.float32)
+    loader = DataLoader(
+        CatalogImages(image_paths, processor), batch_size=batch_size, num_workers=workers,
+        prefetch_factor=prefetch if workers else None, pin_memory=device == "cuda",
+    )
+
+    unreadable = np.zeros(len(image_paths), dtype=bool)
+    row, start = 0, time.monotonic()
+    with tqdm(total=len(image_paths), desc="Embedding", unit="img") as progress:
+        for pixels, ok in loader:
+            with torch.no_grad():
+                features = model.get_image_features(pixel_values=pixels.to(device, non_blocking=True))
+                features = features / features.norm(dim=-1, keepdim=True)
+            features = features.cpu().numpy()
+            features[~ok.numpy()] = 0
+            out[row:row + len(features)] = features
+            unreadable[row:row + len(features)] = ~ok.numpy()
+            row += len(features)
+            progress.update(len(features))
+
+    elapsed = time.monotonic() - start
+    print(f"✅ Embedded {row} images in {elapsed:.1f}s ({row / max(elapsed, 1e-9):.1f} img/s), "
+          f"{int(unreadable.sum())} unreadable")
+    return out, unreadable
+
+
+# -----------------------------------------------
+# FULL RECOMPUTE
+# -----------------------------------------------
+def compute_all(metadata_csv=METADATA_CSV, out_path=EMBEDDINGS_PATH, **loader_options):
+    """Embed every catalog image into a preallocated memory-mapped .npy, one batch at a time."""
+    df = pd.read_csv(metadata_csv)
+    image_paths = df['image_path'].tolist()
+    print(f"✅ Found {len(image_paths)} images to process")
+
+    load_clip()
+    shape = (len(image_paths), model.config.projection_dim)
+
+    unreadable = None
+
+    def save(tmp_path):
+        nonlocal unreadable
+        out = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float32, shape=shape)
+        _, unreadable = embed_paths(image_paths, out=out, **loader_options)
+        out.flush()
+        del out
+
+    write_atomic(out_path, save)
+    print(f"✅ Embedding shape: {shape}")
+    print(f"✅ Saved embeddings to {out_path}")
+
+    # Provenance, copied into the artifact manifest by build_catalog_artifact.py. Unreadable images
+    # have zero rows; build_catalog_artifact.py tombstones them and the CSV loader drops them.
+    spec = {**describe_encoder(CLIP_MODEL), "count": shape[0],
+            "unreadable_rows": np.flatnonzero(unreadable).tolist(),
+            "built_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())}
+
+    def save_spec(path):
+        with open(path, "w") as f:
+            json.dump(spec, f, indent=2)
+
+    write_atomic(embedding_spec_path(out_path), save_spec)
+    print(f"✅ Recorded embedding model {spec['model_id']} ({spec['weights_sha256']}) in {embedding_spec_path(out_path)}")
+
+
+# -----------------------------------------------
+# INCREMENTAL UPDATE OF THE CATALOG ARTIFACT
+# -----------------------------------------------
+# The artifact (scripts/build_catalog_artifact.py) is updated in place:
+#   embeddings.npy   new and re-embedded items are appended, existing rows are never rewritten
+#   tombstones.npy   bool per row; deleted items and the old rows of changed items
+#   fingerprints.npz mtime_ns / size / sha1 of the image each row was embedded from
+#   index_*.npz      prebuilt ANN indexes are extended, not retrained
+# manifest.json is written last; rows past its count are an unfinished update and are ignored.
+def file_sha1(path):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_artifact_state(artifact_dir):
+    """Manifest, metadata, tombstones and fingerprints of the committed rows (the manifest count)."""
+    with open(os.path.join(artifact_dir, "manifest.json")) as f:
+        manifest = json.load(f)
+    count = manifest["count"]
+
+    with np.load(os.path.join(artifact_dir, "metadata.npz"), allow_pickle=False) as columns:
+        df = pd.DataFrame({col: columns[col][:count] for col in manifest["columns"]})
+    if len(df) != count:
+        raise ValueError(f"{artifact_dir} is damaged: metadata has {len(df)} rows, manifest {count}; rebuild it")
+
+    deleted = np.zeros(count, dtype=bool)
+    tombstones_file = os.path.join(artifact_dir, "tombstones.npy")
+    if os.path.exists(tombstones_file):
+        stored = np.load(tombstones_file, allow_pickle=False)[:count]
+        deleted[:len(stored)] = stored
+
+    # Rows without a fingerprint (artifact built by build_catalog_artifact.py) get one on the first update
+    fingerprints = {
+        "mtime_ns": np.full(count, -1, dtype=np.int64),
+        "size": np.full(count, -1, dtype=np.int64),
+        "sha1": np.full(count, "", dtype="<U40"),
+    }
+    fingerprints_file = os.path.join(artifact_dir, "fingerprints.npz")
+    if os.path.exists(fingerprints_file):
+        with np.load(fingerprints_file, allow_pickle=False) as stored:
+            for key in fingerprints:
+                values = stored[key][:count]
+                fingerprints[key][:len(values)] = values
+    return manifest, df, deleted, fingerprints
+
+
+def diff_catalog(csv_df, artifact_df, deleted, fingerprints):
+    """
+    Compare the metadata CSV with the live artifact rows by id, then by image
+    (mtime, size), confirming a changed stat with the sha1 so a touched but
+    identical file is not re-embedded.
+
+    Marks replaced and removed rows in `deleted` and refreshes `fingerprints`
+    in place. Returns: (CSV row positions to embed, their fingerprints,
+    {artifact row: CSV row position} of the unchanged items, stats dict)
+    """
+    live_rows = {
+        item_id: row for row, item_id in enumerate(artifact_df["id"].astype(str)) if not deleted[row]
+    }
+    to_embed, new_fingerprints, unchanged = [], [], {}
+    stats = {"added": 0, "changed": 0, "unchanged": 0, "deleted": 0, "missing_image": 0}
+
+    for pos, (item_id, image_path) in enumerate(zip(csv_df["id"].astype(str), csv_df["image_path"])):
+        row = live_rows.pop(item_id, None)
+        try:
+            st = os.stat(image_path)
+        except (OSError, TypeError):
+            stats["missing_image"] += 1
+            if row is not None:
+                unchanged[row] = pos  # keep the embedding we have
+            continue
+
+        if row is not None and (fingerprints["mtime_ns"][row], fingerprints["size"][row]) == (st.st_mtime_ns, st.st_size):
+            unchanged[row] = pos
+            stats["unchanged"] += 1
+            continue
+
+        sha1 = file_sha1(image_path)
+        if row is not None and fingerprints["sha1"][row] in ("", sha1):
+            # Same bytes (or first update of a row without a fingerprint): keep it, record the stat
+            fingerprints["mtime_ns"][row], fingerprints["size"][row], fingerprints["sha1"][row] = st.st_mtime_ns, st.st_size, sha1
+            unchanged[row] = pos
+            stats["unchanged"] += 1
+            continue
+
+        if row is not None:
+            deleted[row] = True
+            stats["changed"] += 1
+        else:
+            stats["added"] += 1
+        to_embed.append(pos)
+        new_fingerprints.append((st.st_mtime_ns, st.st_size, sha1))
+
+    for row in live_rows.values():
+        deleted[row] = True
+    stats["deleted"] = len(live_rows)
+    return to_embed, new_fingerprints, unchanged, stats
+
+
+def append_npy_rows(path, rows, count):
+    """
+    Append `rows` after the first `count` rows of a 2-D .npy file and rewrite
+    its header in place. Bytes past `count` (left by an interrupted update) are
+    dropped first. Falls back to rewriting the file if the header would grow.
+    """
+    with open(path, "r+b") as f:
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            read_header, write_header = np.lib.format.read_array_header_1_0, np.lib.format.write_array_header_1_0
+        else:
+            read_header, write_header = np.lib.format.read_array_header_2_0, np.lib.format.write_array_header_2_0
+        shape, fortran_order, dtype = read_header(f)
+        data_start = f.tell()
+        if fortran_order or tuple(shape[1:]) != rows.shape[1:]:
+            raise ValueError(f"{path}: cannot append rows of shape {rows.shape} to {shape}")
+        rows = np.ascontiguousarray(rows, dtype=dtype)
+
+        header = io.BytesIO()
+        write_header(header, {"descr": np.lib.format.dtype_to_descr(dtype), "fortran_order": False,
+                              "shape": (count + len(rows),) + tuple(shape[1:])})
+        if header.tell() == data_start:
+            f.truncate(data_start + count * dtype.itemsize * int(np.prod(shape[1:])))
+            f.seek(0, os.SEEK_END)
+            f.write(rows.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+            # Header last: until it changes, readers see the first `count` rows only
+            f.seek(0)
+            f.write(header.getvalue())
+            f.flush()
+            os.fsync(f.fileno())
+            return
+
+    combined = np.concatenate([np.load(path, mmap_mode="r")[:count], rows])
+
+    def save(tmp_path):
+        with open(tmp_path, "wb") as out:
+            np.save(out, combined)
+
+    write_atomic(path, save)
+
+
+def save_npy(array):
+    def save(path):
+        with open(path, "wb") as f:
+            np.save(f, array)
+    return save
+
+
+def save_npz(**arrays):
+    def save(path):
+        with open(path, "wb") as f:
+            np.savez(f, **arrays)
+    return save
+
+
+def prebuilt_indexes(artifact_dir, embeddings):
+    """{kind: index} for every prebuilt index file in the artifact, loaded against `embeddings`."""
+    indexes = {}
+    for kind in INDEX_TYPES:
+        path = index_path(artifact_dir, kind)
+        if kind == "flat" or not os.path.exists(path):
+            continue
+        try:
+            indexes[kind] = load_index(path, embeddings)
+        except Exception as e:
+            print(f"❌ Could not load {path}, it will be rebuilt: {e}")
+            indexes[kind] = None
+    return indexes
+
+
+def write_manifest(artifact_dir, manifest):
+    def save(path):
+        with open(path, "w") as f:
+            json.dump(manifest, f, indent=2)
+
+    write_atomic(os.path.join(artifact_dir, "manifest.json"), save)
+
+
+def update_artifact(artifact_dir=ARTIFACT_DIR, metadata_csv=METADATA_CSV, compact_threshold=COMPACT_THRESHOLD,
+                    **loader_options):
+    """
+    Bring the artifact in line with the metadata CSV, embedding only added and
+    changed items. Compacts afterwards if too many rows are tombstoned.
+    """
+    manifest, artifact_df, deleted, fingerprints = load_artifact_state(artifact_dir)
+    count = manifest["count"]
+    # Appended rows must come from the model the artifact was built with
+    if manifest.get("embedding") is None:
+        raise ValueError(f"{artifact_dir} does not record its embedding model; rebuild it before updating incrementally")
+    reasons = mismatch(manifest["embedding"], describe_encoder(CLIP_MODEL))
+    if reasons:
+        raise ValueError(f"{artifact_dir} was embedded with {manifest['embedding']['model_id']}, not {CLIP_MODEL}: "
+                         + ", ".join(reasons))
+    csv_df = pd.read_csv(metadata_csv)
+
+    to_embed, new_fingerprints, unchanged, stats = diff_catalog(csv_df, artifact_df, deleted, fingerprints)
+    print("✅ " + ", ".join(f"{value} {name.replace('_', ' ')}" for name, value in stats.items()))
+
+    embeddings_file = os.path.join(artifact_dir, "embeddings.npy")
+    old_embeddings = np.load(embeddings_file, mmap_mode="r")[:count]
+    indexes = prebuilt_indexes(artifact_dir, old_embeddings)
+
+    # Metadata: unchanged items take the CSV's current values, new rows are appended
+    columns = manifest["columns"]
+    shared = [col for col in columns if col in csv_df.columns]
+    if unchanged:
+        rows, positions = np.array(list(unchanged)), np.array(list(unchanged.values()))
+        for col in shared:
+            values = artifact_df[col].to_numpy(dtype=object)
+            values[rows] = csv_df[col].to_numpy(dtype=object)[positions]
+            artifact_df[col] = values
+    new_rows = csv_df.iloc[to_embed].reindex(columns=columns)
+    if "path" in columns and "path" not in csv_df.columns:
+        new_rows["path"] = csv_df["image_path"].iloc[to_embed].to_numpy()
+    metadata = pd.concat([artifact_df, new_rows], ignore_index=True) if to_embed else artifact_df
+
+    if to_embed:
+        embeddings, unreadable = embed_paths(csv_df["image_path"].iloc[to_embed].tolist(), **loader_options)
+        append_npy_rows(embeddings_file, embeddings, count)
+        mtimes, sizes, sha1s = (np.array(values) for values in zip(*new_fingerprints))
+        # Unreadable images keep their (zero) row out of search and get no fingerprint,
+        # so the next update sees them as added and tries again
+        mtimes[unreadable], sizes[unreadable], sha1s[unreadable] = -1, -1, ""
+        fingerprints = {
+            "mtime_ns": np.concatenate([fingerprints["mtime_ns"], mtimes.astype(np.int64)]),
+            "size": np.concatenate([fingerprints["size"], sizes.astype(np.int64)]),
+            "sha1": np.concatenate([fingerprints["sha1"], sha1s.astype("<U40")]),
+        }
+        deleted = np.concatenate([deleted, unreadable])
+        if unreadable.any():
+            print(f"❌ Tombstoned {int(unreadable.sum())} unreadable images; they are retried on the next update")
+    total = count + len(to_embed)
+    all_embeddings = np.load(embeddings_file, mmap_mode="r")[:total]
+
+    write_atomic(os.path.join(artifact_dir, "metadata.npz"), save_npz(**to_columns(metadata)))
+    write_atomic(os.path.join(artifact_dir, "fingerprints.npz"), save_npz(**fingerprints))
+    write_atomic(os.path.join(artifact_dir, "tombstones.npy"), save_npy(deleted))
+    for kind, index in (indexes if to_embed else {}).items():
+        print(f"✅ Updating {kind} index...")
+        index = index.extend(all_embeddings) if index is not None else build_index(kind, all_embeddings)
+        write_atomic(index_path(artifact_dir, kind), index.save)
+
+    manifest.update({
+        "count": int(total),
+        "columns": list(metadata.columns),
+        "tombstones": int(deleted.sum()),
+        "updated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    })
+    # Manifest goes last: it commits the appended rows for the server
+    write_manifest(artifact_dir, manifest)
+    print(f"✅ Artifact now has {total - manifest['tombstones']} live items ({manifest['tombstones']} tombstoned)")
+
+    if total and manifest["tombstones"] / total > compact_threshold:
+        compact_artifact(artifact_dir)
+    return manifest
+
+
+def compact_artifact(artifact_dir=ARTIFACT_DIR):
+    """Rewrite the artifact without its tombstoned rows; prebuilt indexes are renumbered, not retrained."""
+    manifest, metadata, deleted, fingerprints = load_artifact_state(artifact_dir)
+    count = manifest["count"]
+    keep = np.flatnonzero(~deleted)
+    print(f"✅ Compacting {artifact_dir}: dropping {count - len(keep)} tombstoned rows of {count}")
+
+    embeddings_file = os.path.join(artifact_dir, "embeddings.npy")
+    old_embeddings = np.load(embeddings_file, mmap_mode="r")[:count]
+    indexes = prebuilt_indexes(artifact_dir, old_embeddings)
+
+    write_atomic(embeddings_file, save_npy(np.ascontiguousarray(old_embeddings[keep])))
+    embeddings = np.load(embeddings_file, mmap_mode="r")
+    write_atomic(os.path.join(artifact_dir, "metadata.npz"),
+                 save_npz(**to_columns(metadata.iloc[keep].reset_index(drop=True))))
+    write_atomic(os.path.join(artifact_dir, "fingerprints.npz"),
+                 save_npz(**{key: values[keep] for key, values in fingerprints.items()}))
+    write_atomic(os.path.join(artifact_dir, "tombstones.npy"), save_npy(np.zeros(len(keep), dtype=bool)))
+    for kind, index in indexes.items():
+        index = index.compact(keep, embeddings) if index is not None else build_index(kind, embeddings)
+        write_atomic(index_path(artifact_dir, kind), index.save)
+
+    manifest.update({
+        "count": int(len(keep)),
+        "tombstones": 0,
+        "compacted_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    })
+    write_manifest(artifact_dir, manifest)
+    print(f"✅ Compacted artifact has {len(keep)} items")
+    return manifest
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compute CLIP embeddings for the catalog.")
+    parser.add_argument("--incremental", action="store_true",
+                        help="update the catalog artifact in place: embed only added/changed items, tombstone deleted ones")
+    parser.add_argument("--compact", action="store_true", help="drop tombstoned rows from the catalog artifact")
+    parser.add_argument("--artifact", default=ARTIFACT_DIR, help="catalog artifact directory (incremental/compact)")
+    parser.add_argument("--metadata", default=METADATA_CSV)
+    parser.add_argument("--compact-threshold", type=float, default=COMPACT_THRESHOLD,
+                        help="after an incremental update, compact once this share of rows is tombstoned")
+    parser.add_argument("--out", default=EMBEDDINGS_PATH, help="full mode: output .npy")
+    parser.add_argument("--workers", type=int, default=DECODE_WORKERS, help="decode/preprocess processes (0 = inline)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--prefetch", type=int, default=PREFETCH_BATCHES, help="batches queued per worker")
+    parser.add_argument("--threads", type=int, default=None, help="intra-op threads for the model (default: torch's)")
+    parser.add_argument("--model", default=CLIP_MODEL,
+                        help="CLIP model path or id (default: the API's query encoder); recorded with the embeddings")
+    args = parser.parse_args()
+    CLIP_MODEL = args.model
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    loader_options = {"workers": args.workers, "batch_size": args.batch_size, "prefetch": args.prefetch}
+    if args.incremental:
+        update_artifact(args.artifact, args.metadata, args.compact_threshold, **loader_options)
+    elif args.compact:
+        compact_artifact(args.artifact)
+    else:
+        compute_all(args.metadata, args.out, **loader_options)
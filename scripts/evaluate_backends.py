@@ -0,0 +1,121 @@
+import os
+import sys
+import glob
+import time
+import argparse
+import multiprocessing as mp
+import numpy as np
+from PIL import Image
+
+FLASK_APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "flask_app")
+sys.path.insert(0, FLASK_APP_DIR)
+
+BACKENDS = ["torch", "torch-int8-dynamic", "onnxruntime"]
+DEFAULT_IMAGES = ["assets/*.png", "assets/*.jpg", "data/images/*.jpg"]
+
+
+def status_mb(field):
+    """VmRSS / VmHWM of this process in MB (Linux)."""
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) / 1024
+    return float("nan")
+
+
+# -----------------------------------------------
+# ONE BACKEND, IN ITS OWN PROCESS
+# -----------------------------------------------
+def run_backend(backend, threads, paths, out):
+    # Configure before utils.model_registry reads the environment
+    os.environ["INFERENCE_BACKEND"] = backend
+    os.environ["INFERENCE_THREADS"] = str(threads)
+    from utils.model_registry import load_blip, load_clip
+
+    images = [Image.open(p).convert("RGB") for p in paths]
+    rss_before = status_mb("VmRSS")
+    start = time.perf_counter()
+    clip, blip = load_clip(), load_blip()
+    load_seconds = time.perf_counter() - start
+    rss_loaded = status_mb("VmRSS")
+
+    clip.embed(images[:1])  # warm-up
+    blip.caption(images[:1])
+    embeddings, captions, clip_ms, blip_ms = [], [], [], []
+    for image in images:
+        start = time.perf_counter()
+        embeddings.append(clip.embed([image])[0])
+        clip_ms.append((time.perf_counter() - start) * 1000)
+        start = time.perf_counter()
+        captions.append(blip.caption([image])[0])
+        blip_ms.append((time.perf_counter() - start) * 1000)
+
+    out.put({
+        "embeddings": np.asarray(embeddings, dtype=np.float32),
+        "captions": captions,
+        "load_seconds": load_seconds,
+        "clip_ms": np.asarray(clip_ms),
+        "blip_ms": np.asarray(blip_ms),
+        "model_mb": rss_loaded - rss_before,
+        "peak_mb": status_mb("VmHWM") - rss_before,
+    })
+
+
+def normalize_caption(text):
+    return " ".join(text.lower().split())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Accuracy gate and latency/memory report for the CPU inference backends (vs torch fp32)."
+    )
+    parser.add_argument("--images", nargs="+", default=DEFAULT_IMAGES, help="image paths or globs")
+    parser.add_argument("--limit", type=int, default=50, help="max images in the fixed evaluation set")
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=BACKENDS)
+    parser.add_argument("--threads", type=int, default=0, help="INFERENCE_THREADS for every backend")
+    parser.add_argument("--min-cosine", type=float, default=0.99, help="gate: minimum per-image cosine vs fp32")
+    parser.add_argument("--min-caption-match", type=float, default=0.8, help="gate: caption exact-match rate vs fp32")
+    args = parser.parse_args()
+
+    paths = sorted({p for pattern in args.images for p in glob.glob(pattern)})[:args.limit]
+    if not paths:
+        sys.exit("❌ No images matched --images")
+    backends = ["torch"] + [b for b in args.backends if b != "torch"]  # fp32 is always the reference
+
+    ctx = mp.get_context("spawn")
+    results = {}
+    for backend in backends:
+        print(f"🚀 {backend} on {len(paths)} images...")
+        out = ctx.Queue()
+        proc = ctx.Process(target=run_backend, args=(backend, args.threads, paths, out))
+        proc.start()
+        try:
+            results[backend] = out.get()
+        except Exception as e:
+            print(f"❌ {backend} failed: {e}")
+        proc.join()
+        if proc.exitcode != 0 and backend not in results:
+            print(f"❌ {backend} exited with code {proc.exitcode}")
+    if "torch" not in results:
+        sys.exit("❌ The fp32 torch reference did not run")
+
+    reference = results["torch"]
+    print(f"\n📊 {len(paths)} images, INFERENCE_THREADS={args.threads or 'default'}\n")
+    print(f"{'backend':<20}{'load s':>8}{'model MB':>10}{'peak MB':>9}{'CLIP p50':>10}{'BLIP p50':>10}"
+          f"{'cos min':>9}{'cos mean':>10}{'caption =':>11}{'gate':>7}")
+    failed = []
+    for backend, r in results.items():
+        cosines = np.sum(r["embeddings"] * reference["embeddings"], axis=1)
+        matches = np.mean([normalize_caption(a) == normalize_caption(b)
+                           for a, b in zip(r["captions"], reference["captions"])])
+        passed = cosines.min() >= args.min_cosine and matches >= args.min_caption_match
+        if not passed:
+            failed.append(backend)
+        print(f"{backend:<20}{r['load_seconds']:>8.1f}{r['model_mb']:>10.0f}{r['peak_mb']:>9.0f}"
+              f"{np.percentile(r['clip_ms'], 50):>10.1f}{np.percentile(r['blip_ms'], 50):>10.1f}"
+              f"{cosines.min():>9.4f}{cosines.mean():>10.4f}{matches:>11.2f}{'PASS' if passed else 'FAIL':>7}")
+
+    if failed:
+        print(f"\n❌ Accuracy gate failed for: {', '.join(failed)}")
+        sys.exit(1)
+    print("\n✅ All backends within the accuracy gate")
@@ -0,0 +1,132 @@
+import os
+import sys
+import json
+import argparse
+import torch
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "flask_app"))
+from utils.model_registry import ONNX_MODEL_DIR, load_blip_torch, load_clip_torch
+from utils.inference_backends import BLIP_DECODER_ONNX, BLIP_GENERATION_CONFIG, BLIP_VISION_ONNX, CLIP_IMAGE_ONNX
+
+OPSET = 17
+
+
+# -----------------------------------------------
+# EXPORTABLE SUB-GRAPHS
+# -----------------------------------------------
+class ClipImageEncoder(torch.nn.Module):
+    """pixel_values -> unnormalized image features (what get_image_features returns)."""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, pixel_values):
+        return self.model.get_image_features(pixel_values=pixel_values)
+
+
+class BlipVisionEncoder(torch.nn.Module):
+    """pixel_values -> patch embeddings the text decoder cross-attends to."""
+
+    def __init__(self, model):
+        super().__init__()
+        self.vision_model = model.vision_model
+
+    def forward(self, pixel_values):
+        return self.vision_model(pixel_values=pixel_values, return_dict=False)[0]
+
+
+class BlipTextDecoderStep(torch.nn.Module):
+    """(prefix ids, image embeddings) -> logits for the next token only."""
+
+    def __init__(self, model):
+        super().__init__()
+        self.text_decoder = model.text_decoder
+
+    def forward(self, input_ids, attention_mask, encoder_hidden_states):
+        logits = self.text_decoder(
+            input_ids=input_ids,
+            attention_mask=attention_mask,
+            encoder_hidden_states=encoder_hidden_states,
+            use_cache=False,
+            return_dict=False,
+        )[0]
+        return logits[:, -1, :]
+
+
+def export(module, args, path, input_names, output_names, dynamic_axes):
+    module.eval()
+    with torch.no_grad():
+        torch.onnx.export(
+            module, args, path,
+            input_names=input_names, output_names=output_names,
+            dynamic_axes=dynamic_axes, opset_version=OPSET,
+        )
+    print(f"✅ {path} ({os.path.getsize(path) / 2**20:.1f} MB)")
+
+
+# -----------------------------------------------
+# EXPORT
+# -----------------------------------------------
+def export_clip(out_dir):
+    processor, model = load_clip_torch()
+    model = model.to("cpu")
+    size = processor.image_processor.crop_size["height"]
+    export(
+        ClipImageEncoder(model), (torch.zeros(1, 3, size, size),), os.path.join(out_dir, CLIP_IMAGE_ONNX),
+        ["pixel_values"], ["image_embeds"],
+        {"pixel_values": {0: "batch"}, "image_embeds": {0: "batch"}},
+    )
+
+
+def export_blip(out_dir):
+    processor, model = load_blip_torch()
+    model = model.to("cpu")
+    size = processor.image_processor.size["height"]
+    pixel_values = torch.zeros(1, 3, size, size)
+    export(
+        BlipVisionEncoder(model), (pixel_values,), os.path.join(out_dir, BLIP_VISION_ONNX),
+        ["pixel_values"], ["image_embeds"],
+        {"pixel_values": {0: "batch"}, "image_embeds": {0: "batch"}},
+    )
+
+    text_config = model.config.text_config
+    with torch.no_grad():
+        image_embeds = model.vision_model(pixel_values=pixel_values, return_dict=False)[0]
+    input_ids = torch.full((1, 2), text_config.bos_token_id, dtype=torch.long)
+    export(
+        BlipTextDecoderStep(model), (input_ids, torch.ones_like(input_ids), image_embeds),
+        os.path.join(out_dir, BLIP_DECODER_ONNX),
+        ["input_ids", "attention_mask", "encoder_hidden_states"], ["logits"],
+        {
+            "input_ids": {0: "batch", 1: "sequence"},
+            "attention_mask": {0: "batch", 1: "sequence"},
+            "encoder_hidden_states": {0: "batch"},
+            "logits": {0: "batch"},
+        },
+    )
+
+    # The decoding loop in OnnxBlipCaptioner mirrors BlipForConditionalGeneration.generate()
+    generation = {
+        "bos_token_id": text_config.bos_token_id,
+        "sep_token_id": text_config.sep_token_id,
+        "pad_token_id": text_config.pad_token_id,
+        "max_length": model.generation_config.max_length or 20,
+    }
+    with open(os.path.join(out_dir, BLIP_GENERATION_CONFIG), "w") as f:
+        json.dump(generation, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the CLIP image encoder and BLIP encoder/decoder to ONNX.")
+    parser.add_argument("--out", default=ONNX_MODEL_DIR)
+    parser.add_argument("--models", nargs="+", choices=["clip", "blip"], default=["clip", "blip"])
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    if "clip" in args.models:
+        export_clip(args.out)
+    if "blip" in args.models:
+        export_blip(args.out)
+    print(f"✅ Export done. Serve with INFERENCE_BACKEND=onnxruntime ONNX_MODEL_DIR={args.out}, "
+          f"then check accuracy with scripts/evaluate_backends.py")
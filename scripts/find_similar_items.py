@@ -1,13 +1,20 @@
-import torch
+import os
+import sys
 import pandas as pd
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "flask_app"))
+from utils.topk import topk_inner_product
+from utils.filters import FilterIndex
+from utils.catalog_store import load_embeddings_file
 
 # -----------------------------------------------
 # CONFIG
 # -----------------------------------------------
 CATALOG_METADATA_PATH = "data/catalog_metadata.csv"
-CATALOG_EMBEDDINGS_PATH = "data/catalog_embeddings.pt"
+CATALOG_EMBEDDINGS_PATH = "data/catalog_embeddings.npy"
+if not os.path.exists(CATALOG_EMBEDDINGS_PATH):
+    CATALOG_EMBEDDINGS_PATH = "data/catalog_embeddings.pt"  # legacy torch format
 
 # -----------------------------------------------
 # LOAD CATALOG DATA
@@ -17,31 +24,11 @@ def load_catalog():
     df = pd.read_csv(CATALOG_METADATA_PATH)
 
     print("✅ Loading catalog embeddings...")
-    embeddings = torch.load(CATALOG_EMBEDDINGS_PATH)
-    embeddings = embeddings.numpy()
+    embeddings = load_embeddings_file(CATALOG_EMBEDDINGS_PATH)
 
     print(f"✅ Loaded {len(df)} items from catalog.")
     return df, embeddings
 
-# -----------------------------------------------
-# APPLY USER-SELECTED FILTERS
-# -----------------------------------------------
-def apply_filters(df, filters):
-    """
-    Filters catalog DataFrame to match user-selected criteria.
-    For example:
-        filters = {
-            "season": "Summer",
-            "baseColour": "Red",
-            "aesthetic_category": "Boho"
-        }
-    Only rows matching all given values are kept.
-    """
-    for key, value in filters.items():
-        if value and key in df.columns:
-            df = df[df[key].str.lower() == value.lower()]
-    return df
-
 # -----------------------------------------------
 # MAIN FUNCTION TO FIND SIMILAR ITEMS
 # -----------------------------------------------
@@ -56,25 +43,24 @@ def find_similar_items(uploaded_result, top_k=10, filter_options=None):
     # Load catalog data
     df_catalog, catalog_embeddings = load_catalog()
 
-    # Apply metadata filters if specified
+    # Apply metadata filters if specified: a row mask from posting lists, no DataFrame/matrix copy
+    mask = None
     if filter_options:
         print(f"✅ Applying filters: {filter_options}")
-        df_catalog = apply_filters(df_catalog, filter_options)
-        if len(df_catalog) == 0:
+        mask = FilterIndex.build(df_catalog).mask(filter_options)
+        if mask is not None and not mask.any():
             print("❌ No matching items in catalog after filtering!")
             return []
-        catalog_embeddings = catalog_embeddings[df_catalog.index]
 
     # Extract uploaded image's embedding
-    query_embedding = np.array(uploaded_result["clip_embedding"]).reshape(1, -1)
-
-    # Compute cosine similarities
-    similarities = cosine_similarity(query_embedding, catalog_embeddings)[0]
-
-    # Get top_k indices with highest similarity
-    top_indices = np.argsort(-similarities)[:top_k]
-    results_df = df_catalog.iloc[top_indices].copy()
-    results_df["similarity"] = similarities[top_indices]
+    query_embedding = np.array(uploaded_result["clip_embedding"], dtype=np.float32).reshape(1, -1)
+
+    # Catalog embeddings are already L2-normalized, so cosine similarity is an inner product
+    query_embedding = query_embedding / np.linalg.norm(query_embedding)
+    top_scores, top_indices = topk_inner_product(query_embedding, catalog_embeddings, top_k, mask=mask)
+    found = top_indices[0] >= 0
+    results_df = df_catalog.iloc[top_indices[0][found]].copy()
+    results_df["similarity"] = top_scores[0][found]
 
     print(f"✅ Found {len(results_df)} similar items.")
 
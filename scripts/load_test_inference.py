@@ -0,0 +1,67 @@
+import os
+import sys
+import time
+import argparse
+import threading
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "flask_app"))
+os.environ.setdefault("INFERENCE_BATCHING", "0")  # the harness builds its own batchers per configuration
+from utils import process_new_image as pipeline
+from utils.batching import MicroBatcher
+from utils.model_registry import INFERENCE_BACKEND
+
+TEST_IMAGE = "assets/test-img-1.png"
+
+
+def run_load(call, image, concurrency, requests_per_worker):
+    """`concurrency` threads each issue requests back to back; returns (req/s, latencies in ms)."""
+    latencies = []
+    lock = threading.Lock()
+
+    def worker():
+        local = []
+        for _ in range(requests_per_worker):
+            start = time.perf_counter()
+            call(image)
+            local.append((time.perf_counter() - start) * 1000)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    return len(latencies) / elapsed, np.array(latencies)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Throughput vs p50/p99 latency of micro-batched BLIP/CLIP inference.")
+    parser.add_argument("--model", choices=["clip", "blip"], default="clip")
+    parser.add_argument("--image", default=TEST_IMAGE)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 8, 16],
+                        help="max batch sizes to try (1 = unbatched baseline)")
+    parser.add_argument("--max-wait-ms", type=float, nargs="+", default=[5, 20])
+    parser.add_argument("--requests", type=int, default=8, help="requests per worker thread")
+    args = parser.parse_args()
+
+    batch_fn = pipeline.compute_clip_embeddings if args.model == "clip" else pipeline.generate_blip_captions
+    image = Image.open(args.image).convert("RGB")
+    batch_fn([image])  # warm-up
+
+    configs = [(1, 0.0)] + [(b, w) for b in args.batch_sizes if b > 1 for w in args.max_wait_ms]
+    print(f"\n📊 {args.model.upper()} ({INFERENCE_BACKEND}), {args.requests} requests per worker\n")
+    print(f"{'max batch':>10}{'wait ms':>9}{'conc':>6}{'req/s':>9}{'p50 ms':>10}{'p99 ms':>10}{'avg batch':>11}")
+    for max_batch, max_wait in configs:
+        batcher = MicroBatcher(batch_fn, max_batch_size=max_batch, max_wait_ms=max_wait, name="load-test")
+        for concurrency in args.concurrency:
+            batches_before, items_before = batcher.batches, batcher.items
+            rps, lat = run_load(batcher, image, concurrency, args.requests)
+            avg_batch = (batcher.items - items_before) / max(1, batcher.batches - batches_before)
+            print(f"{max_batch:>10}{max_wait:>9.0f}{concurrency:>6}{rps:>9.2f}"
+                  f"{np.percentile(lat, 50):>10.1f}{np.percentile(lat, 99):>10.1f}{avg_batch:>11.1f}")
@@ -0,0 +1,211 @@
+"""
+Synthetic inputs for scripts/benchmark_end_to_end.py, so a benchmark needs no
+dataset and no model download:
+
+    data/catalog_metadata.csv, data/catalog_embeddings.npy, data/image_filenames.csv
+        a random catalog in the format load_catalog() / build_catalog_artifact.py read
+    data/catalog_colours.npz      random precomputed colour features for every item
+    data/catalog_artifact/        built from the above by build_catalog_artifact.py
+    models/tiny-blip, models/tiny-clip
+        randomly initialised BLIP/CLIP with a few-word vocabulary (save_pretrained format)
+
+Everything is derived from --seed, so two runs produce identical files.
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+import numpy as np
+import pandas as pd
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(SCRIPTS_DIR, "..", "flask_app"))
+from utils.colour_features import PALETTE_SIZE, ColourFeatures
+
+CATEGORIES = {
+    "Apparel": ["Topwear", "Bottomwear", "Dress", "Innerwear"],
+    "Footwear": ["Shoes", "Sandal", "Flip Flops"],
+    "Accessories": ["Bags", "Watches", "Jewellery", "Belts"],
+}
+MASTER_WEIGHTS = [0.55, 0.25, 0.20]
+GENDERS = ["Men", "Women", "Boys", "Girls", "Unisex"]
+SEASONS = ["Summer", "Winter", "Spring", "Fall"]
+COLOURS = ["Black", "White", "Blue", "Navy Blue", "Red", "Green", "Grey", "Brown", "Pink", "Beige", "Purple", "Yellow"]
+
+# Caption words for the tiny BLIP decoder (BERT-style vocabulary)
+CAPTION_WORDS = [
+    "a", "an", "the", "woman", "man", "wearing", "with", "and", "in", "on", "of", "shirt", "dress", "jacket",
+    "jeans", "skirt", "shoes", "sneakers", "bag", "watch", "black", "white", "blue", "red", "green", "floral",
+    "denim", "striped", "summer", "casual",
+]
+TINY_LAYERS = dict(hidden_size=32, intermediate_size=64, num_hidden_layers=2, num_attention_heads=2)
+TINY_IMAGE_SIZE = 64
+
+
+# -----------------------------------------------
+# Catalog
+# -----------------------------------------------
+def write_synthetic_catalog(data_dir, items, dim, seed=0):
+    """
+    Metadata CSV, embedding matrix and filename CSV joined on id the way
+    load_catalog() expects, plus colour features for every item.
+    """
+    rng = np.random.default_rng(seed)
+    os.makedirs(data_dir, exist_ok=True)
+    ids = np.arange(10000, 10000 + items)
+
+    masters = rng.choice(list(CATEGORIES), size=items, p=MASTER_WEIGHTS)
+    categories = [CATEGORIES[m][rng.integers(len(CATEGORIES[m]))] for m in masters]
+    colours = rng.choice(COLOURS, size=items)
+    metadata = pd.DataFrame({
+        "id": ids,
+        "gender": rng.choice(GENDERS, size=items),
+        "masterCategory": masters,
+        "category": categories,
+        "baseColour": colours,
+        "season": rng.choice(SEASONS, size=items),
+        "productDisplayName": [f"{c} {cat} {i}" for c, cat, i in zip(colours, categories, ids)],
+        "image_path": [os.path.join("data", "images", f"{i}.jpg") for i in ids],
+    })
+    # The metadata order differs from the embedding order, as in the real data; the join realigns them
+    metadata.sample(frac=1.0, random_state=seed).to_csv(os.path.join(data_dir, "catalog_metadata.csv"), index=False)
+
+    embeddings = rng.standard_normal((items, dim), dtype=np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    np.save(os.path.join(data_dir, "catalog_embeddings.npy"), embeddings)
+    pd.DataFrame({"path": [f"/data/images/{i}.jpg" for i in ids]}).to_csv(
+        os.path.join(data_dir, "image_filenames.csv"), index=False
+    )
+
+    lab = np.stack([
+        rng.uniform(0, 100, (items, PALETTE_SIZE)),
+        rng.uniform(-60, 60, (items, PALETTE_SIZE)),
+        rng.uniform(-60, 60, (items, PALETTE_SIZE)),
+    ], axis=-1)
+    features = ColourFeatures(
+        ids.astype(str),
+        rng.integers(0, 256, (items, 3)),
+        lab,
+        rng.dirichlet(np.ones(PALETTE_SIZE), size=items),
+    )
+    features.save(os.path.join(data_dir, "catalog_colours.npz"))
+    return metadata
+
+
+def build_artifact(workdir, index_kind=None):
+    """Run build_catalog_artifact.py on the synthetic CSVs (it reads data/... relative to the cwd)."""
+    command = [sys.executable, os.path.join(SCRIPTS_DIR, "build_catalog_artifact.py"), "--out",
+               os.path.join("data", "catalog_artifact")]
+    if index_kind:
+        command += ["--index", index_kind]
+    subprocess.run(command, cwd=workdir, check=True, stdout=subprocess.DEVNULL)
+    return os.path.join(workdir, "data", "catalog_artifact")
+
+
+# -----------------------------------------------
+# Tiny models
+# -----------------------------------------------
+def write_tiny_models(models_dir, dim, seed=0):
+    """
+    Randomly initialised BLIP and CLIP small enough to build in a second, with
+    real processors and tokenizers; load them with load_blip_torch / load_clip_torch.
+    Returns: (blip dir, clip dir)
+    """
+    import torch
+    from transformers import (
+        BertTokenizer, BlipConfig, BlipForConditionalGeneration, BlipImageProcessor, BlipProcessor,
+        CLIPConfig, CLIPImageProcessor, CLIPModel, CLIPProcessor, CLIPTokenizer,
+    )
+
+    torch.manual_seed(seed)
+    blip_dir, clip_dir = os.path.join(models_dir, "tiny-blip"), os.path.join(models_dir, "tiny-clip")
+    for path in (blip_dir, clip_dir):
+        os.makedirs(path, exist_ok=True)
+
+    # BLIP: BERT vocabulary, [CLS] starts a caption and [SEP] ends it
+    specials = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"]
+    with open(os.path.join(blip_dir, "vocab.txt"), "w") as f:
+        f.write("\n".join(specials + CAPTION_WORDS) + "\n")
+    blip_config = BlipConfig(
+        text_config={
+            **TINY_LAYERS, "vocab_size": len(specials) + len(CAPTION_WORDS), "max_position_embeddings": 32,
+            "pad_token_id": 0, "bos_token_id": 2, "sep_token_id": 3, "eos_token_id": 3,
+        },
+        vision_config={**TINY_LAYERS, "image_size": TINY_IMAGE_SIZE, "patch_size": 16},
+    )
+    blip_processor = BlipProcessor(
+        image_processor=BlipImageProcessor(size={"height": TINY_IMAGE_SIZE, "width": TINY_IMAGE_SIZE}),
+        tokenizer=BertTokenizer.from_pretrained(blip_dir),
+    )
+    blip = BlipForConditionalGeneration(blip_config).eval()
+    blip.generation_config.max_length = 16  # real BLIP captions are about this long
+    blip.save_pretrained(blip_dir)
+    blip_processor.save_pretrained(blip_dir)
+
+    # CLIP: only the image tower is used, the tokenizer just has to load
+    vocab = {"<|startoftext|>": 0, "<|endoftext|>": 1, **{f"{w}</w>": i + 2 for i, w in enumerate(CAPTION_WORDS)}}
+    with open(os.path.join(clip_dir, "vocab.json"), "w") as f:
+        json.dump(vocab, f)
+    with open(os.path.join(clip_dir, "merges.txt"), "w") as f:
+        f.write("#version: 0.2\n")
+    clip_config = CLIPConfig(
+        text_config={**TINY_LAYERS, "vocab_size": len(vocab), "bos_token_id": 0, "eos_token_id": 1, "pad_token_id": 1},
+        vision_config={**TINY_LAYERS, "image_size": TINY_IMAGE_SIZE, "patch_size": 16},
+        projection_dim=dim,
+    )
+    clip_processor = CLIPProcessor(
+        image_processor=CLIPImageProcessor(
+            size={"shortest_edge": TINY_IMAGE_SIZE}, crop_size={"height": TINY_IMAGE_SIZE, "width": TINY_IMAGE_SIZE}
+        ),
+        tokenizer=CLIPTokenizer.from_pretrained(clip_dir),
+    )
+    CLIPModel(clip_config).eval().save_pretrained(clip_dir)
+    clip_processor.save_pretrained(clip_dir)
+    return blip_dir, clip_dir
+
+
+# -----------------------------------------------
+# Query images
+# -----------------------------------------------
+def synthetic_jpegs(count, size=(960, 1280), seed=0, quality=90):
+    """`count` distinct photo-sized JPEGs (smooth colour fields plus noise), as encoded bytes."""
+    import io
+    from PIL import Image
+
+    rng = np.random.default_rng(seed)
+    width, height = size
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    images = []
+    for _ in range(count):
+        base = rng.uniform(0, 255, 3)
+        slope = rng.uniform(-0.15, 0.15, (2, 3))
+        pixels = base + x[..., None] * slope[0] + y[..., None] * slope[1] + rng.normal(0, 12, (height, width, 3))
+        buffer = io.BytesIO()
+        Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)).save(buffer, "JPEG", quality=quality)
+        images.append(buffer.getvalue())
+    return images
+
+
+def build_fixtures(workdir, items, dim, seed=0, index_kind=None, models=True):
+    """Catalog, artifact and (if `models`) tiny models under `workdir`. Returns their paths."""
+    write_synthetic_catalog(os.path.join(workdir, "data"), items, dim, seed)
+    paths = {"artifact_dir": build_artifact(workdir, index_kind)}
+    if models:
+        paths["blip_dir"], paths["clip_dir"] = write_tiny_models(os.path.join(workdir, "models"), dim, seed)
+    return paths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic catalog and tiny BLIP/CLIP models for benchmarking.")
+    parser.add_argument("workdir", help="directory to write data/ and models/ into")
+    parser.add_argument("--items", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=512, help="embedding size (tiny CLIP projection size)")
+    parser.add_argument("--index", default=None, help="ANN index to prebuild in the artifact (default: flat)")
+    parser.add_argument("--no-models", action="store_true", help="catalog only (no torch needed)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    paths = build_fixtures(args.workdir, args.items, args.dim, args.seed, args.index, models=not args.no_models)
+    for name, path in paths.items():
+        print(f"✅ {name}: {path}")
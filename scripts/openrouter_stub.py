@@ -0,0 +1,149 @@
+"""
+Local stand-in for the OpenRouter chat completions API.
+
+Answers every POST with a canned, prompt-appropriate reply after an injected
+delay, optionally fails a fraction of calls, and counts requests at GET /stats
+(POST /stats/reset clears the counters). Point the app at it with:
+
+    python scripts/openrouter_stub.py --port 8081 --latency 0.5
+    OPENROUTER_URL=http://127.0.0.1:8081/api/v1/chat/completions python flask_app/app.py
+"""
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def canned_answer(prompt):
+    text = prompt.lower()
+    if "json object" in text:
+        return json.dumps({
+            "season": "Summer",
+            "productDisplayName": "Casual Shirt",
+            "aesthetic_category": "Casual Basics",
+            "aesthetic_vibe": "Relaxed everyday comfort with easy charm",
+        })
+    if "season" in text and "display name" not in text:
+        return "Summer"
+    if "display name" in text:
+        return "Casual Shirt"
+    if "categories" in text:
+        return "Casual Basics"
+    return "Relaxed everyday comfort with easy charm"
+
+
+class StubState:
+    def __init__(self, latency, jitter, fail_rate, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.fail_rate = fail_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.requests = 0
+            self.failures = 0
+            self.prompt_tokens = 0
+            self.in_flight = 0
+            self.max_in_flight = 0
+
+    def stats(self):
+        with self.lock:
+            return {
+                "requests": self.requests,
+                "failures": self.failures,
+                "prompt_tokens": self.prompt_tokens,
+                "in_flight": self.in_flight,
+                "max_in_flight": self.max_in_flight,
+            }
+
+
+def make_handler(state, answer_fn=canned_answer, invalid_rate=0.0):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/stats":
+                self._send_json(200, state.stats())
+            else:
+                self._send_json(404, {"error": "not found"})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            if self.path == "/stats/reset":
+                state.reset()
+                self._send_json(200, state.stats())
+                return
+
+            with state.lock:
+                state.requests += 1
+                state.in_flight += 1
+                state.max_in_flight = max(state.max_in_flight, state.in_flight)
+                delay = max(0.0, state.latency + state.random.uniform(-state.jitter, state.jitter))
+                fail = state.random.random() < state.fail_rate
+            try:
+                time.sleep(delay)
+                if fail:
+                    with state.lock:
+                        state.failures += 1
+                    self._send_json(500, {"error": {"message": "injected failure"}})
+                    return
+                prompt = payload.get("messages", [{}])[-1].get("content", "")
+                with state.lock:
+                    state.prompt_tokens += len(prompt.split())  # rough whitespace token count
+                answer = answer_fn(prompt)
+                if answer.startswith("{") and state.random.random() < invalid_rate:
+                    # Structured answer with an off-list category, to exercise the per-field fallback
+                    answer = answer.replace("Casual Basics", "Cottagecore")
+                self._send_json(200, {
+                    "choices": [{"message": {"role": "assistant", "content": answer}}],
+                    "usage": {"prompt_tokens": len(prompt.split()), "completion_tokens": 8},
+                })
+            finally:
+                with state.lock:
+                    state.in_flight -= 1
+
+    return Handler
+
+
+def start_stub_server(port=0, latency=0.0, jitter=0.0, fail_rate=0.0, invalid_rate=0.0):
+    """Start the stub on a background thread; returns (server, state). Port 0 picks a free port."""
+    state = StubState(latency, jitter, fail_rate)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(state, invalid_rate=invalid_rate))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local OpenRouter stub with injectable latency.")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds per response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="± uniform jitter in seconds")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="fraction of calls answered with HTTP 500")
+    parser.add_argument("--invalid-rate", type=float, default=0.0,
+                        help="fraction of structured JSON answers with an invalid aesthetic_category")
+    args = parser.parse_args()
+
+    server, _ = start_stub_server(args.port, args.latency, args.jitter, args.fail_rate, args.invalid_rate)
+    print(f"🚀 OpenRouter stub on http://127.0.0.1:{server.server_address[1]}/api/v1/chat/completions")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
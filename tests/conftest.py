@@ -0,0 +1,20 @@
+import os
+import sys
+import importlib
+
+import pytest
+
+# The app imports its modules as `utils.x` from flask_app/, as scripts/ do; tests also use scripts/ helpers
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "scripts"))
+sys.path.insert(0, os.path.join(ROOT, "flask_app"))
+
+
+@pytest.fixture(scope="session")
+def app_module(tmp_path_factory):
+    # The app creates uploads/ in the working directory and warms models up on import
+    with pytest.MonkeyPatch.context() as patch:
+        patch.chdir(tmp_path_factory.mktemp("app"))
+        patch.setenv("MODEL_WARMUP", "lazy")
+        patch.setenv("ANALYSIS_CACHE_ENABLED", "0")
+        return importlib.import_module("app")
@@ -0,0 +1,61 @@
+import os
+
+import numpy as np
+from PIL import Image
+
+from utils.analysis_cache import AnalysisCache, colour_signature, perceptual_hash
+
+MODEL_VERSION = "test"
+
+
+def garment(colour, size=(256, 320)):
+    """A shirt-like shape in `colour` on a white background."""
+    width, height = size
+    pixels = np.full((height, width, 3), 255, dtype=np.uint8)
+    pixels[height // 5:height * 4 // 5, width // 4:width * 3 // 4] = colour
+    pixels[height // 5:height * 2 // 5, width // 10:width * 9 // 10] = colour  # sleeves
+    return Image.fromarray(pixels)
+
+
+def store(cache, image, key, caption):
+    cache.put(key, MODEL_VERSION, perceptual_hash(image), caption, ["#000000"], [0.1, 0.2], None,
+              colour_signature(image))
+
+
+def lookup(cache, image, key):
+    return cache.get(key, MODEL_VERSION, perceptual_hash(image), colour_signature(image))
+
+
+def test_recoloured_copies_do_not_share_an_entry(tmp_path):
+    cache = AnalysisCache(path=str(tmp_path / "cache.sqlite3"), phash_distance=0)
+    red, blue = garment((200, 0, 0)), garment((0, 52, 255))  # same luminance
+    assert perceptual_hash(red) == perceptual_hash(blue)  # grayscale dHash alone cannot tell them apart
+
+    store(cache, red, "red", "a red shirt")
+    assert lookup(cache, blue, "blue") is None
+    assert cache.stats()["phash_hits"] == 0
+
+
+def test_resized_copy_hits_by_phash(tmp_path):
+    cache = AnalysisCache(path=str(tmp_path / "cache.sqlite3"), phash_distance=0)
+    red = garment((200, 0, 0))
+    store(cache, red, "original", "a red shirt")
+
+    hit = lookup(cache, red.resize((128, 160)), "resized")
+    assert hit is not None and hit["caption"] == "a red shirt"
+    assert cache.stats()["phash_hits"] == 1
+
+
+def test_phash_lookup_is_off_by_default(tmp_path):
+    cache = AnalysisCache(path=str(tmp_path / "cache.sqlite3"))
+    red = garment((200, 0, 0))
+    store(cache, red, "original", "a red shirt")
+    assert lookup(cache, red.resize((128, 160)), "resized") is None
+
+
+def test_store_is_opened_on_first_use(tmp_path):
+    path = tmp_path / "nested" / "cache.sqlite3"
+    cache = AnalysisCache(path=str(path))
+    assert not os.path.exists(path.parent)
+    assert lookup(cache, garment((0, 0, 0)), "key") is None
+    assert os.path.exists(path)
@@ -0,0 +1,97 @@
+import threading
+import time
+
+import pytest
+
+from utils.jobs import TERMINAL_STATES, JobQueue
+
+
+def finished_job(app_module):
+    job = app_module.analyze_jobs.submit(lambda job: {"ok": True})
+    while job.state != "done":
+        job.events_since(len(job.events), timeout=1)
+    return job
+
+
+@pytest.mark.parametrize("last_event_id", ["abc", "1.5", "-3"])
+def test_events_ignore_malformed_last_event_id(app_module, last_event_id):
+    job = finished_job(app_module)
+    response = app_module.app.test_client().get(
+        f"/analyze/jobs/{job.id}/events", headers={"Last-Event-ID": last_event_id}
+    )
+    assert response.status_code == 200
+    body = response.get_data(as_text=True)
+    assert "id: 1\nevent: running" in body  # replayed from the start
+    assert "event: done" in body
+
+
+def test_events_resume_after_last_event_id(app_module):
+    job = finished_job(app_module)
+    response = app_module.app.test_client().get(f"/analyze/jobs/{job.id}/events", headers={"Last-Event-ID": "1"})
+    body = response.get_data(as_text=True)
+    assert "event: running" not in body
+    assert "event: result" in body and "event: done" in body
+
+
+@pytest.fixture
+def blocked_jobs(app_module, monkeypatch):
+    """A one-worker, one-slot queue whose jobs wait for `release` between two stages."""
+    release, started = threading.Event(), threading.Event()
+
+    def run(job, image, filters, space):
+        started.set()
+        release.wait(5)
+        job.check_cancelled()
+        return {"image": image}
+
+    monkeypatch.setattr(app_module, "analyze_jobs", JobQueue(workers=1, max_queued=1, ttl=60))
+    monkeypatch.setattr(app_module, "read_upload", lambda: ("decoded image", {}, "default", None))
+    monkeypatch.setattr(app_module, "run_analyze_job", run)
+    yield app_module.app.test_client(), release, started
+    release.set()
+
+
+def wait_finished(job):
+    deadline = time.monotonic() + 5
+    while job.state not in TERMINAL_STATES and time.monotonic() < deadline:
+        job.events_since(len(job.events), timeout=1)
+    return job.state
+
+
+def test_full_queue_is_429(blocked_jobs):
+    client, release, started = blocked_jobs
+    assert client.post("/analyze/jobs").status_code == 202
+    assert started.wait(5)  # running, the queue is empty again
+    assert client.post("/analyze/jobs").status_code == 202
+
+    response = client.post("/analyze/jobs")
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "5"
+
+
+def test_delete_cancels_queued_and_running_jobs(app_module, blocked_jobs):
+    client, release, started = blocked_jobs
+    running = client.post("/analyze/jobs").get_json()["job_id"]
+    assert started.wait(5)
+    queued = client.post("/analyze/jobs").get_json()["job_id"]
+
+    assert client.delete(f"/analyze/jobs/{queued}").get_json()["state"] == "cancelled"
+    assert client.delete(f"/analyze/jobs/{running}").get_json()["state"] == "running"
+    release.set()  # the running job stops at its next stage boundary
+
+    job = app_module.analyze_jobs.get(running)
+    assert wait_finished(job) == "cancelled"
+    assert "result" not in job.stages
+    assert client.get(f"/analyze/jobs/{queued}").get_json()["state"] == "cancelled"
+
+
+def test_finished_jobs_release_their_payload_and_expire(blocked_jobs, app_module):
+    client, release, started = blocked_jobs
+    release.set()
+    job_id = client.post("/analyze/jobs").get_json()["job_id"]
+    job = app_module.analyze_jobs.get(job_id)
+    assert wait_finished(job) == "done"
+    assert job.args is None and job.stages["result"] == {"image": "decoded image"}
+
+    app_module.analyze_jobs.ttl = 0
+    assert client.get(f"/analyze/jobs/{job_id}").status_code == 404  # pruned on read, not only on submit
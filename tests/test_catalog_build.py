@@ -0,0 +1,30 @@
+import json
+import os
+
+import numpy as np
+
+from make_benchmark_fixtures import build_artifact, write_synthetic_catalog
+from utils.catalog_store import load_catalog_artifact, load_tombstones
+
+
+def test_unreadable_images_are_tombstoned_in_a_full_build(tmp_path):
+    data_dir = tmp_path / "data"
+    write_synthetic_catalog(str(data_dir), items=50, dim=8, seed=1)
+    embeddings = np.load(data_dir / "catalog_embeddings.npy")
+    unreadable = [3, 17]
+    embeddings[unreadable] = 0  # what compute_embeddings.py writes for them
+    np.save(data_dir / "catalog_embeddings.npy", embeddings)
+    with open(data_dir / "catalog_embeddings.json", "w") as f:
+        json.dump({"model_id": "tiny-clip", "weights_sha256": None, "dim": 8, "normalization": "l2",
+                   "unreadable_rows": unreadable}, f)
+
+    artifact_dir = build_artifact(str(tmp_path))
+    with open(os.path.join(artifact_dir, "manifest.json")) as f:
+        manifest = json.load(f)
+    metadata, vectors = load_catalog_artifact(artifact_dir)
+    deleted = load_tombstones(len(metadata), artifact_dir=artifact_dir)
+
+    assert manifest["tombstones"] == 2 and "unreadable_rows" not in manifest["embedding"]
+    assert deleted is not None and deleted.sum() == 2
+    assert np.abs(vectors[~deleted]).sum(axis=1).min() > 0
+    assert sorted(metadata["id"][deleted]) == sorted(10000 + i for i in unreadable)
@@ -0,0 +1,65 @@
+import io
+
+import pytest
+
+import utils.embedding_space as embedding_space
+from utils.embedding_space import EmbeddingModelMismatch, query_embedding, query_encoder_for
+
+QUERY_SPEC = {"model_id": "clip-vit-base-patch32", "weights_sha256": "a" * 64, "dim": 512, "normalization": "l2"}
+
+
+@pytest.fixture(autouse=True)
+def query_encoder(monkeypatch):
+    described = []
+
+    def describe(model_path, dtype="float32"):
+        described.append(model_path)
+        return dict(QUERY_SPEC)
+
+    monkeypatch.setattr(embedding_space, "EMBEDDING_MODEL_CHECK", "refuse")
+    monkeypatch.setattr(embedding_space, "describe_encoder", describe)
+    monkeypatch.setattr(embedding_space, "_default_spec", None)
+    monkeypatch.setattr(embedding_space, "_encoder_names", {})
+    return described
+
+
+def test_catalog_without_model_record_is_refused():
+    with pytest.raises(EmbeddingModelMismatch):
+        query_embedding(None, image=None, default_embedding=[0.0])
+
+
+def test_catalog_without_model_record_is_served_with_override(monkeypatch):
+    monkeypatch.setattr(embedding_space, "EMBEDDING_MODEL_CHECK", "warn")
+    assert query_embedding(None, image=None, default_embedding=[1.0]) == [1.0]
+
+
+def test_encoder_is_resolved_once_per_catalog_spec(query_encoder, monkeypatch):
+    monkeypatch.setattr(embedding_space, "resolve_model_dir", lambda path: path)
+    other = {**QUERY_SPEC, "model_id": "clip-vit-base-patch16", "weights_sha256": "b" * 64,
+             "model_path": "/models/patch16"}
+
+    assert query_encoder_for(dict(QUERY_SPEC)) == "clip"
+    for _ in range(3):
+        assert query_encoder_for(dict(other)) is None  # local patch16 copy has other weights
+    assert query_encoder == [embedding_space.CLIP_MODEL_PATH, "/models/patch16"]
+
+
+class LegacyCatalogStore:
+    """A loaded catalog built before embedding specs were recorded."""
+
+    def get(self):
+        return type("Snapshot", (), {"embedding_spec": None})()
+
+
+@pytest.mark.parametrize("route", ["/analyze", "/analyze/jobs"])
+def test_unversioned_catalog_is_refused_before_the_pipeline(app_module, monkeypatch, route):
+    ran = []
+    monkeypatch.setitem(app_module.catalog_spaces, "default", LegacyCatalogStore())
+    monkeypatch.setattr(app_module, "process_new_image", lambda *args, **kwargs: ran.append(args))
+
+    response = app_module.app.test_client().post(
+        route, data={"image": (io.BytesIO(b"not decoded yet"), "look.jpg")}, content_type="multipart/form-data"
+    )
+    assert response.status_code == 409
+    assert "do not record their model" in response.get_json()["error"]
+    assert ran == []
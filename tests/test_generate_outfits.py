@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+import pytest
+from PIL import Image
+
+from utils.catalog_store import CatalogSnapshot
+from utils.colour_features import PALETTE_SIZE, ColourFeatures
+from utils.generate_outfits import item_features
+
+
+@pytest.fixture
+def catalog():
+    ids = np.array([1, 2, 3])
+    metadata = pd.DataFrame({"id": ids, "productDisplayName": ["Red Top", "Blue Jeans", "Gone Shirt"]})
+    colours = ColourFeatures(ids.astype(str), [[200, 0, 0], [0, 0, 200], [0, 200, 0]],
+                             np.zeros((3, PALETTE_SIZE, 3)), np.full((3, PALETTE_SIZE), 1 / PALETTE_SIZE))
+    deleted = np.array([False, False, True])  # item 3 was tombstoned
+    return CatalogSnapshot(metadata, np.zeros((3, 4), np.float32), None, None, (), colours, deleted)
+
+
+def test_live_item_uses_precomputed_colour(catalog):
+    features = item_features(2, catalog)
+    assert features["dominant_color"] == (0, 0, 200) and features["productDisplayName"] == "Blue Jeans"
+
+
+def test_deleted_item_is_not_paired(catalog):
+    with pytest.raises(KeyError):
+        item_features(3, catalog)
+
+
+def test_deleted_item_with_an_image_is_decoded(catalog, tmp_path):
+    path = tmp_path / "3.jpg"
+    Image.new("RGB", (32, 32), (250, 250, 0)).save(path)
+    features = item_features({"id": 3, "image_path": str(path)}, catalog)
+    assert "productDisplayName" not in features
+    assert features["dominant_color"][0] > 200 and features["dominant_color"][2] < 60
@@ -0,0 +1,52 @@
+import json
+
+import pytest
+
+import utils.llm_attributes as llm_attributes
+from utils.prompt_cache import PromptCache, make_key
+
+CAPTION, COLORS = "a woman wearing a black dress", ["#000000", "#ffffff"]
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = PromptCache(path="")
+    monkeypatch.setattr(llm_attributes, "prompt_cache", cache)
+    return cache
+
+
+def stub_llm(monkeypatch, answers):
+    calls = []
+
+    def call(prompts):
+        calls.append(sorted(prompts))
+        return {name: answers[name] for name in prompts}
+
+    monkeypatch.setattr(llm_attributes, "call_openrouter_concurrently", call)
+    return calls
+
+
+def test_invalid_structured_answer_is_not_cached(cache, monkeypatch):
+    stub_llm(monkeypatch, {
+        "structured": json.dumps({"season": "Monsoon", "productDisplayName": "Black Dress"}),
+        "season": "Summer",
+        "aesthetic_category": "Formal",
+        "aesthetic_vibe": "Sleek evening elegance, understated and sharp",
+    })
+    fields = llm_attributes.predict_attributes(CAPTION, COLORS, mode="structured")
+
+    assert fields["season"] == "Summer" and fields["display_name"] == "Black Dress"
+    assert cache.get(make_key("structured", CAPTION, COLORS)) is None
+    assert cache.get(make_key("season", CAPTION, COLORS)) == "Summer"
+
+
+def test_valid_structured_answer_is_reused(cache, monkeypatch):
+    calls = stub_llm(monkeypatch, {"structured": json.dumps({
+        "season": "Winter", "productDisplayName": "Black Dress",
+        "aesthetic_category": "Formal", "aesthetic_vibe": "Sleek evening elegance",
+    })})
+    first = llm_attributes.predict_attributes(CAPTION, COLORS, mode="structured")
+    second = llm_attributes.predict_attributes(CAPTION.upper(), COLORS, mode="structured")
+
+    assert first == second
+    assert calls == [["structured"]]
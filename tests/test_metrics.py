@@ -0,0 +1,16 @@
+class StaleCatalogStore:
+    """Loaded, but due for a reload that would block."""
+
+    def current(self):
+        return [object()] * 3
+
+    def get(self):
+        raise AssertionError("a scrape must not reload the catalog")
+
+
+def test_scrape_reads_the_loaded_catalog_without_reloading(app_module, monkeypatch):
+    monkeypatch.setitem(app_module.catalog_spaces, "default", StaleCatalogStore())
+    response = app_module.app.test_client().get("/metrics")
+
+    assert response.status_code == 200
+    assert 'stylespark_catalog_items{space="default"} 3.0' in response.get_data(as_text=True)
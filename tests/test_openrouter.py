@@ -0,0 +1,73 @@
+import time
+
+import pytest
+
+import utils.openrouter as openrouter
+from utils.openrouter import call_openrouter, call_openrouter_concurrently
+from openrouter_stub import start_stub_server
+
+PROMPTS = {
+    "season": "Given this description, predict the fashion season.",
+    "display_name": "Given this description, suggest a product display name.",
+    "aesthetic_category": "Given this description, choose ONE from these categories: Boho.",
+    "aesthetic_vibe": "Given this description, write ONE short line describing the fashion vibe.",
+}
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    servers = []
+
+    def start(**options):
+        server, state = start_stub_server(**options)
+        servers.append(server)
+        monkeypatch.setattr(openrouter, "OPENROUTER_URL",
+                            f"http://127.0.0.1:{server.server_address[1]}/api/v1/chat/completions")
+        return state
+
+    yield start
+    for server in servers:
+        server.shutdown()
+
+
+def test_concurrent_calls_take_about_one_round_trip(stub):
+    state = stub(latency=0.3)
+    start = time.monotonic()
+    answers = call_openrouter_concurrently(PROMPTS)
+    elapsed = time.monotonic() - start
+
+    assert answers == {"season": "Summer", "display_name": "Casual Shirt",
+                       "aesthetic_category": "Casual Basics",
+                       "aesthetic_vibe": "Relaxed everyday comfort with easy charm"}
+    assert elapsed < 0.3 * 2  # sequential calls would take 4 round trips
+    assert state.stats()["max_in_flight"] == len(PROMPTS)
+
+
+def test_call_over_the_stage_budget_comes_back_empty(stub):
+    stub(latency=0.05)
+
+    def call(prompt):
+        if prompt == PROMPTS["aesthetic_vibe"]:
+            time.sleep(1.0)
+        return call_openrouter(prompt)
+
+    start = time.monotonic()
+    answers = call_openrouter_concurrently(PROMPTS, budget=0.4, call=call)
+    assert time.monotonic() - start < 0.9
+    assert answers["aesthetic_vibe"] == ""
+    assert answers["season"] == "Summer" and answers["display_name"] == "Casual Shirt"
+
+
+def test_call_over_its_timeout_comes_back_empty(stub):
+    stub(latency=0.5)
+    assert call_openrouter(PROMPTS["season"], timeout=0.1) == ""
+
+
+def test_failed_calls_give_partial_results(stub):
+    state = stub(latency=0.05, fail_rate=0.5)
+    answers = call_openrouter_concurrently(PROMPTS)
+
+    failures = state.stats()["failures"]
+    assert 0 < failures < len(PROMPTS)
+    assert sum(answer == "" for answer in answers.values()) == failures
+    assert set(answers) == set(PROMPTS)
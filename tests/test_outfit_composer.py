@@ -0,0 +1,63 @@
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.catalog_store import CatalogSnapshot
+from utils.filters import FilterIndex
+from utils.outfit_composer import DEFAULT_SLOTS, compose_outfits
+
+# (masterCategory, category) of each slot in DEFAULT_SLOTS
+SLOT_CATEGORIES = [("Apparel", "Topwear"), ("Apparel", "Bottomwear"), ("Footwear", "Shoes"),
+                   ("Accessories", "Bags")]
+
+
+@pytest.fixture(scope="module")
+def catalog():
+    per_slot = 12
+    rng = np.random.default_rng(0)
+    master, category = zip(*[c for c in SLOT_CATEGORIES for _ in range(per_slot)])
+    metadata = pd.DataFrame({"id": np.arange(len(master)) + 1000, "masterCategory": master, "category": category})
+    embeddings = rng.normal(size=(len(metadata), 16)).astype(np.float32)
+    return CatalogSnapshot(metadata, embeddings, None, FilterIndex.build(metadata), ())
+
+
+def item_ids(outfit):
+    return [item["id"] for item in outfit["items"].values()]
+
+
+@pytest.mark.parametrize("max_item_reuse", [1, 2])
+def test_reuse_cap(catalog, max_item_reuse):
+    outfits, budget_exhausted = compose_outfits(catalog, top_n=8, beam_width=4, max_item_reuse=max_item_reuse,
+                                                budget_ms=1e9)
+    assert len(outfits) == 8 and not budget_exhausted
+    assert [o["items"].keys() for o in outfits] == [dict(DEFAULT_SLOTS).keys()] * 8
+    assert max(Counter(i for o in outfits for i in item_ids(o)).values()) <= max_item_reuse
+    assert len({tuple(item_ids(o)) for o in outfits}) == 8
+
+
+def test_fixed_item_is_exempt_from_reuse_cap(catalog):
+    outfits, _ = compose_outfits(catalog, fixed={"shoes": 1030}, top_n=5, budget_ms=1e9)
+    assert len(outfits) == 5 and all(o["items"]["shoes"]["id"] == 1030 for o in outfits)
+
+
+def test_reuse_cap_runs_out_of_items(catalog):
+    # 12 items per slot, each used once: at most 12 looks
+    outfits, _ = compose_outfits(catalog, top_n=20, budget_ms=1e9)
+    assert len(outfits) == 12
+
+
+def test_spent_budget_still_fills_top_n(catalog):
+    outfits, budget_exhausted = compose_outfits(catalog, top_n=5, budget_ms=0)
+    assert budget_exhausted and len(outfits) == 5
+    assert max(Counter(i for o in outfits for i in item_ids(o)).values()) == 1
+
+
+def test_route_reports_incomplete_results(app_module, catalog, monkeypatch):
+    monkeypatch.setattr(app_module.catalog_store, "get", lambda: catalog)
+    client = app_module.app.test_client()
+    body = client.post("/compose-outfits", json={"top_n": 5}).get_json()
+    assert len(body["outfits"]) == 5 and body["complete"]
+    body = client.post("/compose-outfits", json={"top_n": 20}).get_json()
+    assert len(body["outfits"]) == 12 and not body["complete"]
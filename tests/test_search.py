@@ -0,0 +1,141 @@
+import zlib
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.ann_index import build_index
+from utils.filters import FilterIndex
+from utils.topk import topk_inner_product, topk_subset
+
+N, DIM, K = 300, 16, 10
+
+
+@pytest.fixture
+def rng(request):
+    # A fixed seed per test case, so a failure reproduces
+    return np.random.default_rng(zlib.crc32(request.node.name.encode()))
+
+
+def normalized(rng, n, dim=DIM):
+    vectors = rng.normal(size=(n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def random_mask(rng, n, density):
+    return rng.random(n) < density
+
+
+def brute_force(queries, matrix, k, mask=None):
+    """Reference top-k: argsort of every score, masked rows set to -inf, -1 for missing hits."""
+    queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    scores = queries @ np.asarray(matrix, dtype=np.float32).T
+    if mask is not None:
+        scores[:, ~mask] = -np.inf
+    order = np.argsort(-scores, axis=1, kind="stable")[:, :k]
+    top = np.take_along_axis(scores, order, axis=1)
+    order = np.where(np.isneginf(top), -1, order)
+    missing = k - top.shape[1]
+    return (np.pad(top, ((0, 0), (0, missing)), constant_values=-np.inf),
+            np.pad(order, ((0, 0), (0, missing)), constant_values=-1))
+
+
+def assert_same_hits(result, expected):
+    np.testing.assert_array_equal(result[1], expected[1])
+    np.testing.assert_allclose(result[0], expected[0], rtol=1e-5, atol=1e-6)
+
+
+# ---------------- FILTER POSTING LISTS ---------------- #
+def test_posting_lists_match_a_dataframe_scan(rng):
+    metadata = pd.DataFrame({
+        "season": rng.choice(["Summer", "winter ", "Fall", None], N),
+        "gender": rng.choice(["Men", "Women", "Unisex"], N),
+        "baseColour": rng.choice(["Red", "Blue", "Black", "Navy Blue"], N),
+    })
+    deleted = random_mask(rng, N, 0.1)
+    index = FilterIndex.build(metadata, deleted=deleted)
+
+    for _ in range(20):
+        filters = {col: rng.choice(["", "summer", "Winter", "Men", "black", "navy blue", "Missing"])
+                   for col in rng.choice(metadata.columns, rng.integers(1, 4), replace=False)}
+        expected = ~deleted
+        for col, value in filters.items():
+            if value:
+                expected &= metadata[col].fillna("").str.strip().str.lower() == value.strip().lower()
+        ids = index.row_ids(filters)
+        assert list(ids) == list(np.flatnonzero(expected))
+        np.testing.assert_array_equal(index.mask(filters), expected)
+
+    assert FilterIndex.build(metadata).row_ids({}) is None
+    assert list(index.row_ids({"unknown": "x"})) == list(np.flatnonzero(~deleted))
+
+
+# ---------------- EXACT TOP-K ---------------- #
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, N])
+@pytest.mark.parametrize("density", [None, 0.5, 0.02, 0.0])
+def test_chunked_topk_matches_brute_force(rng, chunk_size, density):
+    matrix, queries = normalized(rng, N), normalized(rng, 4)
+    mask = None if density is None else random_mask(rng, N, density)
+    result = topk_inner_product(queries, matrix, K, chunk_size=chunk_size, mask=mask)
+    assert_same_hits(result, brute_force(queries, matrix, K, mask))
+
+
+def test_float16_matrix_and_k_beyond_catalog(rng):
+    matrix, queries = normalized(rng, 20).astype(np.float16), normalized(rng, 3)
+    result = topk_inner_product(queries, matrix, 25, chunk_size=6)
+    assert result[0].shape == (3, 25)
+    assert_same_hits(result, brute_force(queries, matrix, 25))
+
+
+def test_subset_topk_matches_masked_brute_force(rng):
+    matrix, queries = normalized(rng, N), normalized(rng, 4)
+    row_ids = rng.choice(N, 6, replace=False)
+    mask = np.zeros(N, dtype=bool)
+    mask[row_ids] = True
+    assert_same_hits(topk_subset(queries, matrix, row_ids, K), brute_force(queries, matrix, K, mask))
+
+
+# ---------------- ANN INDEXES ---------------- #
+# Parameters under which each backend is exact: every IVF list probed, every code re-ranked
+EXACT_INDEXES = {
+    "flat": ({}, {}),
+    "ivf": ({"nlist": 12, "nprobe": 12}, {}),
+    "sq8": ({}, {"rerank": N}),
+    "pq": ({"m": 4, "ksub": 16}, {"rerank": N}),
+}
+
+
+@pytest.mark.parametrize("kind", EXACT_INDEXES)
+@pytest.mark.parametrize("density", [None, 0.5, 0.02])
+def test_index_search_matches_brute_force(rng, kind, density):
+    params, knobs = EXACT_INDEXES[kind]
+    matrix, queries = normalized(rng, N), normalized(rng, 4)
+    mask = None if density is None else random_mask(rng, N, density)
+    index = build_index(kind, matrix, **params)
+    assert_same_hits(index.search(queries, K, mask=mask, **knobs), brute_force(queries, matrix, K, mask))
+
+
+@pytest.mark.parametrize("kind", ["sq8", "pq"])
+def test_reranked_scores_are_exact(rng, kind):
+    # With a partial re-rank the hits may differ from brute force, but every score is the float one
+    params, _ = EXACT_INDEXES[kind]
+    matrix, queries = normalized(rng, N), normalized(rng, 4)
+    scores, indices = build_index(kind, matrix, **params).search(queries, K, rerank=3)
+    exact = (queries @ matrix.T)[np.arange(len(queries))[:, None], indices]
+    np.testing.assert_allclose(scores, exact, rtol=1e-5, atol=1e-6)
+    assert (np.diff(scores, axis=1) <= 0).all()
+
+
+@pytest.mark.parametrize("kind", EXACT_INDEXES)
+def test_compact_and_extend_match_brute_force(rng, kind):
+    params, knobs = EXACT_INDEXES[kind]
+    matrix, queries = normalized(rng, N), normalized(rng, 4)
+    index = build_index(kind, matrix[:200], **params)
+
+    extended = index.extend(matrix)
+    assert_same_hits(extended.search(queries, K, **knobs), brute_force(queries, matrix, K))
+
+    keep = np.flatnonzero(random_mask(rng, N, 0.6))
+    compacted = extended.compact(keep, matrix[keep])
+    mask = random_mask(rng, len(keep), 0.5)
+    assert_same_hits(compacted.search(queries, K, mask=mask, **knobs), brute_force(queries, matrix[keep], K, mask))